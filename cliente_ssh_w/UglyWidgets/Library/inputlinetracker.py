@@ -0,0 +1,79 @@
+import re
+
+_PASSWORD_PROMPT = re.compile(r"(password|passphrase|contraseña|clave)[^\n]*:\s*$", re.IGNORECASE)
+_ALT_SCREEN = re.compile(r"\x1b\[\?(?:1049|1047|47)([hl])")
+_ANSI = re.compile(r"\x1b\[[0-9;?]*[ -/]*[@-~]|\x1b\][^\x07]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]")
+
+
+class InputLineTracker:
+    """
+    Rebuilds the command lines typed by the user from the raw keystrokes sent to the shell.
+
+    Only lines whose content is known for sure are reported: anything edited with
+    cursor keys, history recall or tab completion is discarded, and so are lines typed
+    at password prompts or inside full-screen applications (alternate screen).
+    """
+
+    def __init__(self, on_line=None, max_line=4096):
+        self.on_line = on_line
+        self._max_line = max_line
+        self._buf = []
+        self._uncertain = False
+        self._secret = False
+        self._alt_screen = False
+        self._last_output_line = ""
+
+    def feed_output(self, text):
+        """Watch the output for password prompts and alternate-screen switches."""
+        for m in _ALT_SCREEN.finditer(text):
+            self._alt_screen = m.group(1) == "h"
+        tail = _ANSI.sub("", text).rsplit("\n", 1)
+        if len(tail) > 1:
+            self._last_output_line = tail[1]
+        else:
+            self._last_output_line = (self._last_output_line + tail[0])[-256:]
+        if _PASSWORD_PROMPT.search(self._last_output_line):
+            self._secret = True
+
+    def feed_input(self, data):
+        """Consume keystrokes; calls on_line(line) for each complete, trustworthy line."""
+        i = 0
+        n = len(data)
+        while i < n:
+            ch = data[i]
+            if ch == "\x1b":
+                # Escape sequence (arrows, home/end, bracketed paste...): content no longer certain
+                if data.startswith("\x1b[200~", i) or data.startswith("\x1b[201~", i):
+                    i += 6
+                    continue
+                self._uncertain = True
+                i += 1
+                continue
+            if ch in "\r\n":
+                self._finish_line()
+            elif ch in "\x7f\b":
+                if self._buf:
+                    self._buf.pop()
+            elif ch in "\x03\x15":
+                # Ctrl-C / Ctrl-U discard the line
+                self._reset()
+            elif ch == "\t" or ch < " ":
+                self._uncertain = True
+            elif len(self._buf) < self._max_line:
+                self._buf.append(ch)
+            i += 1
+
+    def _finish_line(self):
+        line = "".join(self._buf).strip()
+        trustworthy = not (self._uncertain or self._secret or self._alt_screen)
+        self._reset()
+        if line and trustworthy and self.on_line:
+            try:
+                self.on_line(line)
+            except Exception as e:
+                print(f"Error in input line callback: {e}")
+
+    def _reset(self):
+        self._buf = []
+        self._uncertain = False
+        self._secret = False
@@ -0,0 +1,18 @@
+from engine.session import LocalPtySession
+from .sessionbackend import SessionBackend
+
+
+class LocalPtyBackend(SessionBackend):
+    """
+    Local shell backend for Linux/macOS on top of a pty (see engine.session.LocalPtySession).
+
+    Exposes the same interface as the SSH Backend so Ui_Terminal and the Copilot
+    controller can use it unchanged.
+    """
+
+    def __init__(self, shell=None, cwd=None, parrent_widget=None, parent=None, record=None, flood_mode=False,
+                 scrollback=False):
+        session = LocalPtySession(shell=shell, cwd=cwd)
+        super().__init__(session, parrent_widget=parrent_widget, parent=parent, record=record,
+                         flood_mode=flood_mode, scrollback=scrollback)
+        print(f"Local shell started: {session.shell} (pid {session.pid})")
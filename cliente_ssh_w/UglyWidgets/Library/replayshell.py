@@ -0,0 +1,64 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+from engine.recording import ReplayPlayer
+
+
+class ReplayBackend(QObject):
+    """
+    Plays an asciicast recording into Ui_Terminal instead of a live shell.
+
+    Same signals as SessionBackend so the terminal frontend is unchanged.
+    Keys typed in the terminal control playback:
+        space  pause / resume
+        + / -  double / halve the speed
+        ← / →  seek 10 seconds back / forward
+    """
+    send_output = pyqtSignal(str)
+    command_entered = pyqtSignal(str)
+    session_closed = pyqtSignal()
+    search_requested = pyqtSignal()
+
+    SEEK_STEP = 10.0
+
+    def __init__(self, path, speed=1.0, idle_limit=2.0, parrent_widget=None, parent=None):
+        super().__init__(parent)
+        self.parrent_widget = parrent_widget
+        self.path = path
+        self.player = ReplayPlayer(path, on_output=self.send_output.emit, speed=speed, idle_limit=idle_limit,
+                                   on_finished=self._on_finished)
+        # Start on the next event loop turn, once the terminal has connected send_output
+        QTimer.singleShot(0, self.player.start)
+        print(f"Replaying {path} at x{speed}")
+
+    def _on_finished(self):
+        self.send_output.emit("\r\n\x1b[7m[fin de la grabación]\x1b[0m\r\n")
+
+    def send_command(self, command):
+        """Recordings are read-only; commands are ignored."""
+        print(f"Replay mode: ignoring command {command!r}")
+
+    @pyqtSlot(str)
+    def write_data(self, data):
+        player = self.player
+        if data == " ":
+            player.toggle_pause()
+        elif data == "+":
+            player.set_speed(player.speed * 2)
+        elif data == "-":
+            player.set_speed(player.speed / 2)
+        elif data == "\x1b[C":
+            player.seek(player.position + self.SEEK_STEP)
+        elif data == "\x1b[D":
+            player.seek(player.position - self.SEEK_STEP)
+
+    @pyqtSlot(str)
+    def set_pty_size(self, data):
+        pass
+
+    @pyqtSlot()
+    def request_search(self):
+        self.search_requested.emit()
+
+    def close(self):
+        self.player.stop()
+        self.session_closed.emit()
@@ -0,0 +1,94 @@
+import time
+
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem, QLabel, QPlainTextEdit
+
+
+class ScrollbackSearchDialog(QDialog):
+    """
+    Ctrl+Shift+F search over the session history kept by engine.scrollback.ScrollbackStore.
+
+    Activating a hit emits jump_requested(line, column, query, lines_from_end) so the
+    terminal can scroll xterm.js to it; the preview shows the surrounding lines
+    even when the hit is older than xterm's own scrollback.
+    """
+    jump_requested = pyqtSignal(int, int, str, int)
+
+    CONTEXT_LINES = 5
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.setWindowTitle("Buscar en el historial")
+        self.resize(640, 480)
+
+        layout = QVBoxLayout(self)
+        self.query_entry = QLineEdit()
+        self.query_entry.setPlaceholderText("Texto a buscar (Enter para ir al resultado)")
+        layout.addWidget(self.query_entry)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        self.results = QListWidget()
+        layout.addWidget(self.results, 3)
+        self.preview = QPlainTextEdit()
+        self.preview.setReadOnly(True)
+        self.preview.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        layout.addWidget(self.preview, 2)
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(200)
+        self._debounce.timeout.connect(self._run_search)
+        self.query_entry.textChanged.connect(lambda _: self._debounce.start())
+        self.query_entry.returnPressed.connect(self._jump_to_current)
+        self.results.currentItemChanged.connect(self._show_preview)
+        self.results.itemActivated.connect(lambda _: self._jump_to_current())
+
+    def open_with(self, text=""):
+        if text:
+            self.query_entry.setText(text)
+        self.query_entry.selectAll()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.query_entry.setFocus()
+
+    def _run_search(self):
+        query = self.query_entry.text()
+        self.results.clear()
+        self.preview.clear()
+        if not query:
+            self.status_label.setText("")
+            return
+        start = time.perf_counter()
+        hits = self.store.search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        size_mb = self.store.size / (1 << 20)
+        self.status_label.setText(f"{len(hits)} resultados en {elapsed:.0f} ms ({size_mb:.1f} MB de historial)")
+        for hit in hits:
+            item = QListWidgetItem(f"{hit.line + 1:>8}  {hit.text.strip()[:200]}")
+            item.setData(Qt.ItemDataRole.UserRole, hit)
+            self.results.addItem(item)
+        if hits:
+            self.results.setCurrentRow(0)
+
+    def _show_preview(self, item, _previous=None):
+        if item is None:
+            return
+        hit = item.data(Qt.ItemDataRole.UserRole)
+        first = max(0, hit.line - self.CONTEXT_LINES)
+        lines = self.store.lines(first, hit.line + self.CONTEXT_LINES + 1)
+        marked = [("▶ " if first + i == hit.line else "  ") + line for i, line in enumerate(lines)]
+        self.preview.setPlainText("\n".join(marked))
+
+    def _jump_to_current(self):
+        item = self.results.currentItem()
+        if item is None:
+            self._run_search()
+            return
+        hit = item.data(Qt.ItemDataRole.UserRole)
+        lines_from_end = self.store.line_count - hit.line
+        self.jump_requested.emit(hit.line, hit.column, self.query_entry.text(), lines_from_end)
+
+    def show_out_of_view(self):
+        self.status_label.setText("El resultado ya no está en la terminal; se muestra en la vista previa.")
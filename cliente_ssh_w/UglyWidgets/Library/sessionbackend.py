@@ -0,0 +1,184 @@
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+from engine import metrics
+from engine.broadcast import BroadcastHub
+from engine.recording import AsciicastRecorder
+from engine.scrollback import ScrollbackStore
+from engine.screen import ScreenModel, FloodGate
+from engine.triggers import TriggerEngine, load_triggers
+from .inputlinetracker import InputLineTracker
+
+
+class SessionBackend(QObject):
+    """
+    Thin Qt adapter over a Qt-free engine.session.ShellSession.
+
+    The session's reader thread calls send_output.emit directly; Qt queues the
+    signal to receivers living in the GUI thread. Writes are queued to the
+    session's writer thread, so write_data never blocks the GUI.
+    """
+    send_output = pyqtSignal(str)
+    # Emitted with each complete command line the user typed (see InputLineTracker)
+    command_entered = pyqtSignal(str)
+    session_closed = pyqtSignal()
+    # Ctrl+Shift+F pressed inside the terminal frontend
+    search_requested = pyqtSignal()
+    # engine.triggers.TriggerEvent for "highlight" and "notify" triggers ("reply" is answered here)
+    trigger_fired = pyqtSignal(object)
+    # (bytes sent, total bytes) while a large paste streams out; sent == total when it ends
+    paste_progress = pyqtSignal(int, int)
+
+    def __init__(self, session, parrent_widget=None, parent=None, record=None, flood_mode=False, triggers=None,
+                 scrollback=False):
+        super().__init__(parent)
+        self.parrent_widget = parrent_widget
+        self.session = session
+        self.input_tracker = InputLineTracker(on_line=self.command_entered.emit)
+        self.recorder = None
+        # Read-only viewers of this session (see share())
+        self.broadcast = None
+        # Searchable history (see engine.scrollback): a temp file, an mmap and indexing on the
+        # reader thread, so it only starts with scrollback=True or on the first search
+        self.scrollback = None
+        if scrollback:
+            self.enable_scrollback()
+        self.send_output.connect(self._track_output)
+        # Output handed to the frontend, split into raw stream and flood-mode snapshots
+        self._stream_flushes = metrics.output_flushes.labels(session.metrics_label, "stream")
+        self._snapshot_flushes = metrics.output_flushes.labels(session.metrics_label, "snapshot")
+        # With flood mode a Python screen model sees every byte and, while output
+        # exceeds the gate's threshold, the frontend only gets periodic snapshots.
+        # Off by default: every byte then goes through the Python parser under a lock
+        self.flood_gate = None
+        if flood_mode:
+            self.flood_gate = FloodGate(ScreenModel(session.cols, session.rows), self._forward)
+            session.add_output_listener(self.flood_gate.feed)
+        else:
+            session.add_output_listener(self._forward)
+        # Output triggers match on the reader thread; actions run on the engine's own thread.
+        # A broken trigger set costs the triggers, never the session
+        try:
+            self.triggers = TriggerEngine(load_triggers() if triggers is None else triggers,
+                                          on_event=self.trigger_fired.emit, writer=session.write)
+        except Exception as e:
+            print(f"Triggers disabled: {e}")
+            self.triggers = TriggerEngine(on_event=self.trigger_fired.emit, writer=session.write)
+        session.add_output_listener(self.triggers.feed)
+        session.add_close_listener(self.session_closed.emit)
+        if record:
+            # Attached before start() so the login banner is part of the recording
+            self.start_recording(record)
+        try:
+            session.start()
+        except Exception:
+            self.stop_recording()
+            self.disable_scrollback()
+            self.triggers.close()
+            if self.flood_gate:
+                self.flood_gate.close()
+            raise
+
+    def _forward(self, text):
+        """Reader thread (or the flood gate's ticker): one flush to the frontend."""
+        gate = self.flood_gate
+        (self._snapshot_flushes if gate is not None and gate.flooding else self._stream_flushes).inc()
+        self.send_output.emit(text)
+
+    @pyqtSlot(str)
+    def _track_output(self, data):
+        self.input_tracker.feed_output(data)
+
+    def send_command(self, command):
+        """Sends a command to the shell using write_data."""
+        self.write_data(command + '\n')
+
+    @pyqtSlot(str)
+    def write_data(self, data):
+        """Queues keystrokes for the session writer thread."""
+        if data == "\x03" and self.session.cancel_paste():
+            print("Paste cancelled")
+        self.input_tracker.feed_input(data)
+        self.session.write(data)
+
+    @pyqtSlot(str)
+    def paste_data(self, data):
+        """
+        Large pastes from the frontend: streamed in channel-sized chunks by the writer
+        thread, bracketed when the remote application enabled it. Ctrl+C cancels.
+        """
+        self.input_tracker.feed_input(data)
+        self.session.paste(data, on_progress=self.paste_progress.emit)
+
+    @pyqtSlot(str)
+    def set_pty_size(self, data):
+        try:
+            cols = int(data.split("::")[0].split(":")[1])
+            rows = int(data.split("::")[1].split(":")[1])
+            self.session.resize(cols, rows)
+            if self.recorder:
+                self.recorder.resize(cols, rows)
+            if self.flood_gate:
+                self.flood_gate.resize(cols, rows)
+            if self.broadcast:
+                self.broadcast.resize(cols, rows)
+            print(f"backend pty resize -> cols:{cols} rows:{rows}")
+        except Exception as e:
+            print(f"Error setting backend pty term size: {e}")
+
+    def screen_text(self):
+        """Visible screen as plain text, from the Python screen model ("" without flood mode)."""
+        return self.flood_gate.screen_text() if self.flood_gate else ""
+
+    @pyqtSlot()
+    def request_search(self):
+        self.search_requested.emit()
+
+    def enable_scrollback(self):
+        """Starts the searchable history if it isn't running yet (output from now on) and returns it."""
+        if self.scrollback is None:
+            self.scrollback = ScrollbackStore()
+            self.session.add_output_listener(self.scrollback.feed)
+        return self.scrollback
+
+    def disable_scrollback(self):
+        if self.scrollback is not None:
+            self.session.remove_output_listener(self.scrollback.feed)
+            self.scrollback.close()
+            self.scrollback = None
+
+    def start_recording(self, path, **options):
+        """Starts an asciicast recording of the session output (see engine.recording)."""
+        self.stop_recording()
+        self.recorder = AsciicastRecorder(path, cols=self.session.cols, rows=self.session.rows, **options)
+        self.recorder.attach(self.session)
+        print(f"Recording session to {path}")
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def share(self):
+        """
+        Broadcast hub fed with the raw session output, created on first use.
+        Viewers subscribe to it (ViewerBackend, engine.broadcast.ShareServer).
+        """
+        if self.broadcast is None:
+            self.broadcast = BroadcastHub(cols=self.session.cols, rows=self.session.rows)
+            self.session.add_output_listener(self.broadcast.feed)
+        return self.broadcast
+
+    def unshare(self):
+        """Disconnects every viewer; the owner's session is unaffected."""
+        if self.broadcast:
+            self.session.remove_output_listener(self.broadcast.feed)
+            self.broadcast.close()
+            self.broadcast = None
+
+    def close(self):
+        self.session.close()
+        self.stop_recording()
+        self.unshare()
+        self.disable_scrollback()
+        self.triggers.close()
+        if self.flood_gate:
+            self.flood_gate.close()
@@ -1,17 +1,41 @@
-from PyQt6.QtWebEngineCore import QWebEngineUrlSchemeHandler
-from PyQt6.QtCore import QByteArray
+from PyQt6.QtWebEngineCore import QWebEngineUrlSchemeHandler, QWebEngineProfile
+from PyQt6.QtCore import QByteArray, QBuffer
+import mimetypes
 import os
 
+SCHEME = b"ssh"
+
+
 class WebEngineUrlSchemeHandler(QWebEngineUrlSchemeHandler):
     def requestStarted(self, request):
-        data = QByteArray()
+        path = request.requestUrl().path()[1:]
         try:
-            with open(get_resource_path(request.requestUrl().path()[1:]), 'rb') as f:
+            with open(get_resource_path(path), 'rb') as f:
                 data = QByteArray(f.read())
         except Exception as e:
             print(f"Failed to open file: {e}")
-        buf = data
-        request.reply(buf)
+            request.fail(request.Error.UrlNotFound)
+            return
+        # The job owns the buffer, so it lives exactly as long as the request
+        buf = QBuffer(request)
+        buf.setData(data)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        request.reply(content_type.encode(), buf)
+
+
+def install_scheme_handler(profile=None):
+    """
+    Installs the ssh: scheme handler on `profile` (the default one if None) unless it
+    already has one. Installing again for every terminal would stack handlers on a
+    profile that lives as long as the application.
+    """
+    profile = profile or QWebEngineProfile.defaultProfile()
+    handler = profile.urlSchemeHandler(SCHEME)
+    if handler is None:
+        # Parented to the profile: it is destroyed with it, never with a terminal
+        handler = WebEngineUrlSchemeHandler(profile)
+        profile.installUrlSchemeHandler(SCHEME, handler)
+    return handler
 
 def get_resource_path(relative_path):
     return os.path.join(os.path.dirname(__file__), relative_path)
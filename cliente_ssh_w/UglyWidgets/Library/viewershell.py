@@ -0,0 +1,59 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+
+class ViewerBackend(QObject):
+    """
+    Read-only view of another terminal's live session (see engine.broadcast).
+
+    Same signals as SessionBackend so Ui_Terminal is unchanged. The subscriber
+    queue is drained by a GUI timer, so a busy viewer never holds back the
+    owner's reader thread: if it falls behind, the hub drops its backlog and the
+    next drain brings a terminal reset plus the recent history instead.
+    """
+    send_output = pyqtSignal(str)
+    command_entered = pyqtSignal(str)
+    session_closed = pyqtSignal()
+    search_requested = pyqtSignal()
+
+    POLL_MS = 30
+
+    def __init__(self, hub, parrent_widget=None, parent=None):
+        super().__init__(parent)
+        self.parrent_widget = parrent_widget
+        self.hub = hub
+        self.subscriber = hub.subscribe()
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.POLL_MS)
+        self.timer.timeout.connect(self._poll)
+        # Start on the next event loop turn, once the terminal has connected send_output
+        QTimer.singleShot(0, self.timer.start)
+
+    def _poll(self):
+        text = self.subscriber.drain()
+        if text is None:
+            self.timer.stop()
+            self.send_output.emit("\r\n\x1b[7m[la sesión compartida terminó]\x1b[0m\r\n")
+            self.session_closed.emit()
+            return
+        if text:
+            self.send_output.emit(text)
+
+    def send_command(self, command):
+        """Viewers are read-only; commands are ignored."""
+        print(f"Viewer mode: ignoring command {command!r}")
+
+    @pyqtSlot(str)
+    def write_data(self, data):
+        pass
+
+    @pyqtSlot(str)
+    def set_pty_size(self, data):
+        pass
+
+    @pyqtSlot()
+    def request_search(self):
+        self.search_requested.emit()
+
+    def close(self):
+        self.timer.stop()
+        self.subscriber.close()
@@ -1,5 +1,6 @@
 from PyQt6.QtCore import pyqtSignal, QThread
 
+
 class ShellReaderThread(QThread):
     data_ready = pyqtSignal(str)
 
@@ -8,45 +9,19 @@ class ShellReaderThread(QThread):
         self.process = process
 
     def run(self):
-        while True:
-            if self.process.isalive():
-                try:
-                    # print("Reading data from process...")
-                    data = self.process.read()
-                    # print(f"Data: {data}")
-
+        while not self.isInterruptionRequested() and self.process.isalive():
+            try:
+                data = self.process.read()
+                if data:
                     self.data_ready.emit(data)
-                except Exception as e:
-                    print(f"Error while reading from process: {e}")
-            else:
-                print("not alive...")
+                else:
+                    QThread.msleep(10)  # nothing available: yield the CPU instead of spinning
+            except EOFError:
                 break
+            except Exception as e:
+                print(f"Error while reading from process: {e}")
+                QThread.msleep(10)
+        print("not alive...")
 
     def stop(self):
-        self._stop_event.set()
-
-    # ...existing code...
-from PyQt6.QtCore import pyqtSignal, QThread
-
-
-class ShellReaderThread(QThread):
-    data_ready = pyqtSignal(str)
-
-    def __init__(self, process):
-        super().__init__()
-        self.process = process
-
-    def run(self):
-        while True:
-            if self.process.isalive():
-                try:
-                    # print("Reading data from process...")
-                    data = self.process.read()
-                    # print(f"Data: {data}")
-
-                    self.data_ready.emit(data)
-                except Exception as e:
-                    print(f"Error while reading from process: {e}")
-            else:
-                print("not alive...")
-                break
+        self.requestInterruption()
@@ -3,13 +3,17 @@ import time
 import os
 import json
 
-from PyQt6.QtCore import QSize, QCoreApplication, QUrl, QMetaObject, QTimer
-from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QMainWindow
+from PyQt6.QtCore import QSize, QCoreApplication, QUrl, QMetaObject, QTimer, Qt
+from PyQt6.QtGui import QShortcut, QKeySequence
+from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QMainWindow, QLabel
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWebEngineCore import QWebEngineProfile
 from PyQt6.QtWebChannel import QWebChannel
-from .Library.sshschemahandler import WebEngineUrlSchemeHandler
+from .Library.sshschemahandler import install_scheme_handler
 from .Library.sshshell import Backend
+from .Library.ptyshell import LocalPtyBackend
+from .Library.replayshell import ReplayBackend
+from .Library.viewershell import ViewerBackend
+from .Library.scrollbacksearch import ScrollbackSearchDialog
 
 class Ui_Terminal(QWidget):
     """
@@ -20,7 +24,18 @@ class Ui_Terminal(QWidget):
         """
         Initialization function for the Terminal class.
 
-        :param connect_info: a dictionary that includes SSH credentials.
+        :param connect_info: a dictionary that includes SSH credentials, or {"local": True}
+                             to open a local shell instead, or {"replay": path} to play
+                             an asciicast recording ("speed" and "idle_limit" optional).
+                             "record": path records the live session to asciicast.
+                             "flood_mode": True enables snapshot rendering of output floods (off by default).
+                             "scrollback": True keeps the searchable history from the start; otherwise
+                             it starts on the first Ctrl+Shift+F (replays and viewers have none).
+                             "predictive_echo": "adaptive" (default), "always" or "off" for the
+                             frontend's local echo of typed characters on slow links.
+                             "jump": ProxyJump chain ("user@bastion:port,...") to reach the host.
+                             {"watch": hub} shows another terminal's session read-only, where hub
+                             is the engine.broadcast.BroadcastHub returned by its backend's share().
         :param parent: parent widget if any.
         """
         super().__init__(parent)
@@ -28,10 +43,23 @@ class Ui_Terminal(QWidget):
         self.port = connect_info.get('port')  # Get port from connect_info
         self.username = connect_info.get('username')
         self.password = connect_info.get('password')
+        self.local = bool(connect_info.get('local'))
+        self.replay = connect_info.get('replay')
+        self.replay_speed = connect_info.get('speed', 1.0)
+        self.replay_idle_limit = connect_info.get('idle_limit', 2.0)
+        self.watch = connect_info.get('watch')
+        self.record = connect_info.get('record')
+        self.jump = connect_info.get('jump')
+        self.flood_mode = connect_info.get('flood_mode', False)
+        self.scrollback = connect_info.get('scrollback', False)
+        # Playback keys are controls and viewers are read-only: never echo them
+        self.predictive_echo = "off" if self.replay or self.watch else connect_info.get('predictive_echo', "adaptive")
         self.div_height = 0
         self.initial_buffer = ""
         self._frontend_ready = False
         self._pending_outputs = []  # cola para datos antes de que JS defina handle_output
+        self.search_dialog = None
+        self._closed = False
 
         self.setupUi(self)
 
@@ -44,11 +72,21 @@ class Ui_Terminal(QWidget):
         term.setObjectName("term")
         QMetaObject.connectSlotsByName(term)
         layout = QVBoxLayout()
-        self.handler = WebEngineUrlSchemeHandler()
-        QWebEngineProfile.defaultProfile().installUrlSchemeHandler(b"ssh", self.handler)
-        self.channel = QWebChannel()
-        # Pass the port to the Backend constructor
-        self.backend = Backend(host=self.host, port=self.port, username=self.username, password=self.password, parrent_widget=self)
+        self.handler = install_scheme_handler()
+        self.channel = QWebChannel(self)
+        if self.watch is not None:
+            self.backend = ViewerBackend(self.watch, parrent_widget=self)
+        elif self.replay:
+            self.backend = ReplayBackend(self.replay, speed=self.replay_speed, idle_limit=self.replay_idle_limit,
+                                         parrent_widget=self)
+        elif self.local:
+            self.backend = LocalPtyBackend(parrent_widget=self, record=self.record, flood_mode=self.flood_mode,
+                                           scrollback=self.scrollback)
+        else:
+            # Pass the port to the Backend constructor
+            self.backend = Backend(host=self.host, port=self.port, username=self.username, password=self.password,
+                                   parrent_widget=self, record=self.record, flood_mode=self.flood_mode,
+                                   jump=self.jump, scrollback=self.scrollback)
         self.channel.registerObject("backend", self.backend)
 
         self.view = QWebEngineView()
@@ -61,6 +99,25 @@ class Ui_Terminal(QWidget):
         # Conectar salida del backend con protección hasta que JS esté listo
         self.backend.send_output.connect(self._on_backend_output)
 
+        # Búsqueda en el historial: atajo Qt y, si xterm.js se queda con la tecla, aviso desde JS
+        self.search_shortcut = QShortcut(QKeySequence("Ctrl+Shift+F"), self)
+        self.search_shortcut.setContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+        self.search_shortcut.activated.connect(self.open_search)
+        self.backend.search_requested.connect(self.open_search)
+
+        # Disparadores de salida (engine.triggers): resaltado en xterm.js y avisos
+        self.notice_label = QLabel(self)
+        self.notice_label.setStyleSheet(
+            "background:#2e7d32;color:white;padding:6px 10px;border-radius:4px;font-weight:bold;")
+        self.notice_label.hide()
+        self.notice_timer = QTimer(self)
+        self.notice_timer.setSingleShot(True)
+        self.notice_timer.timeout.connect(self.notice_label.hide)
+        if hasattr(self.backend, 'trigger_fired'):
+            self.backend.trigger_fired.connect(self._on_trigger_fired)
+        if hasattr(self.backend, 'paste_progress'):
+            self.backend.paste_progress.connect(self._on_paste_progress)
+
         html_path = os.path.join(os.path.dirname(__file__), "qtsshcon.html")
         self.view.load(QUrl.fromLocalFile(os.path.abspath(html_path)))
         layout.addWidget(self.view)
@@ -101,6 +158,7 @@ class Ui_Terminal(QWidget):
                     except Exception as e:
                         print(f"Error flushing pending output: {e}")
                 self._pending_outputs.clear()
+                self.set_predictive_echo(self.predictive_echo)
             QTimer.singleShot(0, self.delayed_method)
 
         # Evaluar JS para verificar existencia de objetos/fns
@@ -139,6 +197,111 @@ class Ui_Terminal(QWidget):
             lambda ok: self.view.page().runJavaScript(f"term.write('{banner}');") if ok else None,
         )
 
+    def set_predictive_echo(self, mode):
+        """Modo del eco predictivo del frontend: "off", "adaptive" (según el RTT medido) o "always"."""
+        self.predictive_echo = mode
+        if self._frontend_ready:
+            self.view.page().runJavaScript(
+                f"window.set_predictive_echo && window.set_predictive_echo({json.dumps(mode)})")
+
+    def open_search(self):
+        """
+        Abre la búsqueda en el historial (Ctrl+Shift+F), con la selección actual de xterm como texto inicial.
+        """
+        enable = getattr(self.backend, 'enable_scrollback', None)
+        if enable is None:
+            return
+        # Sin "scrollback" en connect_info el historial empieza con la primera búsqueda
+        store = enable()
+        if self.search_dialog is None:
+            self.search_dialog = ScrollbackSearchDialog(store, parent=self)
+            self.search_dialog.jump_requested.connect(self.jump_to_match)
+        self.view.page().runJavaScript(
+            "typeof term !== 'undefined' ? term.getSelection() : ''",
+            lambda text: self.search_dialog.open_with((text or "").strip().split("\n")[0]),
+        )
+
+    def jump_to_match(self, line, column, query, lines_from_end):
+        """Desplaza xterm.js hasta la coincidencia más cercana a la línea del historial indicada."""
+        script = f"window.scroll_to_match ? window.scroll_to_match({json.dumps(query)}, {int(lines_from_end)}) : false"
+
+        def done(found):
+            if not found and self.search_dialog is not None:
+                self.search_dialog.show_out_of_view()
+
+        self.view.page().runJavaScript(script, done)
+
+    def _on_trigger_fired(self, event):
+        """Ejecuta en la GUI las acciones visibles de un disparador (las respuestas ya las escribió el motor)."""
+        trigger = event.trigger
+        if trigger.action == "highlight":
+            if self._frontend_ready:
+                self.view.page().runJavaScript(
+                    f"window.highlight_match && window.highlight_match({json.dumps(event.text)}, "
+                    f"{json.dumps(trigger.color)})")
+        elif trigger.action == "notify":
+            self.show_notice(f"{trigger.name}: {event.text}")
+
+    def show_notice(self, text, timeout_ms=5000, alert=True):
+        """Aviso flotante en la esquina superior derecha; con `alert`, si la ventana no está activa, la hace parpadear."""
+        self.notice_label.setText(text)
+        self.notice_label.adjustSize()
+        self.notice_label.move(max(0, self.width() - self.notice_label.width() - 20), 12)
+        self.notice_label.show()
+        self.notice_label.raise_()
+        self.notice_timer.start(timeout_ms)
+        if alert:
+            QApplication.alert(self.window())
+
+    # Pegados por debajo de este tamaño terminan antes de que merezca la pena mostrar progreso
+    PASTE_PROGRESS_MIN = 256 * 1024
+
+    def _on_paste_progress(self, sent, total):
+        if total < self.PASTE_PROGRESS_MIN:
+            return
+        if sent >= total:
+            self.notice_timer.start(0)
+            return
+        self.show_notice(f"Pegando… {sent * 100 // total}% de {total / (1 << 20):.1f} MB (Ctrl+C cancela)",
+                         timeout_ms=2000, alert=False)
+
+    def close_terminal(self):
+        """
+        Releases everything this terminal created: the backend (session threads and
+        channel), its web channel registration, the page and the timers. Call it
+        before dropping the widget; closeEvent does too. Idempotent.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._frontend_ready = False
+        self._pending_outputs.clear()
+        self.notice_timer.stop()
+        if self.search_dialog is not None:
+            self.search_dialog.close()
+            self.search_dialog.deleteLater()
+            self.search_dialog = None
+        try:
+            self.backend.send_output.disconnect(self._on_backend_output)
+        except TypeError:
+            pass
+        try:
+            self.backend.close()
+        except Exception as e:
+            print(f"Error closing terminal backend: {e}")
+        self.channel.deregisterObject(self.backend)
+        self.view.page().setWebChannel(None)
+        self.view.loadFinished.disconnect(self.handle_load_finished)
+        # The override closes over self: drop it so the view does not keep the terminal alive
+        del self.view.resizeEvent
+        self.view.deleteLater()
+        self.channel.deleteLater()
+        self.backend.deleteLater()
+
+    def closeEvent(self, event):
+        self.close_terminal()
+        super().closeEvent(event)
+
     def _on_backend_output(self, data: str):
         """Envía datos al frontend si está listo; si no, los acumula."""
         try:
@@ -27,13 +27,254 @@ if (terminalElement) {
     // When data is entered into the terminal, send it to the backend
     term.onData(e => {
         if (window.backend) {
+            predictor.onInput(e);
             window.backend.write_data(e);
         }
     });
 
+    // Large pastes skip xterm's onData path: the Python side streams them in chunks from the
+    // session writer thread (bracketed when the remote enabled it) and reports progress
+    const LARGE_PASTE = 4096;
+    term.element.addEventListener('paste', ev => {
+        const text = ev.clipboardData && ev.clipboardData.getData('text/plain');
+        if (!text || text.length < LARGE_PASTE || !window.backend || !window.backend.paste_data) return;
+        ev.preventDefault();
+        ev.stopImmediatePropagation();
+        predictor.rollback();
+        // Same newline handling as xterm's own paste
+        window.backend.paste_data(text.replace(/\r?\n/g, '\r'));
+    }, true);
+
+    // Ctrl+Shift+F opens the history search on the Python side (the key never reaches the shell)
+    term.attachCustomKeyEventHandler(e => {
+        if (e.type === 'keydown' && e.ctrlKey && e.shiftKey && (e.key === 'F' || e.key === 'f')) {
+            if (window.backend && window.backend.request_search) {
+                window.backend.request_search();
+            }
+            return false;
+        }
+        return true;
+    });
+
+    // Scroll to the line containing `query` closest to `linesFromEnd` lines above the bottom.
+    // Returns false when the match is no longer in xterm's own scrollback.
+    window.scroll_to_match = function(query, linesFromEnd) {
+        const buf = term.buffer.active || term.buffer;
+        const needle = query.toLowerCase();
+        const target = buf.length - linesFromEnd;
+        let best = -1;
+        let bestCol = 0;
+        for (let i = buf.length - 1; i >= 0; i--) {
+            const line = buf.getLine(i);
+            if (!line) continue;
+            const col = line.translateToString(true).toLowerCase().indexOf(needle);
+            if (col !== -1 && (best === -1 || Math.abs(i - target) < Math.abs(best - target))) {
+                best = i;
+                bestCol = col;
+            }
+            if (best !== -1 && i < target) break;
+        }
+        if (best === -1) return false;
+        term.scrollToLine(Math.max(0, best - Math.floor(term.rows / 2)));
+        term.select(bestCol, best, query.length);
+        return true;
+    };
+
+    // Output trigger highlights: overlays anchored to buffer markers so they follow scrolling.
+    // This xterm.js version has no decorations API, hence the absolutely positioned divs.
+    const highlights = [];
+    const MAX_HIGHLIGHTS = 200;
+
+    // Position `el` over `len` cells starting at buffer line `line`, column `col`
+    function placeCells(el, line, col, len) {
+        const screen = term.element && term.element.querySelector('.xterm-screen');
+        if (!screen) return;
+        const buf = term.buffer.active || term.buffer;
+        const cellWidth = screen.clientWidth / term.cols;
+        const cellHeight = screen.clientHeight / term.rows;
+        const row = line - buf.viewportY;
+        el.style.display = (row >= 0 && row < term.rows) ? 'block' : 'none';
+        el.style.top = (row * cellHeight) + 'px';
+        el.style.left = (col * cellWidth) + 'px';
+        el.style.width = (len * cellWidth) + 'px';
+        el.style.height = cellHeight + 'px';
+        el.style.lineHeight = cellHeight + 'px';
+    }
+
+    function placeHighlights() {
+        for (let i = highlights.length - 1; i >= 0; i--) {
+            const h = highlights[i];
+            if (h.marker.isDisposed || h.marker.line < 0) {
+                h.el.remove();
+                highlights.splice(i, 1);
+                continue;
+            }
+            placeCells(h.el, h.marker.line, h.col, h.len);
+        }
+    }
+
+    // Predictive local echo (mosh-style) for high-latency links. Printable keys are drawn at
+    // once, underlined, as overlays over the cells where the echo should land; the buffer is
+    // never touched, so rolling back a wrong guess is just removing the overlays.
+    // Guesses are confirmed or refuted by reading those cells after each server write.
+    const predictor = {
+        mode: 'adaptive',   // 'off' | 'adaptive' (only when the measured RTT is high) | 'always'
+        threshold: 30,      // ms of smoothed RTT from which 'adaptive' starts predicting
+        srtt: 0,
+        pending: [],        // {marker, col, ch, el, at}
+        sentAt: [],         // send times of keystrokes whose output has not arrived yet
+        suspended: false,   // a guess was never echoed (no-echo mode): wait for Enter
+        blocked: false,     // a non-printable key went out: wait for output before guessing
+
+        altScreen() {
+            const buffers = term._core && term._core.buffers;
+            return !!(buffers && buffers.active === buffers.alt);
+        },
+
+        atPasswordPrompt() {
+            const buf = term.buffer.active || term.buffer;
+            const line = buf.getLine(buf.baseY + buf.cursorY);
+            const before = line ? line.translateToString(false, 0, buf.cursorX) : '';
+            return /(password|passphrase|contraseña|passcode|\bpin\b)[^\n]*[:?]\s*$/i.test(before);
+        },
+
+        active() {
+            return this.mode !== 'off' && !this.suspended && !this.blocked
+                && (this.mode === 'always' || this.srtt >= this.threshold)
+                && !this.altScreen() && !this.atPasswordPrompt();
+        },
+
+        onInput(data) {
+            const now = performance.now();
+            if (this.sentAt.length < 64) this.sentAt.push(now);
+            if (data === '\x7f') {
+                const last = this.pending.pop();
+                if (last) this.drop(last);
+                else this.blocked = true;
+                return;
+            }
+            const chars = Array.from(data);
+            // Single narrow characters only: wide (CJK, emoji) glyphs would misplace later guesses
+            const printable = chars.length === 1 && data >= ' ' && data !== '\x7f' && data.charCodeAt(0) < 0x1100;
+            if (!printable) {
+                if (data === '\r') this.suspended = false;
+                this.blocked = true;
+                return;
+            }
+            if (!this.active()) return;
+            const buf = term.buffer.active || term.buffer;
+            const col = buf.cursorX + this.pending.length;
+            if (col >= term.cols - 1) return;  // no guessing across the line wrap
+            const screen = term.element && term.element.querySelector('.xterm-screen');
+            const marker = screen && term.addMarker(0);
+            if (!marker) return;
+            const el = document.createElement('div');
+            el.textContent = data;
+            el.style.cssText = 'position:absolute;pointer-events:none;z-index:11;text-decoration:underline;'
+                + 'overflow:hidden;white-space:pre;background:#141414;color:#d0d0d0;'
+                + 'font-family:' + term.getOption('fontFamily') + ';font-size:' + term.getOption('fontSize') + 'px';
+            screen.appendChild(el);
+            this.pending.push({ marker: marker, col: col, ch: data, el: el, at: now });
+            placeCells(el, marker.line, col, 1);
+        },
+
+        onOutput() {
+            if (this.sentAt.length) {
+                const sample = performance.now() - this.sentAt[0];
+                this.sentAt = [];
+                if (sample < 3000) {
+                    this.srtt = this.srtt ? 0.875 * this.srtt + 0.125 * sample : sample;
+                }
+            }
+        },
+
+        // Called once xterm has parsed a server write
+        verify() {
+            this.blocked = false;
+            const buf = term.buffer.active || term.buffer;
+            const cursorLine = buf.baseY + buf.cursorY;
+            while (this.pending.length) {
+                const p = this.pending[0];
+                const line = buf.getLine(p.marker.line);
+                const cell = line && !p.marker.isDisposed ? line.translateToString(false, p.col, p.col + 1) : '';
+                if (cell === p.ch) {
+                    this.drop(this.pending.shift());
+                    continue;
+                }
+                const passed = p.marker.isDisposed || cursorLine > p.marker.line
+                    || (cursorLine === p.marker.line && buf.cursorX > p.col);
+                if (passed || this.altScreen()) this.rollback();
+                break;
+            }
+        },
+
+        expire() {
+            const p = this.pending[0];
+            if (p && performance.now() - p.at > Math.max(1000, 4 * this.srtt)) {
+                // The server never echoed it: raw or no-echo mode, stop guessing until Enter
+                this.rollback();
+                this.suspended = true;
+            }
+        },
+
+        drop(p) {
+            p.el.remove();
+            p.marker.dispose();
+        },
+
+        rollback() {
+            this.pending.forEach(p => this.drop(p));
+            this.pending = [];
+        },
+
+        place() {
+            this.pending.forEach(p => placeCells(p.el, p.marker.line, p.col, 1));
+        },
+    };
+    setInterval(() => predictor.expire(), 200);
+
+    term.onRender(() => { placeHighlights(); predictor.place(); });
+    term.onScroll(() => { placeHighlights(); predictor.place(); });
+
+    // 'off', 'adaptive' or 'always'
+    window.set_predictive_echo = function(mode) {
+        predictor.mode = mode;
+        if (mode === 'off') predictor.rollback();
+    };
+
+    // Highlight the most recent occurrence of `text` on the visible screen.
+    window.highlight_match = function(text, color) {
+        const screen = term.element && term.element.querySelector('.xterm-screen');
+        const buf = term.buffer.active || term.buffer;
+        if (!screen || !text) return false;
+        const needle = text.toLowerCase();
+        const cursorLine = buf.baseY + buf.cursorY;
+        for (let i = cursorLine; i >= Math.max(0, cursorLine - term.rows); i--) {
+            const line = buf.getLine(i);
+            const col = line ? line.translateToString(true).toLowerCase().lastIndexOf(needle) : -1;
+            if (col === -1) continue;
+            if (highlights.some(h => h.marker.line === i && h.col === col)) return true;
+            const marker = term.addMarker(i - cursorLine);
+            if (!marker) return false;  // alternate screen: no markers
+            const el = document.createElement('div');
+            el.style.cssText = 'position:absolute;pointer-events:none;opacity:0.35;z-index:10;background:' + color;
+            screen.appendChild(el);
+            highlights.push({ marker: marker, col: col, len: text.length, el: el });
+            if (highlights.length > MAX_HIGHLIGHTS) {
+                const old = highlights.shift();
+                old.el.remove();
+                old.marker.dispose();
+            }
+            placeHighlights();
+            return true;
+        }
+        return false;
+    };
+
     // Function to handle incoming data from the backend
     window.handle_output = function(data) {
-        term.write(data);
+        predictor.onOutput();
+        term.write(data, () => predictor.verify());
     };
 
     // Establish a connection with the Qt backend
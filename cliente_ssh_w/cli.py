@@ -0,0 +1,205 @@
+"""
+Punto de entrada de línea de comandos, sin Qt ni WebEngine.
+
+Ejemplos:
+    python cli.py ssh 10.0.0.12 -u alumno -c "uname -a" -c "df -h"
+    python cli.py ssh 10.0.0.12 -u alumno                 # sesión interactiva
+    python cli.py local -c "ls -la" --record sesion.cast.gz
+    python cli.py replay sesion.cast.gz --speed 2 --idle-limit 1
+    python cli.py fanout --hosts laboratorio.txt -u alumno -j 20 "sudo apt-get -y install htop"
+"""
+import argparse
+import getpass
+import os
+import sys
+import time
+
+from engine.session import SshSession, LocalPtySession, SessionError
+from engine.recording import AsciicastRecorder, ReplayPlayer
+
+
+def _load_env():
+    try:
+        from dotenv import load_dotenv
+        from resources import resource_path
+    except ImportError:
+        return
+    for cand in ('.env', 'cliente_ssh_w/.env'):
+        path = resource_path(cand)
+        if os.path.exists(path):
+            load_dotenv(path)
+
+
+def _terminal_size():
+    try:
+        size = os.get_terminal_size(sys.stdout.fileno())
+        return size.columns, size.lines
+    except OSError:
+        return 120, 40
+
+
+def _build_session(args):
+    cols, rows = _terminal_size()
+    if args.modo == "local":
+        return LocalPtySession(shell=args.shell, cols=cols, rows=rows)
+    password = os.environ.get(args.password_env) if args.password_env else None
+    if not password:
+        password = getpass.getpass(f"Clave de {args.user}@{args.host}: ")
+    return SshSession(args.host, args.port, args.user, password, timeout=args.connect_timeout, cols=cols, rows=rows)
+
+
+def run_script(session, commands, timeout):
+    """Envía los comandos, cierra la shell con exit y espera su fin. Retorna el código de salida del proceso."""
+    for command in commands:
+        session.send_command(command)
+    session.send_command("exit")
+    if not session.wait_closed(timeout):
+        print(f"\n[cli] tiempo agotado tras {timeout}s", file=sys.stderr)
+        session.close()
+        return 124
+    # wait_closed vuelve tras liberar el canal, que es cuando se conoce el código
+    if session.exit_status is None:
+        print("\n[cli] la sesión terminó sin informar su código de salida", file=sys.stderr)
+        return 255
+    return session.exit_status
+
+
+def run_interactive(session):
+    """Conecta la terminal local en modo raw con la sesión hasta que esta termine."""
+    import select
+    import signal
+    import termios
+    import tty
+
+    stdin = sys.stdin.fileno()
+    old_attrs = termios.tcgetattr(stdin)
+
+    def on_winch(_signum, _frame):
+        session.resize(*_terminal_size())
+
+    old_winch = signal.signal(signal.SIGWINCH, on_winch)
+    try:
+        tty.setraw(stdin)
+        while not session.closed:
+            ready, _, _ = select.select([stdin], [], [], 0.2)
+            if ready:
+                data = os.read(stdin, 4096)
+                if not data:
+                    break
+                session.write(data.decode(errors="ignore"))
+    finally:
+        termios.tcsetattr(stdin, termios.TCSADRAIN, old_attrs)
+        signal.signal(signal.SIGWINCH, old_winch)
+    return 0
+
+
+def run_fanout(args):
+    from fanout import FanoutRunner, load_hosts, parse_host, format_summary
+
+    hosts = load_hosts(args.hosts, args.user, args.port) if args.hosts else []
+    hosts += [parse_host(h, args.user, args.port) for h in args.host]
+    if not hosts:
+        print("No se indicaron hosts (--hosts ARCHIVO o -H host).", file=sys.stderr)
+        return 2
+    password = os.environ.get(args.password_env) if args.password_env else None
+    if not password:
+        password = getpass.getpass("Clave común para los hosts: ")
+    runner = FanoutRunner(password, concurrency=args.jobs, connect_timeout=args.connect_timeout,
+                          command_timeout=args.timeout, stream=None if args.quiet else sys.stdout)
+    start = time.perf_counter()
+    results = runner.run(hosts, args.remote_command)
+    print()
+    print(format_summary(results, time.perf_counter() - start))
+    return 0 if all(r.ok for r in results) else 1
+
+
+def run_replay(args):
+    """Reproduce una grabación asciicast en la terminal actual."""
+    out = sys.stdout
+    player = ReplayPlayer(args.file, on_output=lambda text: (out.write(text), out.flush()),
+                          speed=args.speed, idle_limit=args.idle_limit or None)
+    if args.seek:
+        player.seek(args.seek)
+    player.start()
+    try:
+        while not player.wait(0.2):
+            pass
+    except KeyboardInterrupt:
+        player.stop()
+    return 0
+
+
+def main(argv=None):
+    _load_env()
+    parser = argparse.ArgumentParser(description="Cliente SSH Upiloto (modo consola)")
+    sub = parser.add_subparsers(dest="modo", required=True)
+
+    p_ssh = sub.add_parser("ssh", help="sesión SSH")
+    p_ssh.add_argument("host", nargs="?", default=os.environ.get("DEFAULT_HOST", ""))
+    p_ssh.add_argument("-p", "--port", type=int, default=int(os.environ.get("DEFAULT_PORT", "22")))
+    p_ssh.add_argument("-u", "--user", default=os.environ.get("DEFAULT_USER", ""))
+    p_ssh.add_argument("--password-env", default="DEFAULT_PASS",
+                       help="variable de entorno con la clave (si no existe, se pide por consola)")
+    p_ssh.add_argument("--connect-timeout", type=float, default=30)
+
+    p_local = sub.add_parser("local", help="shell local sobre pty")
+    p_local.add_argument("--shell", default=None)
+
+    p_fan = sub.add_parser("fanout", help="ejecutar un comando en varios hosts en paralelo")
+    p_fan.add_argument("remote_command", help="comando a ejecutar en cada host")
+    p_fan.add_argument("--hosts", metavar="ARCHIVO", help="archivo con un [usuario@]host[:puerto] por línea")
+    p_fan.add_argument("-H", "--host", action="append", default=[], help="host adicional (repetible)")
+    p_fan.add_argument("-u", "--user", default=os.environ.get("DEFAULT_USER", ""))
+    p_fan.add_argument("-p", "--port", type=int, default=int(os.environ.get("DEFAULT_PORT", "22")))
+    p_fan.add_argument("--password-env", default="DEFAULT_PASS")
+    p_fan.add_argument("-j", "--jobs", type=int, default=16, help="hosts en paralelo")
+    p_fan.add_argument("--connect-timeout", type=float, default=10)
+    p_fan.add_argument("--timeout", type=float, default=300, help="tiempo máximo del comando por host")
+    p_fan.add_argument("-q", "--quiet", action="store_true", help="solo mostrar el resumen")
+
+    p_replay = sub.add_parser("replay", help="reproducir una grabación asciicast")
+    p_replay.add_argument("file", help="archivo .cast, .cast.gz o .cast.zst")
+    p_replay.add_argument("--speed", type=float, default=1.0, help="factor de velocidad")
+    p_replay.add_argument("--idle-limit", type=float, default=2.0, help="pausa máxima entre eventos (0 = sin límite)")
+    p_replay.add_argument("--seek", type=float, default=0.0, help="empezar en el segundo indicado")
+
+    for p in (p_ssh, p_local):
+        p.add_argument("-c", "--command", action="append", default=[],
+                       help="comando a ejecutar (repetible); sin -c la sesión es interactiva")
+        p.add_argument("--timeout", type=float, default=300, help="tiempo máximo de una ejecución con -c")
+        p.add_argument("--record", metavar="ARCHIVO",
+                       help="grabar la sesión en asciicast v2 (.gz/.zst comprime en streaming)")
+
+    args = parser.parse_args(argv)
+    if args.modo == "fanout":
+        return run_fanout(args)
+    if args.modo == "replay":
+        return run_replay(args)
+    if args.modo == "ssh" and (not args.host or not args.user):
+        parser.error("host y usuario son obligatorios (o DEFAULT_HOST/DEFAULT_USER en .env)")
+
+    session = _build_session(args)
+    out = sys.stdout
+    session.add_output_listener(lambda text: (out.write(text), out.flush()))
+    recorder = None
+    if args.record:
+        recorder = AsciicastRecorder(args.record, cols=session.cols, rows=session.rows).attach(session)
+
+    try:
+        session.start()
+    except SessionError as e:
+        print(f"No se pudo conectar: {e}", file=sys.stderr)
+        return 2
+    try:
+        if args.command or not sys.stdin.isatty():
+            commands = args.command or [line.rstrip("\n") for line in sys.stdin]
+            return run_script(session, commands, args.timeout)
+        return run_interactive(session)
+    finally:
+        session.close()
+        if recorder:
+            recorder.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
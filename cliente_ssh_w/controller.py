@@ -2,8 +2,8 @@
 from ssh_model import ModeloSSH
 
 class Controlador:
-    def __init__(self, host, puerto, usuario, clave):
-        self.modelo = ModeloSSH(host, puerto, usuario, clave)
+    def __init__(self, host, puerto, usuario, clave, salto=None):
+        self.modelo = ModeloSSH(host, puerto, usuario, clave, salto=salto)
 
     def conectar(self):
         try:
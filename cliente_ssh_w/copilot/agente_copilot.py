@@ -1,6 +1,6 @@
-from PyQt6.QtGui import QTextOption
 from PyQt6 import QtWidgets, QtCore
 from .widgets import AutoGrowTextEdit
+from .transcript_view import TranscriptView, escape_prompt
 
 class CopilotAgentWidget(QtWidgets.QWidget):
     """
@@ -17,6 +17,11 @@ class CopilotAgentWidget(QtWidgets.QWidget):
             self.controller.error_occurred.disconnect(self.show_error_message)
         except Exception:
             pass
+        try:
+            self.controller.command_finished.disconnect(self.show_command_result)
+            self.controller.commands_done.disconnect(self.show_commands_summary)
+        except Exception:
+            pass
 
         # Limpiar hilo de envío si existe
         if hasattr(self, '_send_thread') and self._send_thread is not None:
@@ -55,12 +60,29 @@ class CopilotAgentWidget(QtWidgets.QWidget):
         self.top_controls.addStretch()
         self.layout.addLayout(self.top_controls)
 
-        # Área de chat (solo lectura)
-        self.chat_area = QtWidgets.QTextEdit()
-        self.chat_area.setLineWrapMode(QtWidgets.QTextEdit.LineWrapMode.WidgetWidth)
-        self.chat_area.setWordWrapMode(QTextOption.WrapMode.WordWrap)
-        self.chat_area.setReadOnly(True)
-        self.chat_area.setAcceptRichText(True)
+        # Búsqueda en conversaciones guardadas
+        self.search_entry = QtWidgets.QLineEdit()
+        self.search_entry.setPlaceholderText("Buscar en conversaciones anteriores…")
+        self.search_entry.setClearButtonEnabled(True)
+        self.search_entry.textChanged.connect(self._on_search_text_changed)
+        self.search_entry.setVisible(self.controller.store is not None)
+        self.layout.addWidget(self.search_entry)
+
+        self.search_results = QtWidgets.QListWidget()
+        self.search_results.setMaximumHeight(160)
+        self.search_results.setVisible(False)
+        self.search_results.itemActivated.connect(self._on_search_result_activated)
+        self.layout.addWidget(self.search_results)
+
+        # Espera breve tras la última tecla para no consultar en cada pulsación
+        self._search_timer = QtCore.QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        self._search_timer.timeout.connect(self._run_search)
+
+        # Área de chat (solo lectura, virtualizada: solo pinta los mensajes visibles)
+        self.chat_area = TranscriptView()
+        self.chat_area.setObjectName("chatArea")
         self.chat_area.setMinimumHeight(390)
         self.chat_area.setMinimumWidth(250)
         self.layout.addWidget(self.chat_area)
@@ -76,12 +98,24 @@ class CopilotAgentWidget(QtWidgets.QWidget):
         self.input_layout.addWidget(self.send_button)
         self.layout.addLayout(self.input_layout)
 
+        # Sugerencias locales de comandos (índice en memoria, sin red)
+        self.suggestion_list = QtWidgets.QListWidget()
+        self.suggestion_list.setObjectName("suggestionList")
+        self.suggestion_list.setMaximumHeight(110)
+        self.suggestion_list.setVisible(False)
+        self.suggestion_list.itemClicked.connect(self._on_suggestion_chosen)
+        self.suggestion_list.itemActivated.connect(self._on_suggestion_chosen)
+        self.layout.addWidget(self.suggestion_list)
+        self.prompt_entry.textChanged.connect(self._update_suggestions)
+
         # Conectar la señal de Enter (sin Shift) ignorando el texto emitido
         self.prompt_entry.submitted.connect(lambda _text: self.on_send())
 
         # Conexión de señales del controlador
         self.controller.response_ready.connect(self.show_response)
         self.controller.error_occurred.connect(self.show_error_message)
+        self.controller.command_finished.connect(self.show_command_result)
+        self.controller.commands_done.connect(self.show_commands_summary)
 
         self._reset_conversation()
         self._load_styles()
@@ -97,11 +131,76 @@ class CopilotAgentWidget(QtWidgets.QWidget):
         self.controller.set_mode(self.agent_mode)
         self._reset_conversation()
 
+    def _on_search_text_changed(self, text):
+        if not text.strip():
+            self._search_timer.stop()
+            self.search_results.clear()
+            self.search_results.setVisible(False)
+            return
+        self._search_timer.start()
+
+    def _run_search(self):
+        self.search_results.clear()
+        try:
+            results = self.controller.search_history(self.search_entry.text())
+        except Exception as e:
+            self.show_error_message(str(e))
+            return
+        for r in results:
+            quien = "Tú" if r["role"] == "user" else "Copilot"
+            item = QtWidgets.QListWidgetItem(f"{r['title'] or '(sin título)'}\n  {quien}: {r['snippet']}")
+            item.setData(QtCore.Qt.ItemDataRole.UserRole, r["conversation_id"])
+            self.search_results.addItem(item)
+        if not results:
+            self.search_results.addItem("Sin resultados")
+        self.search_results.setVisible(True)
+
+    def _on_search_result_activated(self, item):
+        conversation_id = item.data(QtCore.Qt.ItemDataRole.UserRole)
+        if conversation_id is None:
+            return
+        try:
+            messages = self.controller.load_conversation(conversation_id)
+        except Exception as e:
+            self.show_error_message(str(e))
+            return
+        # Sincronizar el selector de modo sin disparar un reinicio
+        self.agent_mode = self.controller.mode
+        self.mode_selector.blockSignals(True)
+        self.mode_selector.setCurrentText(self.agent_mode.capitalize())
+        self.mode_selector.blockSignals(False)
+
+        rendered = []
+        for m in messages:
+            if m["role"] == "user":
+                rendered.append(f"<b>Tú:</b> {escape_prompt(m['content'])}<br>")
+            elif m["role"] == "assistant":
+                rendered.append(f"<b>Copilot:</b><br>{self.controller.md.render(m['content'])}<br>")
+        self.chat_area.set_messages(rendered)
+        self.search_entry.clear()
+
+    def _update_suggestions(self):
+        text = self.prompt_entry.toPlainText().strip()
+        suggestions = self.controller.suggest(text) if text else []
+        self.suggestion_list.clear()
+        if suggestions == [text]:
+            suggestions = []
+        for cmd in suggestions:
+            self.suggestion_list.addItem(cmd)
+        self.suggestion_list.setVisible(bool(suggestions))
+
+    def _on_suggestion_chosen(self, item):
+        self.prompt_entry.setPlainText(item.text())
+        cursor = self.prompt_entry.textCursor()
+        cursor.movePosition(cursor.MoveOperation.End)
+        self.prompt_entry.setTextCursor(cursor)
+        self.prompt_entry.setFocus()
+
     def on_send(self):
         prompt = self.prompt_entry.toPlainText().strip()
         if not prompt:
             return
-        self.chat_area.append(f"<b>Tú:</b> {prompt}<br>")
+        self.chat_area.append(f"<b>Tú:</b> {escape_prompt(prompt)}<br>")
         self.prompt_entry.clear()
         try:
             self.controller.send_prompt(prompt)
@@ -125,6 +224,29 @@ class CopilotAgentWidget(QtWidgets.QWidget):
     def show_error_message(self, message):
         self.chat_area.append(f"<span style='color:red;'><b>Error:</b> {message}</span><br>")
 
+    def show_command_result(self, result):
+        """Una línea por comando ejecutado en modo AGENT: estado, código y duración."""
+        first_line = escape_prompt(result.command.splitlines()[0])
+        if len(result.command.splitlines()) > 1:
+            first_line += " …"
+        if result.status == "ok":
+            status = "<span style='color:green;'>✔</span>"
+        elif result.status == "error":
+            status = f"<span style='color:red;'>✖ código {result.exit_code}</span>"
+        elif result.status == "timeout":
+            status = "<span style='color:orange;'>⏱ sin respuesta</span>"
+        else:
+            status = "<span style='color:gray;'>⏭ omitido</span>"
+        timing = f" — {result.duration:.2f} s" if result.status != "skipped" else ""
+        self.chat_area.append(f"{status} <code>{first_line}</code>{timing}")
+
+    def show_commands_summary(self, results):
+        if not results:
+            return
+        ok = sum(1 for r in results if r.status == "ok")
+        total = sum(r.duration for r in results)
+        self.chat_area.append(f"<i>{ok}/{len(results)} comandos correctos en {total:.2f} s</i><br>")
+
     # ----------------- System Prompts -----------------
 
     def _get_system_prompt(self):
@@ -1,23 +1,71 @@
 from PyQt6.QtCore import QObject, pyqtSignal
 
+from engine.pipeline import CommandPipeline
+
 class CopilotController(QObject):
     def set_mode(self, mode: str):
         self.mode = mode.upper() if isinstance(mode, str) else "ASK"
     response_ready = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
+    # Ejecución en modo AGENT: (índice, comando), CommandResult y lista final de CommandResult
+    command_started = pyqtSignal(int, str)
+    command_finished = pyqtSignal(object)
+    commands_done = pyqtSignal(object)
 
-    def __init__(self, openai_service, markdown_service, ssh_service=None, model="gpt-3.5-turbo"):
+    def __init__(self, openai_service, markdown_service, ssh_service=None, model="gpt-3.5-turbo", store=None,
+                 suggestions=None, docs=None):
         super().__init__()
         self.openai = openai_service
         self.md = markdown_service
         self.ssh = ssh_service
         self.model = model
+        self.store = store  # TranscriptStore opcional (persistencia y búsqueda)
+        self.suggestions = suggestions  # CommandSuggestionIndex opcional (sugerencias sin red)
+        self.docs = docs  # DocLibrary opcional (man y --help del servidor como contexto en modo ASK)
         self.history = []
         self.system_prompt = ""
+        self.conversation_id = None
+        self.pipeline = None
+        self.commands_done.connect(self._on_commands_done)
 
     def set_ssh_service(self, ssh_service):
         """Setter explícito para actualizar el backend SSH que se usará para enviar comandos."""
+        old = self.ssh
+        if self.pipeline is not None:
+            self.pipeline.cancel()
+            self.pipeline = None
+        if old is not None and hasattr(old, 'command_entered'):
+            try:
+                old.command_entered.disconnect(self._on_shell_command)
+            except Exception:
+                pass
         self.ssh = ssh_service
+        # Alimentar el índice de sugerencias con lo que el usuario ejecuta en la terminal
+        if ssh_service is not None and hasattr(ssh_service, 'command_entered'):
+            ssh_service.command_entered.connect(self._on_shell_command)
+        if self.docs:
+            self._attach_docs(ssh_service)
+
+    def _attach_docs(self, ssh_service):
+        """Índice de documentación del servidor de la sesión (de la caché o recogido en segundo plano)."""
+        transport = getattr(ssh_service, 'transport', None) if ssh_service is not None else None
+        session = getattr(ssh_service, 'session', None)
+        if transport is None or session is None:
+            self.docs.detach()
+            return
+        # --help también para lo que el usuario suele ejecutar y no tenga página de manual
+        programs = self.suggestions.programs() if self.suggestions is not None else []
+        self.docs.attach(transport, f"{session.host}:{session.port}", programs)
+
+    def _on_shell_command(self, command):
+        if self.suggestions is not None:
+            self.suggestions.add(command, "shell")
+
+    def suggest(self, text, limit=5):
+        """Sugerencias locales e instantáneas para el texto del prompt."""
+        if self.suggestions is None:
+            return []
+        return self.suggestions.suggest(text, limit)
 
     def set_system_prompt(self, prompt):
         self.system_prompt = prompt
@@ -28,11 +76,70 @@ class CopilotController(QObject):
 
     def reset_history(self):
         self.history = [{"role": "system", "content": self.system_prompt}]
+        # La conversación anterior queda guardada; la nueva se registra con su primer mensaje
+        self.conversation_id = None
+
+    def search_history(self, text, limit=50):
+        """Busca en conversaciones pasadas. Retorna lista vacía si no hay almacén."""
+        if not self.store:
+            return []
+        return self.store.search(text, limit)
+
+    def load_conversation(self, conversation_id):
+        """
+        Reabre una conversación guardada como historial actual.
+        Los mensajes nuevos se siguen agregando a esa misma conversación.
+        Retorna la lista de mensajes (sin el de sistema) para re-pintar el chat.
+        """
+        if not self.store:
+            raise Exception("No hay almacén de conversaciones configurado.")
+        mode, history = self.store.load_conversation(conversation_id)
+        self.set_mode(mode)
+        self.system_prompt = history[0]["content"]
+        self.history = history
+        self.conversation_id = conversation_id
+        return history[1:]
+
+    def close(self):
+        """Vacía y cierra el almacén de conversaciones, si existe."""
+        if self.store:
+            try:
+                self.store.close()
+            except Exception as e:
+                print(f"Error cerrando almacén Copilot: {e}")
+            self.store = None
+        if self.suggestions is not None:
+            self.suggestions.save()
+
+    def _record(self, role, content, commands=None):
+        if not self.store:
+            return
+        try:
+            if self.conversation_id is None:
+                self.conversation_id = self.store.start_conversation(getattr(self, 'mode', 'ASK'), self.system_prompt)
+            self.store.add_message(self.conversation_id, role, content, commands)
+        except Exception as e:
+            print(f"Error guardando mensaje Copilot: {e}")
 
     def send_prompt(self, prompt):
         # Solo el controlador maneja el hilo de OpenAI
         from PyQt6.QtCore import QThread, pyqtSignal, QObject
+        first_turn = self._first_turn()
         self.history.append({"role": "user", "content": prompt})
+        self._record("user", prompt)
+
+        # Coincidencia exacta en el índice local, solo al empezar (después la respuesta depende
+        # de la conversación): se muestra al instante como sugerencia y la petición sigue su curso
+        local = self.suggestions.exact(getattr(self, 'mode', 'ASK'), prompt) \
+            if first_turn and self.suggestions is not None else None
+        if local:
+            self.response_ready.emit(
+                self.md.render(local) + "<i>(sugerencia local de una respuesta anterior; nunca se ejecuta. "
+                                        "Consultando al modelo…)</i>")
+
+        if self.openai is None:
+            self.error_occurred.emit("Copilot no disponible: falta OPENAI_API_KEY.")
+            return
 
         class OpenAIWorker(QObject):
             finished = pyqtSignal(object)
@@ -52,8 +159,17 @@ class CopilotController(QObject):
                 except Exception as e:
                     self.error.emit(str(e))
 
+        history = self.history.copy()
+        if getattr(self, 'mode', 'ASK') == "ASK" and self.docs:
+            # Solo en el mensaje enviado: el historial y la transcripción guardan la pregunta tal cual
+            context = self.docs.context(prompt)
+            if context:
+                history[-1] = {"role": "user", "content": (
+                    f"{prompt}\n\nExtractos de la documentación instalada en el servidor "
+                    f"(úsalos si vienen al caso y cita el comando):\n\n{context}")}
+
         self._thread = QThread()
-        self._worker = OpenAIWorker(self.openai, self.history.copy(), self.model)
+        self._worker = OpenAIWorker(self.openai, history, self.model)
         self._worker.moveToThread(self._thread)
         self._thread.started.connect(self._worker.run)
         self._worker.finished.connect(self._on_openai_response)
@@ -66,18 +182,68 @@ class CopilotController(QObject):
     def _on_openai_response(self, response):
         try:
             content = response.choices[0].message.content.strip()
+        except Exception as e:
+            self.error_occurred.emit(f"Error procesando respuesta: {e}")
+            return
+        self._handle_content(content)
+
+    def _first_turn(self, upto=None):
+        """True si el historial (hasta `upto`) aún no tiene turnos: solo mensajes de sistema."""
+        return not any(m["role"] in ("user", "assistant") for m in self.history[:upto])
+
+    def _handle_content(self, content):
+        try:
+            prompt = self.history[-1]["content"] if self.history and self.history[-1]["role"] == "user" else ""
+            # Solo se guardan para reutilizar las respuestas que no dependen de turnos anteriores
+            cacheable = bool(prompt) and self._first_turn(-1)
             self.history.append({"role": "assistant", "content": content})
-            html_content = self.md.render(content)
-            self.response_ready.emit(html_content)
+            mode = getattr(self, 'mode', 'ASK')
+            self.response_ready.emit(self.md.render(content))
             code = self.md.extract_code(content)
+            self._record("assistant", content, code)
+            if self.suggestions is not None:
+                if cacheable:
+                    self.suggestions.add_answer(mode, prompt, content)
+                if code:
+                    self.suggestions.add(code, "copilot")
             # Solo enviar comandos si el modo es AGENT
-            if code and self.ssh and getattr(self, 'mode', 'ASK') == "AGENT":
+            if code and self.ssh and mode == "AGENT":
                 try:
-                    self.ssh.send_command(code)
+                    self.run_commands(code)
                 except Exception as e:
                     self.error_occurred.emit(f"Error enviando comando SSH: {e}")
         except Exception as e:
             self.error_occurred.emit(f"Error procesando respuesta: {e}")
 
+    def run_commands(self, code):
+        """
+        Ejecuta el bloque en la terminal comando a comando (o adelantado si es seguro),
+        detectando el fin y el código de salida de cada uno (ver engine.pipeline).
+        Sin sesión del motor (backend antiguo) se envía el bloque entero como antes.
+        """
+        session = getattr(self.ssh, 'session', None)
+        if session is None:
+            self.ssh.send_command(code)
+            return
+        if self.pipeline is not None and not self.pipeline.done:
+            self.pipeline.cancel()
+        # Los callbacks llegan desde el hilo lector; las señales los encolan al hilo de la GUI
+        self.pipeline = CommandPipeline(
+            session,
+            on_started=self.command_started.emit,
+            on_finished=self.command_finished.emit,
+            on_done=self.commands_done.emit,
+        ).run(code)
+
+    def _on_commands_done(self, results):
+        """Deja constancia del resultado en el historial para que el modelo sepa qué falló."""
+        if not results:
+            return
+        lines = []
+        for r in results:
+            detail = f"código {r.exit_code}" if r.exit_code is not None else r.status
+            lines.append(f"- `{r.command.splitlines()[0]}`: {detail} ({r.duration:.2f}s)")
+        self.history.append({"role": "system", "content": "Resultado de los comandos ejecutados:\n" + "\n".join(lines)})
+
     def _on_openai_error(self, error_msg):
         self.error_occurred.emit(f"Error en OpenAI: {error_msg}")
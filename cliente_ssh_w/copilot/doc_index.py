@@ -0,0 +1,548 @@
+"""
+Índice local de documentación del servidor para dar contexto a Copilot.
+
+Una sola vez por servidor se recogen por un canal exec las páginas de manual
+(secciones 1 y 8, en fuente roff tal cual: sin renderizar con groff, que es lo
+lento) y la salida de `--help` de los programas que el usuario ejecuta y no
+tienen página (solo binarios ELF, con timeout). Todo viaja comprimido con gzip. Aquí se pasa el roff a texto, se
+parte en pasajes por sección y se construye un índice BM25 disperso con NumPy:
+por término, los pasajes donde aparece y la contribución BM25 ya calculada, así
+que una consulta es concatenar unas pocas listas, un bincount y un argpartition.
+
+El índice se guarda en ~/.upiloto/docs/<host>_<puerto>.npz (COPILOT_DOCS_DIR
+para otra carpeta) y se carga al volver a conectar sin tocar el servidor.
+
+    python -m copilot.doc_index      # benchmark de recogida, construcción y consulta
+"""
+import os
+import re
+import shlex
+import threading
+import time
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # sin NumPy Copilot funciona igual, solo que sin contexto de documentación
+    np = None
+
+K1 = 1.2
+B = 0.75
+PASSAGE_CHARS = 1200
+# Secciones que solo hablan de la página (licencia, autores...) y atraen consultas por palabras comunes
+SKIP_SECTIONS = frozenset(("COPYRIGHT", "COPYRIGHT NOTICE", "COPYING", "AUTHOR", "AUTHORS", "REPORTING BUGS", "BUGS",
+                           "SEE ALSO", "LICENSE", "HISTORY", "COLOPHON", "ACKNOWLEDGEMENTS", "AVAILABILITY"))
+
+# Fuente roff de las páginas (1 y 8) y --help de los programas pedidos que no tienen página.
+# Cada documento empieza por \036nombre\tfuente\n; la salida entera va por gzip si lo hay.
+_HARVEST_SCRIPT = r"""
+dirs=$(manpath 2>/dev/null | tr ':' ' ')
+[ -n "$dirs" ] || dirs="/usr/local/share/man /usr/share/man"
+harvest() {
+for d in $dirs; do
+    for f in "$d"/man1/* "$d"/man8/*; do
+        [ -f "$f" ] || continue
+        n=${f##*/}; n=${n%.gz}; n=${n%.xz}; n=${n%.bz2}; n=${n%.*}
+        printf '\036%s\tman\n' "$n"
+        case "$f" in
+            *.gz) gzip -dc "$f" ;;
+            *.xz) xz -dc "$f" ;;
+            *.bz2) bzip2 -dc "$f" ;;
+            *) cat "$f" ;;
+        esac 2>/dev/null | head -c 262144
+    done
+done
+command -v timeout >/dev/null 2>&1 || return 0
+for c in "$@"; do
+    found=
+    for d in $dirs; do
+        for f in "$d"/man1/"$c".* "$d"/man8/"$c".*; do [ -f "$f" ] && found=1; done
+    done
+    [ -z "$found" ] || continue
+    # Solo ejecutables ELF: un script que no entienda --help podría hacer su trabajo
+    p=$(command -v "$c" 2>/dev/null)
+    case "$p" in /*) ;; *) continue ;; esac
+    head -c 4 "$p" 2>/dev/null | grep -q ELF || continue
+    printf '\036%s\thelp\n' "$c"
+    timeout 3 "$p" --help </dev/null 2>&1 | head -c 65536
+done
+}
+if command -v gzip >/dev/null 2>&1; then harvest "$@" | gzip -1 -c; else harvest "$@"; fi
+"""
+
+_COMMAND_RE = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.+-]*$")
+# Nunca con --help, aunque no tengan página: alguno no mira los argumentos
+_NO_HELP = frozenset(("reboot", "shutdown", "halt", "poweroff", "init", "telinit", "runlevel", "kexec"))
+_TOKEN_RE = re.compile(r"--?[a-z0-9][a-z0-9_-]*|[a-z0-9][a-z0-9_+]*(?:[.-][a-z0-9_+]+)*")
+_STOPWORDS = frozenset(
+    "the a an of to in is are be by for on or and with as at it this that from not no if its can will "
+    "how do does what why when where you your want need use using see "
+    "el la los las de del en un una y o que por para con se su sus al lo como es más mas qué como "
+    "cómo hacer quiero puedo ver hace sirve usar cuál cual hay mi me".split())
+_QUERY_WORD_RE = re.compile(r"[a-z0-9][a-z0-9_+.-]*")
+
+# Escapes de roff: fuentes y tamaños fuera, caracteres especiales habituales a texto
+_ROFF_SPECIAL = {"em": "—", "en": "–", "aq": "'", "dq": '"', "lq": '"', "rq": '"', "oq": "'", "cq": "'",
+                 "bu": "•", "co": "©", "hy": "-", "mi": "-", "ti": "~", "ha": "^", "rs": "\\", "pc": "·",
+                 "ga": "`", "ul": "_", "ba": "|", "lh": "<", "rh": ">", "->": "→", "<-": "←"}
+_ROFF_ESCAPE_RE = re.compile(
+    r"\\(?:f(?:\(..|\[[^\]]*\]|.)|s[-+]?\d+|s\(\d\d|\*(?:\(..|\[[^\]]*\]|.)|\((..)|\[([^\]]*)\]|n(?:\(..|\[[^\]]*\]|.)"
+    r"|[&:/,%|^c)]|(e)|(-)|( |~|0)|(\"|#).*)")
+_MDOC_HEADINGS = ("Sh", "SH", "Ss", "SS")
+_MDOC_INLINE = frozenset(
+    "Ar Cm Dv Er Ev Fa Fn Ic Li Nm Pa Sy Va Xr Op Oo Oc Pq Po Pc Bq Bo Bc Dq Do Dc Qq Ql Sq Em Ad An Ao Ac "
+    "Aq Brq Ns Ox Nx Fx Bx Ux At St Tn No Ft Fo Fc Vt Lk Mt Ms".split())
+
+
+def default_docs_dir():
+    return os.getenv("COPILOT_DOCS_DIR") or os.path.join(os.path.expanduser("~"), ".upiloto", "docs")
+
+
+def _stem(token):
+    # Plegado mínimo de sufijos ingleses: "files"/"file", "preserving"/"preserve", "recursively"/"recursive"
+    if token[0] == "-" or len(token) <= 3:
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    for _ in range(2):
+        for suffix in ("ing", "ed", "ly", "es", "s", "e"):
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3 and not token.endswith("ss"):
+                token = token[:-len(suffix)]
+                break
+        else:
+            break
+    return token
+
+
+def _ascii_words(text):
+    """
+    Sin las palabras con letras no ASCII: las páginas están en inglés y "qué" o "cómo"
+    solo darían trozos sueltos ("qu", "mo") que cuentan como palabras sin encontrar.
+    """
+    return " ".join(w for w in text.split() if w.isascii())
+
+
+def tokenize(text):
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS and (len(t) > 1 or t[0] == "-")]
+
+
+def _roff_escape(match):
+    special, bracket, backslash, minus, space = match.group(1, 2, 3, 4, 5)
+    if special is not None:
+        return _ROFF_SPECIAL.get(special, "")
+    if bracket is not None:
+        return _ROFF_SPECIAL.get(bracket, "")
+    if backslash:
+        return "\\"
+    if minus:
+        return "-"
+    if space:
+        return " "
+    return ""
+
+
+def _roff_args(line):
+    try:
+        return shlex.split(line, posix=True)
+    except ValueError:
+        return line.split()
+
+
+def roff_to_text(source):
+    """
+    Texto plano aproximado de una página en roff (man o mdoc). No es un formateador:
+    basta con que las palabras, opciones y encabezados queden legibles para buscar.
+    Devuelve [(sección, texto)] en orden.
+    """
+    sections = []
+    heading = "NAME"
+    lines = []
+    for raw in source.splitlines():
+        if raw.startswith((".\\\"", "'\\\"")) or raw in (".", "'"):
+            continue
+        if raw[:1] in (".", "'"):
+            parts = raw[1:].strip().split(None, 1)
+            if not parts:
+                continue
+            macro, rest = parts[0], (parts[1] if len(parts) > 1 else "")
+            rest = _ROFF_ESCAPE_RE.sub(_roff_escape, rest)
+            if macro in _MDOC_HEADINGS:
+                if lines:
+                    sections.append((heading, " ".join(lines)))
+                    lines = []
+                heading = " ".join(_roff_args(rest)).upper() or heading
+            elif macro in ("B", "I", "SM", "SB", "BR", "RB", "IR", "RI", "BI", "IB", "IP", "TQ", "Nd", "It"):
+                words = _roff_args(rest)
+                lines.append(("" if macro in ("BR", "RB", "IR", "RI", "BI", "IB") else " ").join(words))
+            elif macro == "Fl":
+                lines.append(" ".join("-" + w if w not in _MDOC_INLINE and w not in "|[]()" else "" for w in rest.split()))
+            elif macro in _MDOC_INLINE:
+                words = []
+                flag = False
+                for w in rest.split():
+                    if w == "Fl":
+                        flag = True
+                    elif w not in _MDOC_INLINE:
+                        words.append("-" + w if flag else w)
+                        flag = False
+                lines.append(" ".join(words))
+            # El resto (.PP, .TP, .RS, .nf, .de, .TH...) no aporta palabras
+            continue
+        text = _ROFF_ESCAPE_RE.sub(_roff_escape, raw).strip()
+        if text:
+            lines.append(text)
+    if lines:
+        sections.append((heading, " ".join(lines)))
+    return sections
+
+
+def help_to_sections(text):
+    return [("HELP", " ".join(text.split()))]
+
+
+def split_passages(name, sections, size=PASSAGE_CHARS):
+    """Pasajes de hasta `size` caracteres, cortados por sección y, dentro de ella, en límites de palabra."""
+    passages = []
+    for heading, text in sections:
+        if heading in SKIP_SECTIONS:
+            continue
+        start = 0
+        while start < len(text):
+            end = min(len(text), start + size)
+            if end < len(text):
+                cut = text.rfind(" ", start + size // 2, end)
+                end = cut if cut > start else end
+            chunk = text[start:end].strip()
+            if chunk:
+                passages.append((name, heading, chunk))
+            start = end
+    return passages
+
+
+def parse_harvest(stream):
+    """[(nombre, fuente, texto)] a partir de la salida (ya descomprimida) del script de recogida."""
+    docs = []
+    seen = set()
+    for block in stream.split("\x1e")[1:]:
+        header, _, body = block.partition("\n")
+        name, _, source = header.partition("\t")
+        # .so: la página solo redirige a otra que ya se recoge por su nombre
+        if not name or (name, source) in seen or not body.strip() or body.lstrip().startswith(".so "):
+            continue
+        seen.add((name, source))
+        docs.append((name, source, body))
+    return docs
+
+
+def harvest(transport, commands=(), timeout=900):
+    """Recoge man y --help del servidor por un canal exec. Devuelve [(nombre, fuente, texto)]."""
+    commands = [c for c in commands if _COMMAND_RE.match(c) and c not in _NO_HELP]
+    channel = transport.open_session()
+    channel.settimeout(timeout)
+    try:
+        channel.exec_command("sh -c " + shlex.quote(_HARVEST_SCRIPT) + " harvest "
+                             + " ".join(shlex.quote(c) for c in commands))
+        chunks = []
+        while True:
+            data = channel.recv(1 << 16)
+            if not data:
+                break
+            chunks.append(data)
+    finally:
+        channel.close()
+    raw = b"".join(chunks)
+    if raw[:2] == b"\x1f\x8b":
+        raw = zlib.decompress(raw, 31)
+    return parse_harvest(raw.decode("utf-8", "replace"))
+
+
+class DocIndex:
+    """
+    Índice BM25 sobre pasajes. Estructura dispersa por término (tipo CSR):
+    los pasajes del término t son doc_ids[indptr[t]:indptr[t+1]] y su puntuación
+    BM25 precalculada weights[...]. El nombre del programa cuenta como palabras
+    del pasaje, repetido, para que "tar" encuentre antes tar(1) que las páginas que lo citan.
+
+    search() no devuelve cualquier solapamiento: un pasaje vale si es de un programa
+    que la consulta nombra, o si cubre casi todas sus palabras (las opciones tipo -a
+    no cuentan). Así una pregunta vaga o en otro idioma no arrastra páginas al azar.
+    """
+
+    NAME_BOOST = 3
+    # Pasajes de programas nombrados en la consulta: puntuación multiplicada por esto
+    NAMED_BOOST = 2.0
+    # Sin programa nombrado: palabras de la consulta que el pasaje debe contener
+    MIN_COVERAGE = 0.75
+    MIN_TERMS = 3
+
+    def __init__(self, names, headings, texts, vocab, indptr, doc_ids, weights):
+        self.names = names
+        self.headings = headings
+        self.texts = texts
+        self.vocab = vocab
+        self.term_ids = {t: i for i, t in enumerate(vocab)}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.passages_by_name = {}
+        for i, name in enumerate(names):
+            self.passages_by_name.setdefault(name, []).append(i)
+
+    def __len__(self):
+        return len(self.texts)
+
+    @classmethod
+    def build(cls, docs):
+        """docs: [(nombre, fuente, texto)] de harvest(). Requiere NumPy."""
+        passages = []
+        for name, source, body in docs:
+            sections = roff_to_text(body) if source == "man" else help_to_sections(body)
+            passages.extend(split_passages(name, sections))
+        term_ids = {}
+        doc_col = []
+        term_col = []
+        lengths = np.empty(len(passages), dtype=np.float32)
+        for i, (name, heading, text) in enumerate(passages):
+            tokens = tokenize(text) + tokenize(name) * cls.NAME_BOOST
+            lengths[i] = len(tokens)
+            ids = [term_ids.setdefault(t, len(term_ids)) for t in tokens]
+            term_col.extend(ids)
+            doc_col.extend([i] * len(ids))
+        n_docs, n_terms = len(passages), len(term_ids)
+        # Frecuencia de cada (término, pasaje) de una vez: claves únicas sobre término * N + pasaje
+        keys = np.asarray(term_col, dtype=np.int64) * max(n_docs, 1) + np.asarray(doc_col, dtype=np.int64)
+        keys, tf = np.unique(keys, return_counts=True)
+        terms = (keys // max(n_docs, 1)).astype(np.int32)
+        doc_ids = (keys % max(n_docs, 1)).astype(np.int32)
+        df = np.bincount(terms, minlength=n_terms)
+        indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(lengths.mean()) if n_docs else 1.0
+        tf = tf.astype(np.float32)
+        norm = K1 * (1 - B + B * lengths[doc_ids] / avgdl)
+        weights = (idf[terms] * tf * (K1 + 1) / (tf + norm)).astype(np.float32)
+        vocab = [None] * n_terms
+        for t, i in term_ids.items():
+            vocab[i] = t
+        return cls([p[0] for p in passages], [p[1] for p in passages], [p[2] for p in passages],
+                   vocab, indptr, doc_ids, weights)
+
+    def named_programs(self, query):
+        """Programas indexados que la consulta nombra ("tar.gz" nombra tar)."""
+        words = set()
+        for word in _QUERY_WORD_RE.findall(_ascii_words(query).lower()):
+            word = word.strip(".-")
+            words.add(word)
+            words.update(re.split(r"[.-]", word))
+        return {w for w in words if w in self.passages_by_name and w not in _STOPWORDS}
+
+    def search(self, query, k=3, per_name=1):
+        """
+        [(puntuación, nombre, sección, texto)] de los k mejores pasajes pertinentes, como
+        mucho `per_name` por programa; [] si ninguno lo es (ver la clase).
+        """
+        terms = set(tokenize(_ascii_words(query)))
+        for term in list(terms):
+            if "." in term or "-" in term[1:]:
+                terms.update(_stem(p) for p in re.split(r"[.-]", term) if len(p) > 1)
+        words = [t for t in terms if t[0] != "-"]
+        ids = [self.term_ids[t] for t in terms if t in self.term_ids]
+        if not ids or not words or not len(self):
+            return []
+        slices = [slice(self.indptr[i], self.indptr[i + 1]) for i in ids]
+        scores = np.bincount(np.concatenate([self.doc_ids[s] for s in slices]),
+                             weights=np.concatenate([self.weights[s] for s in slices]), minlength=len(self))
+        # Cuántas palabras (no opciones) de la consulta contiene cada pasaje
+        word_slices = [slice(self.indptr[self.term_ids[t]], self.indptr[self.term_ids[t] + 1])
+                       for t in words if t in self.term_ids]
+        hits = np.bincount(np.concatenate([self.doc_ids[s] for s in word_slices] or [np.zeros(0, np.int32)]),
+                           minlength=len(self))
+        eligible = hits >= max(self.MIN_TERMS, int(np.ceil(self.MIN_COVERAGE * len(words))))
+        named = self.named_programs(query)
+        if named:
+            # Con el nombre basta si el resto de la consulta no está en el índice (p. ej. en castellano)
+            needed = min(2, len(word_slices))
+            passages = np.concatenate([np.asarray(self.passages_by_name[n], dtype=np.int64) for n in named])
+            named_ok = passages[hits[passages] >= needed]
+            if len(named_ok):
+                # Otros programas solo si cubren la consulta entera
+                eligible &= hits >= len(words)
+                eligible[named_ok] = True
+                scores[named_ok] *= self.NAMED_BOOST
+        scores = np.where(eligible, scores, 0.0)
+        wanted = min(len(scores), k * 8)
+        top = np.argpartition(-scores, wanted - 1)[:wanted]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        counts = {}
+        for i in top:
+            if scores[i] <= 0:
+                break
+            name = self.names[i]
+            if counts.get(name, 0) >= per_name:
+                continue
+            counts[name] = counts.get(name, 0) + 1
+            results.append((float(scores[i]), name, self.headings[i], self.texts[i]))
+            if len(results) == k:
+                break
+        return results
+
+    # ----------------- Persistencia -----------------
+
+    def save(self, path):
+        """Un único .npz: textos y vocabulario como bloques UTF-8 con desplazamientos."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        def pack(strings):
+            encoded = [s.encode("utf-8") for s in strings]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+            return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+        arrays = {"indptr": self.indptr, "doc_ids": self.doc_ids, "weights": self.weights}
+        for field in ("names", "headings", "texts", "vocab"):
+            arrays[field], arrays[field + "_offsets"] = pack(getattr(self, field))
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            def unpack(field):
+                blob = data[field].tobytes()
+                offsets = data[field + "_offsets"]
+                return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+            return cls(unpack("names"), unpack("headings"), unpack("texts"), unpack("vocab"),
+                       data["indptr"], data["doc_ids"], data["weights"])
+
+
+class DocLibrary:
+    """
+    Índices por servidor, para CopilotController. attach() carga el índice en caché
+    o lo recoge y construye en segundo plano; mientras tanto context() devuelve "".
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_docs_dir()
+        self.index = None
+        self.key = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def path_for(self, key):
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", key) + ".npz")
+
+    def attach(self, transport, key, commands=()):
+        """Índice del servidor `key` (p. ej. "host:22"): de la caché o, la primera vez, del servidor."""
+        if np is None:
+            print("NumPy no está instalado: Copilot sin índice de documentación.")
+            return
+        with self._lock:
+            if key == self.key:
+                return
+            self.key = key
+            self.index = None
+        self._thread = threading.Thread(target=self._load_or_harvest, args=(transport, key, list(commands)),
+                                        name="DocLibrary", daemon=True)
+        self._thread.start()
+
+    def _load_or_harvest(self, transport, key, commands):
+        path = self.path_for(key)
+        try:
+            start = time.perf_counter()
+            if os.path.exists(path):
+                index = DocIndex.load(path)
+                what = "cargado de caché"
+            else:
+                index = DocIndex.build(harvest(transport, commands))
+                index.save(path)
+                what = "recogido del servidor"
+        except Exception as e:
+            print(f"No se pudo preparar el índice de documentación de {key}: {e}")
+            return
+        with self._lock:
+            if self.key != key:
+                return
+            self.index = index
+        print(f"Índice de documentación de {key} {what}: {len(index)} pasajes en {time.perf_counter() - start:.1f}s")
+
+    def detach(self):
+        with self._lock:
+            self.key = None
+            self.index = None
+
+    def refresh(self, transport, commands=()):
+        """Descarta la caché del servidor actual y vuelve a recogerla (tras instalar paquetes, p. ej.)."""
+        key = self.key
+        if key is None:
+            return
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+        self.detach()
+        self.attach(transport, key, commands)
+
+    def context(self, query, k=3, max_chars=3000):
+        """Extractos para añadir al prompt ("" si no hay índice o nada pertinente)."""
+        index = self.index
+        if index is None:
+            return ""
+        parts = []
+        used = 0
+        for _, name, heading, text in index.search(query, k):
+            snippet = f"[{name} — {heading}]\n{text}"
+            if used + len(snippet) > max_chars:
+                break
+            parts.append(snippet)
+            used += len(snippet)
+        return "\n\n".join(parts)
+
+
+def _benchmark():
+    """Recogida contra engine.loopback (las páginas de esta máquina), construcción, caché y consultas."""
+    import tempfile
+
+    from engine.loopback import LoopbackServer
+
+    with LoopbackServer() as server:
+        client = server.client()
+        start = time.perf_counter()
+        docs = harvest(client.get_transport(), commands=["python3", "pip"])
+        harvested = time.perf_counter() - start
+        client.close()
+    size = sum(len(d[2]) for d in docs)
+    print(f"recogida: {len(docs)} documentos, {size / (1 << 20):.1f} MB de fuente en {harvested:.2f}s")
+    start = time.perf_counter()
+    index = DocIndex.build(docs)
+    built = time.perf_counter() - start
+    print(f"construcción: {len(index)} pasajes, {len(index.vocab)} términos, {len(index.doc_ids)} entradas "
+          f"en {built:.2f}s")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.npz")
+        index.save(path)
+        start = time.perf_counter()
+        index = DocIndex.load(path)
+        print(f"caché: {os.path.getsize(path) / (1 << 20):.1f} MB, carga en {(time.perf_counter() - start) * 1000:.0f} ms")
+    queries = ["extract a tar.gz archive", "copy files recursively preserving permissions",
+               "show listening tcp ports", "change file owner", "find files modified in the last day",
+               "compress with gzip", "cómo ver el uso de disco", "grep recursive ignore case",
+               "sort numerically and remove duplicates", "python3 run module"]
+    timings = []
+    for _ in range(20):
+        for q in queries:
+            start = time.perf_counter()
+            index.search(q, 3)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"consulta: mediana {timings[len(timings) // 2] * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
+    for q in queries[:5]:
+        print(f"  {q!r}: " + ", ".join(f"{name} ({heading.lower()})" for _, name, heading, _ in index.search(q, 3)))
+
+
+if __name__ == "__main__":
+    _benchmark()
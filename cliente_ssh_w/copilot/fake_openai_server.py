@@ -0,0 +1,162 @@
+"""
+Servidor local compatible con /v1/chat/completions para pruebas y benchmarks sin la API real.
+
+Uso:
+    python -m copilot.fake_openai_server                # benchmark de latencia extremo a extremo
+    python -m copilot.fake_openai_server --serve 8765   # solo servir (OPENAI_BASE_URL=http://127.0.0.1:8765/v1)
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIServer:
+    """
+    Servidor HTTP/1.1 keep-alive que responde como la API de chat de OpenAI.
+
+    :param latency: segundos de espera simulada por respuesta.
+    :param failure_rate: probabilidad de responder 429/503 (para probar reintentos).
+    :param reply: función (messages) -> str que genera el contenido de la respuesta.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, reply=None, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.reply = reply or self._default_reply
+        self.requests = 0
+        self.connections = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="FakeOpenAIServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    @staticmethod
+    def _default_reply(messages):
+        last = messages[-1]["content"] if messages else ""
+        return f"Respuesta simulada a: {last[:60]}\n```bash\necho ok\n```"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Sin Nagle: cabeceras y cuerpo van en escrituras separadas sobre la misma conexión
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", "0"))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                    fail = server._rng.random() < server.failure_rate
+                if server.latency:
+                    time.sleep(server.latency)
+                if not self.path.endswith("/chat/completions"):
+                    return self._send(404, {"error": {"message": "not found"}})
+                if fail:
+                    return self._send(429, {"error": {"message": "rate limited (simulado)"}}, {"Retry-After": "0"})
+                content = server.reply(body.get("messages", []))
+                prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+                completion_tokens = len(content.split())
+                self._send(200, {
+                    "id": f"chatcmpl-fake-{server.requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens},
+                })
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def _benchmark(n=200, latency=0.0, failure_rate=0.05):
+    from engine import metrics as upiloto_metrics
+    from .openai_service import OpenAIService
+    from .http_client import RetryPolicy
+
+    server = FakeOpenAIServer(latency=latency, failure_rate=failure_rate, seed=1).start()
+    messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": "lista archivos"}]
+    try:
+        policy = RetryPolicy(max_attempts=5, base_delay=0.01, max_delay=0.05)
+        service = OpenAIService("fake-key", default_model="fake", base_url=server.base_url, retry_policy=policy)
+        start = time.perf_counter()
+        for _ in range(n):
+            service.chat(messages)
+        pooled = time.perf_counter() - start
+        pooled_conns = server.connections
+        latency = upiloto_metrics.copilot_latency.labels("fake", "ok")
+        retries = upiloto_metrics.copilot_errors.labels("fake", "retryable").value
+        print(f"pooled: {n} llamadas en {pooled:.3f}s, conexiones={pooled_conns}, "
+              f"media {latency.sum / max(1, latency.count) * 1000:.1f} ms, {retries} reintentos")
+        service.close()
+
+        # Referencia: un cliente nuevo por llamada (un handshake por prompt)
+        server.connections = 0
+        start = time.perf_counter()
+        for _ in range(n):
+            single = OpenAIService("fake-key", default_model="fake", base_url=server.base_url, retry_policy=policy)
+            single.chat(messages)
+            single.close()
+        fresh = time.perf_counter() - start
+        print(f"sin pool: {n} llamadas en {fresh:.3f}s, conexiones={server.connections}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor OpenAI simulado / benchmark de Copilot")
+    parser.add_argument("--serve", type=int, metavar="PUERTO", help="solo servir en el puerto indicado")
+    parser.add_argument("-n", type=int, default=200, help="llamadas del benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, help="latencia simulada por respuesta (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="probabilidad de 429 simulado")
+    args = parser.parse_args()
+    if args.serve is not None:
+        srv = FakeOpenAIServer(port=args.serve, latency=args.latency, failure_rate=args.failure_rate).start()
+        print(f"Sirviendo en {srv.base_url} (Ctrl+C para salir)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            srv.stop()
+    else:
+        _benchmark(args.n, args.latency, args.failure_rate)
@@ -0,0 +1,63 @@
+import random
+import time
+
+try:
+    import httpx
+except ImportError:
+    # Las versiones recientes del SDK dependen de httpx2, con la misma API
+    import httpx2 as httpx
+from openai import DefaultHttpxClient
+
+
+def build_http_client(max_connections=10, max_keepalive=5, keepalive_expiry=120.0, connect_timeout=10.0):
+    """
+    Cliente HTTP explícito con conexiones keep-alive reutilizables.
+    Se comparte entre llamadas para no repetir el handshake TCP/TLS en cada prompt.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=keepalive_expiry,
+    )
+    timeout = httpx.Timeout(None, connect=connect_timeout)
+    return DefaultHttpxClient(limits=limits, timeout=timeout)
+
+
+class RetryPolicy:
+    """
+    Backoff exponencial con jitter completo: espera aleatoria en [0, min(max_delay, base * 2**n)].
+    Respeta Retry-After cuando el servidor lo envía, sin superar max_delay.
+    """
+    RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def is_retryable_status(self, status):
+        return status in self.RETRYABLE_STATUS
+
+    def delay(self, attempt, retry_after=None):
+        """Espera antes del reintento número `attempt` (1 = primer reintento)."""
+        if retry_after is not None:
+            return min(self.max_delay, max(0.0, retry_after))
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return self._rng.uniform(0, cap)
+
+
+class Deadline:
+    """Plazo absoluto para una llamada completa, repartido entre sus intentos."""
+
+    def __init__(self, seconds):
+        self._end = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        if self._end is None:
+            return None
+        return max(0.0, self._end - time.monotonic())
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
@@ -1,25 +1,126 @@
 from openai import OpenAI
+import openai
 import os
+import time
+
+from engine import metrics as upiloto_metrics
+from .http_client import build_http_client, RetryPolicy, Deadline
 
 
 class OpenAIServiceError(Exception):
     pass
 
 
+class RetryableBackendError(Exception):
+    """Error transitorio de un backend (429/5xx, red o timeout). Admite reintento."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ChatBackend:
+    """
+    Interfaz de backend de chat. Implementaciones: OpenAIBackend (API real o cualquier
+    servidor compatible, p. ej. copilot/fake_openai_server.py) o dobles en memoria.
+    Debe retornar un objeto con .choices[0].message.content y lanzar
+    RetryableBackendError para errores transitorios.
+    """
+
+    def complete(self, messages, model, timeout):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class OpenAIBackend(ChatBackend):
+    def __init__(self, api_key, base_url=None, http_client=None):
+        self.http_client = http_client or build_http_client()
+        # Los reintentos los gestiona OpenAIService; el SDK no debe reintentar por su cuenta
+        self.client = OpenAI(api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0)
+
+    def complete(self, messages, model, timeout):
+        try:
+            return self.client.chat.completions.create(model=model, messages=messages, timeout=timeout)
+        except openai.APIStatusError as e:
+            if e.status_code in RetryPolicy.RETRYABLE_STATUS:
+                raise RetryableBackendError(str(e), self._retry_after(e.response)) from e
+            raise
+        except (openai.APIConnectionError, openai.APITimeoutError) as e:
+            raise RetryableBackendError(str(e)) from e
+
+    def close(self):
+        try:
+            self.http_client.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            value = response.headers.get("retry-after")
+            return float(value) if value is not None else None
+        except (AttributeError, ValueError):
+            return None
+
+
 class OpenAIService:
-    def __init__(self, api_key, default_model=None, timeout=None):
-        # Cliente oficial OpenAI v1
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key, default_model=None, timeout=None, backend=None, retry_policy=None,
+                 base_url=None, deadline=None):
+        # Backend intercambiable; por defecto el SDK oficial con conexiones keep-alive
+        self.backend = backend or OpenAIBackend(api_key, base_url=base_url or os.getenv("OPENAI_BASE_URL"))
         self.default_model = default_model or os.getenv("OPENAI_DEFAULT_MODEL", "gpt-5")
         self.timeout = timeout or float(os.getenv("OPENAI_TIMEOUT", "30"))
+        # Plazo total de una llamada, sumando todos sus reintentos
+        self.deadline = deadline or float(os.getenv("OPENAI_DEADLINE", str(self.timeout * 2)))
+        self.retry_policy = retry_policy or RetryPolicy()
 
     def chat(self, messages, model=None, timeout=None):
-        """Envía mensajes al modelo especificado y retorna la respuesta. Maneja errores y permite timeout/modelo por defecto."""
+        """Envía mensajes al modelo especificado y retorna la respuesta. Reintenta errores transitorios con backoff."""
         model = model or self.default_model
         timeout = timeout or self.timeout
-        try:
-            return self.client.chat.completions.create(model=model, messages=messages, timeout=timeout)
-        except Exception as e:
-            # Aquí podrías loguear el error con logging en vez de print
-            print(f"Error en OpenAIService.chat: {e}")
-            raise OpenAIServiceError(f"Error al comunicarse con OpenAI: {e}")
+        deadline = Deadline(self.deadline)
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline.remaining()
+            attempt_timeout = timeout if remaining is None else min(timeout, remaining)
+            try:
+                response = self.backend.complete(messages, model, attempt_timeout)
+                self._export(model, started, "ok", response)
+                return response
+            except RetryableBackendError as e:
+                wait = self.retry_policy.delay(attempt, e.retry_after)
+                remaining = deadline.remaining()
+                out_of_time = remaining is not None and remaining <= wait
+                if attempt >= self.retry_policy.max_attempts or out_of_time:
+                    # El último intento cuenta solo como definitivo, no también como transitorio
+                    self._export(model, started, "error")
+                    print(f"Error en OpenAIService.chat tras {attempt} intentos: {e}")
+                    raise OpenAIServiceError(f"Error al comunicarse con OpenAI: {e}")
+                upiloto_metrics.copilot_errors.labels(model, "retryable").inc()
+                print(f"OpenAIService.chat: error transitorio ({e}); reintento {attempt} en {wait:.2f}s")
+                time.sleep(wait)
+            except Exception as e:
+                self._export(model, started, "error")
+                # Aquí podrías loguear el error con logging en vez de print
+                print(f"Error en OpenAIService.chat: {e}")
+                raise OpenAIServiceError(f"Error al comunicarse con OpenAI: {e}")
+
+    @staticmethod
+    def _export(model, started, result, response=None):
+        """Latencia, tokens y errores al registro de engine.metrics (exportable a Prometheus)."""
+        upiloto_metrics.copilot_latency.labels(model, result).observe(time.perf_counter() - started)
+        if result != "ok":
+            upiloto_metrics.copilot_errors.labels(model, "fatal").inc()
+            return
+        usage = getattr(response, "usage", None)
+        for kind in ("prompt_tokens", "completion_tokens"):
+            count = getattr(usage, kind, None)
+            if isinstance(count, int):
+                upiloto_metrics.copilot_tokens.labels(model, kind.split("_")[0]).inc(count)
+
+    def close(self):
+        self.backend.close()
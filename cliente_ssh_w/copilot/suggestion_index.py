@@ -0,0 +1,207 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+
+
+def default_index_path():
+    """Ruta por defecto del índice de comandos (configurable con COPILOT_COMMANDS_PATH)."""
+    path = os.getenv("COPILOT_COMMANDS_PATH")
+    if path:
+        return path
+    return os.path.join(os.path.expanduser("~"), ".upiloto", "commands.json")
+
+
+_TOKEN_RE = re.compile(r"[\w./:-]+", re.UNICODE)
+
+
+def _tokens(text):
+    return {t.lower() for t in _TOKEN_RE.findall(text or "") if len(t) > 1}
+
+
+def _normalize_prompt(text):
+    return " ".join((text or "").lower().split())
+
+
+class _TrieNode:
+    __slots__ = ("children", "command_id")
+
+    def __init__(self):
+        self.children = {}
+        self.command_id = None
+
+
+class CommandSuggestionIndex:
+    """
+    Índice local de comandos ya ejecutados (shell y respuestas Copilot).
+
+    - Trie por prefijo para completar lo que el usuario está escribiendo.
+    - Índice invertido por token para consultas en lenguaje natural.
+    - Ranking por frecuencia y recencia (decaimiento exponencial).
+    - Mapa de respuestas por prompt normalizado para responder sin red.
+    """
+
+    def __init__(self, path=None, half_life_days=14.0, max_prefix_scan=500, max_answers=2000):
+        self.path = path
+        self._half_life = half_life_days * 86400.0
+        self._max_prefix_scan = max_prefix_scan
+        self._max_answers = max_answers
+        self._lock = threading.Lock()
+        self._commands = []      # id -> [texto, conteo, último uso, fuente]
+        self._by_text = {}       # texto -> id
+        self._root = _TrieNode()
+        self._postings = {}      # token -> set(ids)
+        self._answers = {}       # (modo, prompt normalizado) -> contenido de la respuesta
+        if path:
+            self.load()
+
+    # ----------------- Alta -----------------
+
+    def add(self, command, source="shell", when=None):
+        """Registra una ejecución del comando. Ignora líneas vacías o triviales."""
+        command = (command or "").strip()
+        if len(command) < 2:
+            return
+        when = when or time.time()
+        with self._lock:
+            cmd_id = self._by_text.get(command)
+            if cmd_id is None:
+                cmd_id = len(self._commands)
+                self._commands.append([command, 0, when, source])
+                self._by_text[command] = cmd_id
+                self._insert_trie(command, cmd_id)
+                for token in _tokens(command):
+                    self._postings.setdefault(token, set()).add(cmd_id)
+            entry = self._commands[cmd_id]
+            entry[1] += 1
+            entry[2] = max(entry[2], when)
+
+    def add_answer(self, mode, prompt, content):
+        """Recuerda la respuesta del modelo a un prompt, para reutilizarla ante el mismo prompt."""
+        key = (mode, _normalize_prompt(prompt))
+        if not key[1] or not content:
+            return
+        with self._lock:
+            self._answers.pop(key, None)
+            self._answers[key] = content
+            while len(self._answers) > self._max_answers:
+                self._answers.pop(next(iter(self._answers)))
+
+    def _insert_trie(self, command, cmd_id):
+        node = self._root
+        for ch in command:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.command_id = cmd_id
+
+    # ----------------- Consulta -----------------
+
+    def _score(self, entry, now):
+        age = max(0.0, now - entry[2])
+        recency = math.exp(-age * math.log(2) / self._half_life)
+        return math.log1p(entry[1]) + 2.0 * recency
+
+    def _prefix_ids(self, prefix):
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        ids, stack = [], [node]
+        while stack and len(ids) < self._max_prefix_scan:
+            n = stack.pop()
+            if n.command_id is not None:
+                ids.append(n.command_id)
+            stack.extend(n.children.values())
+        return ids
+
+    def suggest(self, text, limit=5):
+        """
+        Sugerencias para el texto del prompt: primero completado por prefijo,
+        luego coincidencias por token. Retorna lista de comandos.
+        """
+        text = (text or "").strip()
+        if not text:
+            return []
+        now = time.time()
+        with self._lock:
+            scores = {}
+            for cmd_id in self._prefix_ids(text):
+                scores[cmd_id] = 10.0 + self._score(self._commands[cmd_id], now)
+            query = _tokens(text)
+            if query:
+                hits = {}
+                for token in query:
+                    for cmd_id in self._postings.get(token, ()):
+                        hits[cmd_id] = hits.get(cmd_id, 0) + 1
+                for cmd_id, matched in hits.items():
+                    score = 5.0 * matched / len(query) + self._score(self._commands[cmd_id], now)
+                    if score > scores.get(cmd_id, 0.0):
+                        scores[cmd_id] = score
+            best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+            return [self._commands[cmd_id][0] for cmd_id, _ in best]
+
+    def exact(self, mode, prompt):
+        """
+        Respuesta local para un prompt ya visto (mismo modo), o un bloque con el comando
+        si el prompt es literalmente un comando conocido. None si no hay coincidencia exacta.
+        """
+        with self._lock:
+            answer = self._answers.get((mode, _normalize_prompt(prompt)))
+            if answer:
+                return answer
+            cmd_id = self._by_text.get((prompt or "").strip())
+            if cmd_id is not None:
+                return f"```bash\n{self._commands[cmd_id][0]}\n```"
+        return None
+
+    def programs(self, source="shell", limit=200):
+        """Programas (primera palabra) de los comandos de `source`, de más a menos usados."""
+        counts = {}
+        with self._lock:
+            for command, count, _, entry_source in self._commands:
+                if entry_source == source:
+                    program = command.split()[0].rsplit("/", 1)[-1]
+                    counts[program] = counts.get(program, 0) + count
+        return sorted(counts, key=counts.get, reverse=True)[:limit]
+
+    def __len__(self):
+        return len(self._commands)
+
+    # ----------------- Persistencia -----------------
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Error cargando índice de comandos '{self.path}': {e}")
+            return
+        for command, count, last_used, source in data.get("commands", []):
+            self.add(command, source, last_used)
+            with self._lock:
+                self._commands[self._by_text[command]][1] = count
+        for mode, prompt, content in data.get("answers", []):
+            self.add_answer(mode, prompt, content)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "commands": [list(e) for e in self._commands],
+                "answers": [[mode, prompt, content] for (mode, prompt), content in self._answers.items()],
+            }
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"Error guardando índice de comandos '{self.path}': {e}")
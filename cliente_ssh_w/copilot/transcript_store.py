@@ -0,0 +1,256 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+
+class TranscriptStoreError(Exception):
+    pass
+
+
+def default_db_path():
+    """Ruta por defecto de la base de datos de conversaciones (configurable con COPILOT_DB_PATH)."""
+    path = os.getenv("COPILOT_DB_PATH")
+    if path:
+        return path
+    return os.path.join(os.path.expanduser("~"), ".upiloto", "copilot.db")
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    mode TEXT NOT NULL,
+    system_prompt TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id INTEGER NOT NULL REFERENCES conversations(id),
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    commands TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, commands, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content, commands) VALUES (new.id, new.content, new.commands);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content, commands) VALUES ('delete', old.id, old.content, old.commands);
+END;
+"""
+
+
+class TranscriptStore:
+    """
+    Persistencia local de las conversaciones Copilot en SQLite con índice FTS5.
+
+    Las escrituras se encolan y las aplica un hilo dedicado, de modo que el hilo
+    de la UI nunca espera al disco. Las búsquedas usan una conexión de solo
+    lectura aparte (modo WAL), por lo que no compiten con el escritor.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_db_path()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # El escritor crea el esquema antes de aceptar trabajos
+        self._queue = queue.Queue()
+        self._ready = threading.Event()
+        self._init_error = None
+        self._writer = threading.Thread(target=self._writer_loop, name="TranscriptStoreWriter", daemon=True)
+        self._writer.start()
+        self._ready.wait()
+        if self._init_error:
+            raise TranscriptStoreError(f"No se pudo abrir la base de conversaciones: {self._init_error}")
+
+        self._read_conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._read_conn.row_factory = sqlite3.Row
+        self._read_lock = threading.Lock()
+
+    # ----------------- Escritura asíncrona -----------------
+
+    def _writer_loop(self):
+        try:
+            # Transacciones explícitas (BEGIN/COMMIT y un SAVEPOINT por trabajo)
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+        except Exception as e:
+            self._init_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            # Agrupar lo que haya pendiente en una sola transacción
+            jobs = [job]
+            stop = False
+            while True:
+                try:
+                    extra = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is None:
+                    stop = True
+                    break
+                jobs.append(extra)
+            self._apply(conn, jobs)
+            if stop:
+                break
+        conn.close()
+
+    @staticmethod
+    def _apply(conn, jobs):
+        """
+        Una transacción para todo el lote y un SAVEPOINT por trabajo: un trabajo que
+        falla se deshace solo, sin arrastrar los mensajes ajenos del mismo lote.
+        """
+        done = []
+        try:
+            conn.execute("BEGIN")
+            for sql, params, future in jobs:
+                if sql is None:
+                    continue
+                conn.execute("SAVEPOINT job")
+                try:
+                    cursor = conn.execute(sql, params)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    print(f"Error guardando conversación Copilot: {e}")
+                    if future is not None:
+                        future.set_exception(e)
+                else:
+                    if future is not None:
+                        done.append((future, cursor.lastrowid))
+                conn.execute("RELEASE job")
+            conn.execute("COMMIT")
+        except Exception as e:
+            print(f"Error guardando conversación Copilot: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for future, _ in done:
+                future.set_exception(e)
+            done = []
+        for future, rowid in done:
+            future.set_result(rowid)
+        # Barreras de flush(): todo lo anterior ya está aplicado
+        for sql, event, _ in jobs:
+            if sql is None:
+                event.set()
+
+    def _submit(self, sql, params, future=None):
+        self._queue.put((sql, params, future))
+
+    def start_conversation(self, mode, system_prompt, timeout=5.0):
+        """
+        Da de alta una conversación y retorna su id, asignado por SQLite: varios
+        procesos o instancias sobre la misma base no pueden repetirlo.
+        """
+        future = Future()
+        self._submit(
+            "INSERT INTO conversations(started_at, mode, system_prompt) VALUES (?, ?, ?)",
+            (time.time(), mode, system_prompt), future,
+        )
+        try:
+            return future.result(timeout)
+        except Exception as e:
+            raise TranscriptStoreError(f"No se pudo crear la conversación: {e}")
+
+    def add_message(self, conversation_id, role, content, commands=None):
+        """Encola un mensaje. El primer mensaje del usuario se usa como título."""
+        if conversation_id is None:
+            return
+        self._submit(
+            "INSERT INTO messages(conversation_id, role, content, commands, created_at) VALUES (?, ?, ?, ?, ?)",
+            (conversation_id, role, content, commands or "", time.time()),
+        )
+        if role == "user":
+            self._submit(
+                "UPDATE conversations SET title = ? WHERE id = ? AND title = ''",
+                (content.strip().splitlines()[0][:120] if content.strip() else "", conversation_id),
+            )
+
+    def flush(self, timeout=5.0):
+        """Espera a que el escritor aplique todo lo encolado hasta ahora (útil al cerrar)."""
+        barrier = threading.Event()
+        self._queue.put((None, barrier, None))
+        return barrier.wait(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+        try:
+            self._read_conn.close()
+        except Exception:
+            pass
+
+    # ----------------- Lectura -----------------
+
+    def search(self, text, limit=50):
+        """
+        Busca en prompts, respuestas y comandos extraídos.
+        Retorna una lista de dicts ordenada por relevancia (bm25).
+        """
+        query = self._fts_query(text)
+        if not query:
+            return []
+        sql = (
+            "SELECT m.id AS message_id, m.conversation_id, m.role, m.created_at, c.title, "
+            "snippet(messages_fts, -1, '[', ']', '…', 12) AS snippet "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "JOIN conversations c ON c.id = m.conversation_id "
+            "WHERE messages_fts MATCH ? ORDER BY bm25(messages_fts) LIMIT ?"
+        )
+        try:
+            with self._read_lock:
+                rows = self._read_conn.execute(sql, (query, limit)).fetchall()
+        except sqlite3.Error as e:
+            raise TranscriptStoreError(f"Error en la búsqueda: {e}")
+        return [dict(r) for r in rows]
+
+    def load_conversation(self, conversation_id):
+        """Retorna (mode, history) con el formato de mensajes que usa CopilotController."""
+        with self._read_lock:
+            conv = self._read_conn.execute(
+                "SELECT mode, system_prompt FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            if conv is None:
+                raise TranscriptStoreError(f"No existe la conversación {conversation_id}.")
+            rows = self._read_conn.execute(
+                "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY id", (conversation_id,)
+            ).fetchall()
+        history = [{"role": "system", "content": conv["system_prompt"]}]
+        history.extend({"role": r["role"], "content": r["content"]} for r in rows)
+        return conv["mode"], history
+
+    def recent_conversations(self, limit=20):
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                "SELECT id, started_at, mode, title FROM conversations WHERE title != '' "
+                "ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    @staticmethod
+    def _fts_query(text):
+        """Convierte texto libre en una consulta FTS5 segura (términos con prefijo, unidos por AND)."""
+        terms = []
+        for raw in (text or "").split():
+            term = raw.replace('"', '""')
+            if term:
+                terms.append(f'"{term}"*')
+        return " ".join(terms)
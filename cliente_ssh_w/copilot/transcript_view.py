@@ -0,0 +1,259 @@
+# --- Componente auxiliar: transcripción virtualizada del chat Copilot ---
+import html
+from collections import OrderedDict
+
+from PyQt6 import QtWidgets, QtCore, QtGui
+
+
+class TranscriptModel(QtCore.QAbstractListModel):
+    """
+    Modelo de la transcripción del chat.
+
+    Guarda todos los mensajes como texto HTML plano (barato), pero solo expone
+    a la vista una ventana acotada de los más recientes. Los anteriores se
+    cargan por páginas cuando el usuario sube hasta el inicio.
+    """
+    HtmlRole = QtCore.Qt.ItemDataRole.UserRole + 1
+    IdRole = QtCore.Qt.ItemDataRole.UserRole + 2
+
+    def __init__(self, max_loaded=200, page_size=50, parent=None):
+        super().__init__(parent)
+        self._max_loaded = max_loaded
+        self._page_size = page_size
+        self._messages = []   # lista de (id, html)
+        self._first = 0       # índice del primer mensaje expuesto a la vista
+        self._next_id = 0
+
+    # ----------------- API de Qt -----------------
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._messages) - self._first
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        msg_id, msg_html = self._messages[self._first + index.row()]
+        if role == self.HtmlRole:
+            return msg_html
+        if role == self.IdRole:
+            return msg_id
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return QtGui.QTextDocumentFragment.fromHtml(msg_html).toPlainText()
+        return None
+
+    # ----------------- API propia -----------------
+
+    def append_html(self, msg_html, trim=True):
+        """Agrega un mensaje al final. Coste constante: no re-maqueta los anteriores."""
+        row = self.rowCount()
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self._messages.append((self._next_id, msg_html))
+        self._next_id += 1
+        self.endInsertRows()
+        if trim:
+            self.trim_loaded()
+
+    def trim_loaded(self):
+        """Descarga de la vista los mensajes más antiguos si se supera el tope."""
+        excess = self.rowCount() - self._max_loaded
+        if excess <= 0:
+            return
+        self.beginRemoveRows(QtCore.QModelIndex(), 0, excess - 1)
+        self._first += excess
+        self.endRemoveRows()
+
+    def has_older(self):
+        return self._first > 0
+
+    def load_older(self):
+        """Expone una página más de mensajes antiguos. Devuelve cuántos se cargaron."""
+        count = min(self._page_size, self._first)
+        if count <= 0:
+            return 0
+        self.beginInsertRows(QtCore.QModelIndex(), 0, count - 1)
+        self._first -= count
+        self.endInsertRows()
+        return count
+
+    def set_messages(self, html_list):
+        """Reemplaza la transcripción completa (p. ej. al reabrir una conversación)."""
+        self.beginResetModel()
+        self._messages = []
+        for msg_html in html_list:
+            self._messages.append((self._next_id, msg_html))
+            self._next_id += 1
+        self._first = max(0, len(self._messages) - self._max_loaded)
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self._messages = []
+        self._first = 0
+        self.endResetModel()
+
+
+class HtmlMessageDelegate(QtWidgets.QStyledItemDelegate):
+    """
+    Pinta cada mensaje con un QTextDocument propio.
+
+    Los documentos renderizados viven en una caché LRU acotada (solo los
+    visibles y algunos vecinos), y las alturas se memorizan por (id, ancho)
+    para que el maquetado de la lista no vuelva a parsear HTML.
+    """
+
+    def __init__(self, parent=None, max_cached_docs=64, padding=6):
+        super().__init__(parent)
+        self._docs = OrderedDict()
+        self._max_cached_docs = max_cached_docs
+        self._heights = {}
+        self._padding = padding
+        self._default_css = ""
+
+    def set_default_css(self, css):
+        self._default_css = css
+        self.invalidate()
+
+    def invalidate(self):
+        self._docs.clear()
+        self._heights.clear()
+
+    def _document(self, msg_id, msg_html, width):
+        doc = self._docs.get(msg_id)
+        if doc is None:
+            doc = QtGui.QTextDocument()
+            if self._default_css:
+                doc.setDefaultStyleSheet(self._default_css)
+            doc.setHtml(msg_html)
+            self._docs[msg_id] = doc
+            if len(self._docs) > self._max_cached_docs:
+                self._docs.popitem(last=False)
+        else:
+            self._docs.move_to_end(msg_id)
+        if doc.textWidth() != width:
+            doc.setTextWidth(width)
+        return doc
+
+    def _content_width(self, option):
+        return max(50, option.rect.width() - 2 * self._padding)
+
+    def sizeHint(self, option, index):
+        msg_id = index.data(TranscriptModel.IdRole)
+        width = self._content_width(option)
+        key = (msg_id, width)
+        height = self._heights.get(key)
+        if height is None:
+            doc = self._document(msg_id, index.data(TranscriptModel.HtmlRole), width)
+            height = int(doc.size().height()) + 2 * self._padding
+            self._heights[key] = height
+        return QtCore.QSize(option.rect.width(), height)
+
+    def paint(self, painter, option, index):
+        msg_id = index.data(TranscriptModel.IdRole)
+        doc = self._document(msg_id, index.data(TranscriptModel.HtmlRole), self._content_width(option))
+
+        painter.save()
+        if option.state & QtWidgets.QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        painter.translate(option.rect.left() + self._padding, option.rect.top() + self._padding)
+        ctx = QtGui.QAbstractTextDocumentLayout.PaintContext()
+        ctx.palette.setColor(QtGui.QPalette.ColorRole.Text, option.palette.color(QtGui.QPalette.ColorRole.Text))
+        ctx.clip = QtCore.QRectF(0, 0, option.rect.width(), option.rect.height())
+        doc.documentLayout().draw(painter, ctx)
+        painter.restore()
+
+
+class TranscriptView(QtWidgets.QListView):
+    """
+    Vista de solo lectura para el chat. Sustituye al QTextEdit con append():
+    agregar un mensaje cuesta lo mismo sin importar la longitud del historial.
+    """
+
+    def __init__(self, parent=None, max_loaded=200, page_size=50):
+        super().__init__(parent)
+        self._model = TranscriptModel(max_loaded=max_loaded, page_size=page_size, parent=self)
+        self._delegate = HtmlMessageDelegate(self)
+        self.setModel(self._model)
+        self.setItemDelegate(self._delegate)
+
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setResizeMode(QtWidgets.QListView.ResizeMode.Adjust)
+        self.setWordWrap(True)
+        self.setUniformItemSizes(False)
+        self.setLayoutMode(QtWidgets.QListView.LayoutMode.Batched)
+        self.setBatchSize(20)
+
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self._show_context_menu)
+
+    # ----------------- API usada por CopilotAgentWidget -----------------
+
+    def append(self, msg_html):
+        """Mismo contrato que QTextEdit.append(): agrega un bloque HTML."""
+        at_bottom = self._is_at_bottom()
+        # Si el usuario está leyendo arriba no descargamos lo que está mirando
+        self._model.append_html(msg_html, trim=at_bottom)
+        if at_bottom:
+            self.scrollToBottom()
+
+    def set_messages(self, html_list):
+        self._delegate.invalidate()
+        self._model.set_messages(html_list)
+        self.scrollToBottom()
+
+    def clear(self):
+        self._delegate.invalidate()
+        self._model.clear()
+
+    def selected_text(self):
+        rows = sorted(self.selectionModel().selectedRows(), key=lambda i: i.row())
+        return "\n\n".join(i.data(QtCore.Qt.ItemDataRole.DisplayRole) for i in rows)
+
+    # ----------------- Internos -----------------
+
+    def _is_at_bottom(self):
+        bar = self.verticalScrollBar()
+        return bar.value() >= bar.maximum() - 4
+
+    def _on_scrolled(self, value):
+        if value > 0 or not self._model.has_older():
+            return
+        # Cargar la página anterior conservando la posición visual
+        bar = self.verticalScrollBar()
+        old_max = bar.maximum()
+        if self._model.load_older():
+            self.doItemsLayout()
+            bar.setValue(bar.maximum() - old_max)
+
+    def resizeEvent(self, e):
+        # Las alturas memorizadas dependen del ancho
+        super().resizeEvent(e)
+        self._delegate._heights.clear()
+
+    def keyPressEvent(self, event: QtGui.QKeyEvent):
+        if event.matches(QtGui.QKeySequence.StandardKey.Copy):
+            QtWidgets.QApplication.clipboard().setText(self.selected_text())
+            return
+        super().keyPressEvent(event)
+
+    def _show_context_menu(self, pos):
+        if not self.selectionModel().selectedRows():
+            index = self.indexAt(pos)
+            if not index.isValid():
+                return
+            self.setCurrentIndex(index)
+        menu = QtWidgets.QMenu(self)
+        copy_action = menu.addAction("Copiar")
+        chosen = menu.exec(self.viewport().mapToGlobal(pos))
+        if chosen == copy_action:
+            QtWidgets.QApplication.clipboard().setText(self.selected_text())
+
+
+def escape_prompt(text):
+    """Escapa el texto del usuario antes de insertarlo como HTML en la transcripción."""
+    return html.escape(text).replace("\n", "<br>")
@@ -0,0 +1,90 @@
+"""Adaptador asyncio para las sesiones de engine.session."""
+import asyncio
+import threading
+
+
+class AsyncSession:
+    """
+    Envuelve una ShellSession para usarla desde asyncio.
+
+        session = AsyncSession(SshSession(host, 22, user, password))
+        await session.start()
+        session.send_command("uname -a")
+        async for chunk in session.output():
+            ...
+
+    Como mucho `max_queue` bloques de salida esperan al consumidor; con la cola
+    llena el hilo lector de la sesión se detiene hasta que haya sitio, y la
+    contrapresión llega al canal (nunca se descarta salida). El fin de la sesión
+    siempre llega a output(), con la cola llena o no.
+    """
+
+    def __init__(self, session, max_queue=1024):
+        self.session = session
+        self._queue = None
+        self._max_queue = max_queue
+        self._loop = None
+        # Bloques en la cola o en camino hacia ella; el centinela de cierre no ocupa sitio
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._closing = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self.session.add_output_listener(self._on_output)
+        self.session.add_close_listener(self._on_close)
+        # La conexión es bloqueante: se hace fuera del bucle de eventos
+        await self._loop.run_in_executor(None, self.session.start)
+        return self
+
+    def _on_output(self, text):
+        # Consumidor lento: el hilo lector espera sitio, salvo que la sesión se esté cerrando
+        while not self._slots.acquire(timeout=0.1):
+            if self._closing or self.session.closed:
+                return
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, text)
+        except RuntimeError:
+            # Bucle de eventos ya cerrado: nadie va a leer el bloque
+            self._slots.release()
+
+    def _on_close(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+
+    async def output(self):
+        """Itera los bloques de salida hasta que la sesión termina."""
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                # Se deja el centinela para el siguiente iterador (p. ej. otro read_until)
+                self._queue.put_nowait(None)
+                return
+            self._slots.release()
+            yield item
+
+    async def read_until(self, marker, timeout=None):
+        """Acumula salida hasta encontrar `marker`. Retorna todo lo leído."""
+        acc = ""
+
+        async def _collect():
+            nonlocal acc
+            async for chunk in self.output():
+                acc += chunk
+                if marker in acc:
+                    return
+        await asyncio.wait_for(_collect(), timeout)
+        return acc
+
+    def write(self, data):
+        self.session.write(data)
+
+    def send_command(self, command):
+        self.session.send_command(command)
+
+    def resize(self, cols, rows):
+        self.session.resize(cols, rows)
+
+    async def close(self):
+        self._closing = True
+        await asyncio.get_running_loop().run_in_executor(None, self.session.close)
@@ -0,0 +1,460 @@
+"""
+Difusión de solo lectura de una sesión a varios espectadores.
+
+BroadcastHub se engancha como oyente de salida de una ShellSession y reparte
+cada bloque a N suscriptores (otras terminales Qt, el visor web de ShareServer).
+El hilo lector de la sesión solo hace trabajo O(suscriptores) sin bloquear:
+añadir el bloque al búfer circular compartido y a la cola acotada de cada
+suscriptor. Cada suscriptor vacía su cola desde su propio hilo o temporizador.
+
+Un suscriptor que no da abasto (su cola pasa de `queue_bytes`) no frena a nadie:
+se descarta lo que tenía pendiente y, cuando vuelve a leer, recibe un reset de
+terminal seguido del búfer circular, igual que quien se une tarde.
+
+ShareServer sirve a localhost la página de xterm.js incluida con la aplicación y
+un WebSocket (RFC 6455, solo stdlib) por el que viaja la salida. La URL lleva un
+token aleatorio: lo que se ve en la terminal puede incluir secretos.
+
+    python -m engine.broadcast      # benchmark: coste para el dueño con espectadores lentos
+"""
+import base64
+import collections
+import hashlib
+import json
+import os
+import secrets
+import socket
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from engine import metrics
+
+# Reset completo (RIS): el espectador parte de cero antes de recibir el historial
+RESET = "\x1bc"
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "UglyWidgets", "static")
+_STATIC_FILES = {"xterm.min.js": "application/javascript", "xterm.min.css": "text/css",
+                 "xterm-addon-fit.min.js": "application/javascript"}
+
+dropped_bytes = metrics.REGISTRY.counter(
+    "upiloto_broadcast_dropped_bytes_total", "Salida descartada para espectadores lentos (se resincronizan).")
+resyncs = metrics.REGISTRY.counter(
+    "upiloto_broadcast_resyncs_total", "Veces que un espectador recibió reset + historial en lugar de su cola.")
+
+
+class Subscriber:
+    """
+    Cola acotada de un espectador. get() bloquea hasta que hay datos y devuelve
+    el texto pendiente de una vez ("" si vence el timeout, None si se cerró).
+    """
+
+    def __init__(self, hub):
+        self._hub = hub
+        self._pending = collections.deque()
+        self._bytes = 0
+        self._resync = False
+        self._ready = threading.Event()
+        self.closed = False
+        self.dropped = 0
+        self.resyncs = 0
+
+    def get(self, timeout=None):
+        if not self._ready.wait(timeout):
+            return None if self.closed else ""
+        return self._hub._drain(self)
+
+    def drain(self):
+        """Sin bloquear: lo pendiente, "" si no hay nada, None si se cerró."""
+        return self._hub._drain(self)
+
+    def close(self):
+        self._hub.unsubscribe(self)
+
+
+class BroadcastHub:
+    """
+    :param history_bytes: tamaño del búfer circular para quien se une tarde (o se resincroniza).
+    :param queue_bytes: pendiente máximo por suscriptor antes de descartar y resincronizar.
+    """
+
+    def __init__(self, history_bytes=256 * 1024, queue_bytes=1024 * 1024, cols=80, rows=24):
+        self.history_bytes = history_bytes
+        self.queue_bytes = queue_bytes
+        # Tamaño de la terminal del dueño: los visores web lo imitan
+        self.cols = cols
+        self.rows = rows
+        self.closed = False
+        self.dropped = 0      # bytes descartados a espectadores lentos, en total
+        self._history = collections.deque()
+        self._history_size = 0
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def feed(self, text):
+        """Oyente de salida de la sesión (hilo lector): nunca bloquea más que un append por espectador."""
+        size = len(text)
+        dropped = 0
+        with self._lock:
+            self._history.append(text)
+            self._history_size += size
+            while self._history_size > self.history_bytes and len(self._history) > 1:
+                self._history_size -= len(self._history.popleft())
+            for sub in self._subscribers:
+                if sub._resync:
+                    sub.dropped += size
+                    dropped += size
+                    continue
+                sub._pending.append(text)
+                sub._bytes += size
+                if sub._bytes > self.queue_bytes:
+                    sub.dropped += sub._bytes
+                    dropped += sub._bytes
+                    sub._pending.clear()
+                    sub._bytes = 0
+                    sub._resync = True
+                # Event.set toma el lock interno del Event: solo si el espectador no está ya avisado
+                if not sub._ready.is_set():
+                    sub._ready.set()
+        if dropped:
+            self.dropped += dropped
+            dropped_bytes.inc(dropped)
+
+    def resize(self, cols, rows):
+        self.cols, self.rows = cols, rows
+
+    def subscribe(self):
+        """Nuevo espectador; su primera lectura trae el historial reciente."""
+        sub = Subscriber(self)
+        with self._lock:
+            if self.closed:
+                sub.closed = True
+            elif self._history:
+                sub._pending.append(RESET + "".join(self._history))
+                sub._bytes = self._history_size
+            self._subscribers.append(sub)
+            sub._ready.set()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+            sub.closed = True
+            sub._ready.set()
+
+    def _drain(self, sub):
+        with self._lock:
+            if sub._resync:
+                sub._resync = False
+                sub.resyncs += 1
+                resyncs.inc()
+                text = RESET + "".join(self._history)
+            else:
+                text = "".join(sub._pending)
+            sub._pending.clear()
+            sub._bytes = 0
+            if not sub.closed:
+                sub._ready.clear()
+        if not text and sub.closed:
+            return None
+        return text
+
+    @property
+    def subscribers(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def close(self):
+        """Fin de la sesión: los espectadores reciben lo pendiente y luego None."""
+        with self._lock:
+            self.closed = True
+            subs, self._subscribers = self._subscribers, []
+        for sub in subs:
+            sub.closed = True
+            sub._ready.set()
+
+
+# ----------------- Visor web -----------------
+
+_VIEWER_PAGE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="UTF-8">
+<title>upiloto · sesión compartida (solo lectura)</title>
+<link rel="stylesheet" href="static/xterm.min.css">
+<script src="static/xterm.min.js"></script>
+<style>
+body { margin: 0; background: #141414; color: #999; font: 12px sans-serif; }
+#status { padding: 4px 8px; }
+#terminal { padding: 0 8px; }
+</style>
+</head>
+<body>
+<div id="status">Conectando…</div>
+<div id="terminal"></div>
+<script>
+const term = new Terminal({disableStdin: true, cursorBlink: false, scrollback: 5000});
+term.open(document.getElementById('terminal'));
+const status = document.getElementById('status');
+const ws = new WebSocket((location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + '/ws' + location.search);
+ws.onopen = () => { status.textContent = 'En directo · solo lectura'; };
+ws.onclose = () => { status.textContent = 'Sesión terminada o conexión perdida'; };
+ws.onmessage = ev => {
+    const msg = JSON.parse(ev.data);
+    if (msg.size) term.resize(msg.size[0], msg.size[1]);
+    if (msg.out) term.write(msg.out);
+};
+</script>
+</body>
+</html>
+"""
+
+
+def _ws_frame(payload, opcode=0x1):
+    header = bytearray([0x80 | opcode])
+    size = len(payload)
+    if size < 126:
+        header.append(size)
+    elif size < 1 << 16:
+        header.append(126)
+        header += struct.pack("!H", size)
+    else:
+        header.append(127)
+        header += struct.pack("!Q", size)
+    return bytes(header) + payload
+
+
+def _recv_exact(sock, n):
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("conexión cerrada")
+        data += chunk
+    return data
+
+
+def _ws_read_frame(sock):
+    """(opcode, payload) de una trama del cliente (siempre enmascarada)."""
+    b0, b1 = _recv_exact(sock, 2)
+    size = b1 & 0x7F
+    if size == 126:
+        size = struct.unpack("!H", _recv_exact(sock, 2))[0]
+    elif size == 127:
+        size = struct.unpack("!Q", _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if b1 & 0x80 else b"\0\0\0\0"
+    payload = bytearray(_recv_exact(sock, size)) if size else bytearray()
+    for i in range(len(payload)):
+        payload[i] ^= mask[i % 4]
+    return b0 & 0x0F, bytes(payload)
+
+
+class ShareServer:
+    """
+    :param hub: BroadcastHub que se difunde.
+    :param port: puerto en `host` (0: uno libre; ver .url tras start()).
+    :param host: por defecto solo localhost.
+    """
+
+    def __init__(self, hub, port=0, host="127.0.0.1"):
+        self.hub = hub
+        self.host = host
+        self.port = port
+        self.token = secrets.token_urlsafe(16)
+        self.server = None
+        self._thread = None
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/?t={self.token}"
+
+    @property
+    def viewers(self):
+        with self._lock:
+            return len(self._connections)
+
+    def start(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        share = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path.startswith("/static/"):
+                    share._serve_static(self, parts.path[len("/static/"):])
+                    return
+                if parse_qs(parts.query).get("t", [""])[0] != share.token:
+                    self.send_error(403)
+                    return
+                if parts.path == "/":
+                    self._send(200, "text/html; charset=utf-8", _VIEWER_PAGE.encode())
+                elif parts.path == "/ws" and self.headers.get("Upgrade", "").lower() == "websocket":
+                    self.close_connection = True
+                    share._serve_websocket(self)
+                else:
+                    self.send_error(404)
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="ShareServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def _serve_static(self, handler, name):
+        content_type = _STATIC_FILES.get(name)
+        if content_type is None:
+            handler.send_error(404)
+            return
+        try:
+            with open(os.path.join(STATIC_DIR, name), "rb") as f:
+                body = f.read()
+        except OSError:
+            handler.send_error(404)
+            return
+        handler._send(200, content_type, body)
+
+    def _serve_websocket(self, handler):
+        key = handler.headers.get("Sec-WebSocket-Key")
+        if not key:
+            handler.send_error(400)
+            return
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        handler.send_response(101)
+        handler.send_header("Upgrade", "websocket")
+        handler.send_header("Connection", "Upgrade")
+        handler.send_header("Sec-WebSocket-Accept", accept)
+        handler.end_headers()
+        handler.wfile.flush()
+        sock = handler.connection
+        sock.settimeout(None)
+        sub = self.hub.subscribe()
+        with self._lock:
+            self._connections.add(sock)
+        send_lock = threading.Lock()
+        # Lo que manda el navegador (cierre, ping) se lee aparte: el bucle de envío solo espera a la cola
+        threading.Thread(target=self._read_client, args=(sock, sub, send_lock), name="ShareViewerReader",
+                         daemon=True).start()
+        size = None
+        try:
+            while True:
+                text = sub.get(timeout=20)
+                if text is None:
+                    break
+                message = {}
+                if size != (self.hub.cols, self.hub.rows):
+                    size = (self.hub.cols, self.hub.rows)
+                    message["size"] = size
+                if text:
+                    message["out"] = text
+                # Sin datos en 20 s: un ping mantiene viva la conexión a través de proxies
+                frame = _ws_frame(json.dumps(message).encode()) if message else _ws_frame(b"", 0x9)
+                with send_lock:
+                    sock.sendall(frame)
+            with send_lock:
+                sock.sendall(_ws_frame(struct.pack("!H", 1000), 0x8))
+        except OSError:
+            pass
+        finally:
+            sub.close()
+            with self._lock:
+                self._connections.discard(sock)
+
+    def _read_client(self, sock, sub, send_lock):
+        try:
+            while True:
+                opcode, payload = _ws_read_frame(sock)
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    with send_lock:
+                        sock.sendall(_ws_frame(payload, 0xA))
+        except (OSError, ConnectionError, ValueError):
+            pass
+        sub.close()
+
+    def stop(self):
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        with self._lock:
+            connections = list(self._connections)
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+
+def _benchmark():
+    """
+    Coste de feed() para el hilo lector con 0, 10 y 50 espectadores, la mitad de
+    ellos sin leer nunca, y un espectador WebSocket real contra ShareServer.
+    """
+    chunk = ("x" * 79 + "\n") * 50
+    n = 20000
+    for count in (0, 10, 50):
+        hub = BroadcastHub()
+        subs = [hub.subscribe() for _ in range(count)]
+        stop = threading.Event()
+
+        def reader(sub):
+            while not stop.is_set() and sub.get(timeout=0.1) is not None:
+                pass
+
+        readers = [threading.Thread(target=reader, args=(s,), daemon=True) for s in subs[: count // 2]]
+        for t in readers:
+            t.start()
+        start = time.perf_counter()
+        for _ in range(n):
+            hub.feed(chunk)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for t in readers:
+            t.join()
+        slow = subs[count // 2:]
+        print(f"{count:2d} espectadores: {elapsed / n * 1e6:.1f} us/bloque de {len(chunk)} B "
+              f"({n * len(chunk) / elapsed / (1 << 20):.0f} MB/s); "
+              f"lentos: {sum(s.dropped for s in slow) / (1 << 20):.0f} MB descartados")
+
+    hub = BroadcastHub()
+    server = ShareServer(hub).start()
+    sock = socket.create_connection((server.host, server.port))
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall((f"GET /ws?t={server.token} HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+    response = b""
+    while b"\r\n\r\n" not in response:
+        response += sock.recv(1024)
+    hub.feed("hola\r\n")
+    opcode, payload = _ws_read_frame(sock)
+    status = response.split(b"\r\n")[0].decode()
+    print(f"WebSocket: {status}, primera trama {json.loads(payload)}")
+    sock.close()
+    server.stop()
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,516 @@
+"""
+Preparación de la conexión TCP para paramiko: DNS en caché, known_hosts en caché
+y carrera de direcciones al estilo "happy eyeballs" (RFC 8305).
+
+paramiko.SSHClient.connect(hostname=...) resuelve el nombre en cada conexión y
+prueba las direcciones de una en una: una IPv6 muerta cuesta el timeout completo
+antes de intentar la siguiente. Aquí:
+
+  - las resoluciones se guardan con un TTL (las fallidas, con uno más corto);
+  - las direcciones se intercalan por familia y se lanza un intento nuevo cada
+    `stagger` segundos (o en cuanto uno falla) sin cancelar los anteriores; el
+    primero que conecta gana y los demás se cierran;
+  - known_hosts se analiza una vez y se vuelve a leer solo si cambia el archivo.
+
+El socket ganador se entrega a paramiko con sock=, así que la verificación de la
+clave del servidor sigue usando el nombre original.
+
+Con saltos (ProxyJump, como ssh -J) el destino va por un canal direct-tcpip del
+último bastión. Los bastiones se comparten: varias sesiones detrás del mismo
+bastión usan una sola conexión, que se cierra al soltarla la última.
+
+    python -m engine.connect      # benchmark con una IPv6 inalcanzable por delante
+"""
+import collections
+import errno
+import os
+import selectors
+import socket
+import threading
+import time
+
+DNS_TTL = 300.0
+DNS_NEGATIVE_TTL = 10.0
+STAGGER = 0.25
+_IN_PROGRESS = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, "WSAEWOULDBLOCK", -1))
+
+
+JumpHost = collections.namedtuple("JumpHost", "host port username password")
+# Un salto en el informe: nombre, ms hasta tenerlo autenticado y si se reutilizó uno ya abierto
+HopTiming = collections.namedtuple("HopTiming", "name ms shared")
+
+
+class ConnectReport:
+    """Qué pasó en una conexión: resolución, intentos, ganador y saltos (tiempos en ms)."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.addresses = []
+        self.dns_cached = False
+        self.dns_ms = 0.0
+        self.connect_ms = 0.0
+        self.known_hosts_cached = None  # None: no se cargaron
+        self.winner = None
+        self.attempts = []              # (dirección, "ok" | error, ms desde el inicio de la carrera)
+        self.hops = []                  # HopTiming por bastión
+        self.ssh_ms = 0.0               # negociación y autenticación con el destino
+        self._leases = []               # (BastionPool, _Bastion) a soltar al cerrar
+
+    def __str__(self):
+        text = f"{self.host}:{self.port}: "
+        if self.hops:
+            text += "saltos " + ", ".join(f"{h.name} {h.ms:.1f} ms" + (" (compartido)" if h.shared else "")
+                                          for h in self.hops)
+            text += f", canal {self.connect_ms:.1f} ms"
+        else:
+            source = "caché" if self.dns_cached else f"{self.dns_ms:.1f} ms"
+            text += f"DNS {source}, {len(self.addresses)} direcciones, TCP {self.connect_ms:.1f} ms"
+            if self.winner is not None:
+                text += f" por {self.winner[0]}"
+        if self.ssh_ms:
+            text += f", SSH {self.ssh_ms:.1f} ms"
+        failed = [a for a in self.attempts if a[1] != "ok"]
+        if failed:
+            text += ", fallidas: " + ", ".join(f"{a[0][0]} ({a[1]})" for a in failed)
+        return text
+
+    def release(self):
+        """Suelta los bastiones que usaba esta conexión (llamar al cerrarla; idempotente)."""
+        leases, self._leases = self._leases, []
+        for pool, lease in leases:
+            pool.release(lease)
+
+
+class DnsCache:
+    """getaddrinfo con caché por (host, puerto); getaddrinfo no da el TTL real, se usa uno fijo."""
+
+    def __init__(self, ttl=DNS_TTL, negative_ttl=DNS_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._data = {}  # (host, puerto) -> (caduca, [(familia, sockaddr)] | excepción)
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """Retorna ([(familia, sockaddr)], si venía de caché)."""
+        key = (host.lower(), port)
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+        if item is not None and item[0] > now:
+            if isinstance(item[1], Exception):
+                raise item[1]
+            return item[1], True
+        try:
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            with self._lock:
+                self._data[key] = (now + self.negative_ttl, e)
+            raise
+        addresses = []
+        for family, _, _, _, sockaddr in infos:
+            if (family, sockaddr) not in addresses:
+                addresses.append((family, sockaddr))
+        self.put(host, port, addresses)
+        return addresses, False
+
+    def put(self, host, port, addresses, ttl=None):
+        with self._lock:
+            self._data[(host.lower(), port)] = (time.monotonic() + (self.ttl if ttl is None else ttl), list(addresses))
+
+    def invalidate(self, host=None):
+        with self._lock:
+            if host is None:
+                self._data.clear()
+            else:
+                for key in [k for k in self._data if k[0] == host.lower()]:
+                    del self._data[key]
+
+
+class KnownHostsCache:
+    """paramiko.HostKeys por archivo; se vuelve a analizar solo si cambian mtime o tamaño."""
+
+    def __init__(self):
+        self._data = {}  # ruta -> ((mtime, tamaño), HostKeys)
+        self._lock = threading.Lock()
+
+    def get(self, path=None):
+        """Retorna (HostKeys, si venía de caché)."""
+        import paramiko
+
+        path = os.path.expanduser(path or os.path.join("~", ".ssh", "known_hosts"))
+        try:
+            st = os.stat(path)
+            signature = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            signature = None
+        with self._lock:
+            item = self._data.get(path)
+            if item is not None and item[0] == signature:
+                return item[1], True
+        keys = paramiko.HostKeys()
+        if signature is not None:
+            try:
+                keys.load(path)
+            except (IOError, paramiko.SSHException) as e:
+                print(f"No se pudo leer {path}: {e}")
+        with self._lock:
+            self._data[path] = (signature, keys)
+        return keys, False
+
+
+def _interleave(addresses):
+    """Alterna familias empezando por la primera que dio el resolvedor (RFC 8305, sección 4)."""
+    by_family = {}
+    for family, sockaddr in addresses:
+        by_family.setdefault(family, []).append((family, sockaddr))
+    queues = list(by_family.values())
+    out = []
+    while any(queues):
+        for q in queues:
+            if q:
+                out.append(q.pop(0))
+    return out
+
+
+def race(addresses, timeout=30.0, stagger=STAGGER, report=None):
+    """
+    Conecta a la primera dirección que responda. Los intentos se escalonan cada
+    `stagger` s (o al fallar el anterior) y todos comparten el plazo `timeout`.
+    Retorna el socket conectado (bloqueante); lanza OSError si no conecta ninguno.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    pending = _interleave(addresses)
+    selector = selectors.DefaultSelector()
+    in_flight = {}
+    last_error = None
+    next_start = start
+    winner = None
+
+    def note(addr, outcome):
+        if report is not None:
+            report.attempts.append((addr, outcome, (time.monotonic() - start) * 1000))
+
+    try:
+        while winner is None:
+            now = time.monotonic()
+            if now >= deadline:
+                last_error = socket.timeout("tiempo de conexión agotado")
+                break
+            if pending and (now >= next_start or not in_flight):
+                family, sockaddr = pending.pop(0)
+                sock = None
+                try:
+                    sock = socket.socket(family, socket.SOCK_STREAM)
+                    sock.setblocking(False)
+                    code = sock.connect_ex(sockaddr)
+                except OSError as e:  # p. ej. sin soporte de IPv6 en este equipo
+                    code = e.errno or errno.EADDRNOTAVAIL
+                if code in _IN_PROGRESS:
+                    in_flight[sock] = sockaddr
+                    selector.register(sock, selectors.EVENT_WRITE)
+                else:
+                    last_error = OSError(code, os.strerror(code))
+                    note(sockaddr, os.strerror(code))
+                    if sock is not None:
+                        sock.close()
+                next_start = time.monotonic() + stagger
+                continue
+            if not in_flight:
+                break
+            wait = deadline - now
+            if pending:
+                wait = min(wait, max(0.0, next_start - now))
+            for key, _ in selector.select(wait):
+                sock = key.fileobj
+                sockaddr = in_flight.pop(sock)
+                selector.unregister(sock)
+                code = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if code == 0 and winner is None:
+                    winner = (sock, sockaddr)
+                    note(sockaddr, "ok")
+                else:
+                    last_error = OSError(code, os.strerror(code)) if code else last_error
+                    note(sockaddr, os.strerror(code) if code else "descartada")
+                    sock.close()
+                    next_start = time.monotonic()  # un fallo adelanta el siguiente intento
+    finally:
+        for sock, sockaddr in in_flight.items():
+            note(sockaddr, "cancelada")
+            sock.close()
+        selector.close()
+
+    if winner is None:
+        raise last_error or OSError("sin direcciones a las que conectar")
+    sock, sockaddr = winner
+    sock.setblocking(True)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if report is not None:
+        report.winner = sockaddr
+        report.connect_ms = (time.monotonic() - start) * 1000
+    return sock
+
+
+def parse_jump(spec, username=None, password=None):
+    """
+    "[usuario[:clave]@]host[:puerto][,siguiente salto...]" como ssh -J, en orden
+    desde aquí hacia el destino. Sin usuario o clave se usan los del destino.
+    """
+    hops = []
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        user, secret = username, password
+        if "@" in part:
+            credentials, part = part.rsplit("@", 1)
+            user, _, given = credentials.partition(":")
+            secret = given or password
+        host, port = part, 22
+        if part.startswith("["):  # [IPv6]:puerto
+            host, _, rest = part[1:].partition("]")
+            port = int(rest[1:]) if rest.startswith(":") else 22
+        elif part.count(":") == 1:
+            host, port = part.split(":")
+            port = int(port)
+        hops.append(JumpHost(host, port, user or username, secret))
+    return hops
+
+
+class _Bastion:
+    """Una conexión a un bastión y cuántas sesiones la usan; es también el recibo (lease) de cada una."""
+    __slots__ = ("key", "client", "refs")
+
+    def __init__(self, key, client):
+        self.key = key
+        self.client = client
+        self.refs = 1
+
+    @property
+    def alive(self):
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+
+class BastionPool:
+    """
+    Conexiones a bastiones compartidas, con cuenta de referencias. La clave incluye
+    la conexión del salto anterior, así que el mismo bastión alcanzado por caminos
+    distintos son conexiones distintas.
+
+    Cada acquire() devuelve la entrada concreta que se usa como recibo: si un
+    bastión muerto se sustituye por una conexión nueva, los que aún tienen la
+    vieja la sueltan a ella y nunca restan referencias a la nueva.
+    """
+
+    def __init__(self):
+        self._entries = {}   # clave -> _Bastion vigente
+        self._locks = {}     # clave -> Lock (dos sesiones a la vez no abren dos conexiones)
+        self._lock = threading.Lock()
+
+    def acquire(self, hop, via=None, via_lease=None, timeout=30.0):
+        """
+        Retorna (recibo, SSHClient autenticado, si ya existía). `via` y `via_lease` son
+        el cliente y el recibo del salto anterior; el recibo se pasa luego a release().
+        """
+        import paramiko
+
+        key = (hop.host.lower(), hop.port, hop.username, via_lease)
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.alive:
+                    entry.refs += 1
+                    return entry, entry.client, True
+            if via is None:
+                sock, _ = open_socket(hop.host, hop.port, timeout=timeout)
+            else:
+                sock = via.get_transport().open_channel("direct-tcpip", (hop.host, hop.port), ("127.0.0.1", 0),
+                                                        timeout=timeout)
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client._system_host_keys = known_hosts.get()[0]
+            try:
+                client.connect(hostname=hop.host, port=hop.port, username=hop.username, password=hop.password,
+                               sock=sock, timeout=timeout, look_for_keys=False)
+            except Exception:
+                sock.close()
+                raise
+            # Sin keepalive un bastión ocioso tras un NAT muere sin que nadie se entere
+            client.get_transport().set_keepalive(30)
+            entry = _Bastion(key, client)
+            with self._lock:
+                # Una entrada muerta que se sustituye sigue viva para quien la tenga hasta que la suelte
+                self._entries[key] = entry
+            return entry, client, False
+
+    def release(self, lease):
+        """Suelta el recibo de acquire(); la conexión se cierra cuando ninguno la usa."""
+        with self._lock:
+            if lease.refs <= 0:
+                return
+            lease.refs -= 1
+            if lease.refs > 0:
+                return
+            if self._entries.get(lease.key) is lease:
+                del self._entries[lease.key]
+                # La clave retiene el recibo del salto anterior: no acumular una por conexión
+                self._locks.pop(lease.key, None)
+        lease.client.close()
+
+    def active(self):
+        """{(host, puerto, usuario): referencias} de los bastiones abiertos."""
+        with self._lock:
+            return {key[:3]: entry.refs for key, entry in self._entries.items()}
+
+
+dns_cache = DnsCache()
+known_hosts = KnownHostsCache()
+bastions = BastionPool()
+
+
+def open_socket(host, port, timeout=30.0, stagger=STAGGER, cache=None):
+    """Resuelve (con caché) y conecta por carrera de direcciones. Retorna (socket, ConnectReport)."""
+    cache = cache or dns_cache
+    report = ConnectReport(host, port)
+    start = time.monotonic()
+    report.addresses, report.dns_cached = cache.resolve(host, port)
+    report.dns_ms = (time.monotonic() - start) * 1000
+    try:
+        sock = race(report.addresses, timeout=timeout, stagger=stagger, report=report)
+    except OSError:
+        # Quizá la caché tiene direcciones viejas: la próxima vez se vuelve a resolver
+        cache.invalidate(host)
+        raise
+    return sock, report
+
+
+def _open_via_jumps(host, port, hops, timeout, pool, report):
+    """Canal direct-tcpip al destino a través de la cadena de bastiones (compartidos vía `pool`)."""
+    via = via_lease = None
+    try:
+        for hop in hops:
+            start = time.monotonic()
+            via_lease, via, shared = pool.acquire(hop, via, via_lease, timeout=timeout)
+            report._leases.append((pool, via_lease))
+            report.hops.append(HopTiming(f"{hop.host}:{hop.port}", (time.monotonic() - start) * 1000, shared))
+        start = time.monotonic()
+        channel = via.get_transport().open_channel("direct-tcpip", (host, port), ("127.0.0.1", 0), timeout=timeout)
+        report.connect_ms = (time.monotonic() - start) * 1000
+        return channel
+    except Exception:
+        report.release()
+        raise
+
+
+def connect_client(client, host, port, username, password=None, timeout=30.0, system_host_keys=True, jump=None,
+                   pool=None, **kwargs):
+    """
+    paramiko.SSHClient.connect sobre open_socket() o, con `jump` (cadena "ssh -J"
+    o lista de JumpHost), sobre un canal del último bastión. Carga known_hosts
+    desde la caché si `system_host_keys`. Retorna el ConnectReport; al cerrar el
+    cliente hay que llamar a report.release() para soltar los bastiones.
+    """
+    keys_cached = None
+    if system_host_keys:
+        keys, keys_cached = known_hosts.get()
+        # Equivale a client.load_system_host_keys() sin volver a analizar el archivo;
+        # SSHClient solo lee este diccionario (las claves nuevas van a get_host_keys())
+        client._system_host_keys = keys
+    hops = parse_jump(jump, username, password) if isinstance(jump, str) else list(jump or ())
+    if hops:
+        report = ConnectReport(host, port)
+        sock = _open_via_jumps(host, port, hops, timeout or 30.0, pool or bastions, report)
+    else:
+        sock, report = open_socket(host, port, timeout=timeout or 30.0)
+    report.known_hosts_cached = keys_cached
+    start = time.monotonic()
+    try:
+        client.connect(hostname=host, port=port, username=username, password=password, sock=sock,
+                       timeout=timeout, **kwargs)
+    except Exception:
+        sock.close()
+        report.release()
+        raise
+    report.ssh_ms = (time.monotonic() - start) * 1000
+    return report
+
+
+def _benchmark():
+    """Host con una IPv6 inalcanzable delante de la buena: conexión secuencial frente a la carrera."""
+    import paramiko
+
+    from engine.loopback import LoopbackServer
+
+    timeout = 5.0
+    dead = (socket.AF_INET6, ("100::1", 0, 0, 0))  # prefijo de descarte (RFC 6666): nadie responde
+    with LoopbackServer() as server:
+        good = (socket.AF_INET, ("127.0.0.1", server.port))
+        dead = (dead[0], ("100::1", server.port, 0, 0))
+        cache = DnsCache()
+        cache.put("laboratorio", server.port, [dead, good])
+
+        # Lo que hace paramiko con hostname=: una dirección tras otra, cada una con el timeout completo
+        start = time.monotonic()
+        for family, sockaddr in cache.resolve("laboratorio", server.port)[0]:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(sockaddr)
+                break
+            except OSError:
+                sock.close()
+        sequential = time.monotonic() - start
+        sock.close()
+
+        start = time.monotonic()
+        sock, report = open_socket("laboratorio", server.port, timeout=timeout, cache=cache)
+        raced = time.monotonic() - start
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect("laboratorio", server.port, username="x", password=server.password, sock=sock,
+                       look_for_keys=False, allow_agent=False)
+        ok = client.get_transport().is_active()
+        client.close()
+        print(f"secuencial: {sequential * 1000:.0f} ms; carrera: {raced * 1000:.0f} ms (SSH activo: {ok})")
+        print(f"  {report}")
+
+        start = time.monotonic()
+        for _ in range(100):
+            known_hosts.get()
+        print(f"known_hosts en caché: {(time.monotonic() - start) * 10:.3f} ms por consulta")
+        start = time.monotonic()
+        addresses, cached = dns_cache.resolve("localhost", 22)
+        first = time.monotonic() - start
+        start = time.monotonic()
+        dns_cache.resolve("localhost", 22)
+        print(f"DNS localhost: {first * 1000:.2f} ms la primera vez, {(time.monotonic() - start) * 1000:.3f} ms en caché")
+
+
+def _benchmark_jump():
+    """Tres sesiones a dos destinos detrás del mismo bastión: una sola conexión al bastión."""
+    import paramiko
+
+    from engine.loopback import LoopbackServer
+
+    with LoopbackServer() as bastion, LoopbackServer() as target:
+        jump = f"alumno:{bastion.password}@127.0.0.1:{bastion.port}"
+        clients = []
+        for name in ("lab1", "lab2", "lab1"):
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            report = connect_client(client, "127.0.0.1", target.port, name, target.password, timeout=5,
+                                    system_host_keys=False, jump=jump, look_for_keys=False, allow_agent=False)
+            _, out, _ = client.exec_command("echo ok")
+            print(f"{name}: {report} -> {out.read().decode().strip()}")
+            clients.append((client, report))
+        print(f"conexiones al bastión: {len(bastion._transports)}; en uso: {bastions.active()}")
+        for client, report in clients:
+            client.close()
+            report.release()
+        print(f"tras cerrar las sesiones: {bastions.active()}")
+
+
+if __name__ == "__main__":
+    _benchmark()
+    _benchmark_jump()
@@ -0,0 +1,552 @@
+"""
+Reenvío de puertos local (-L) y dinámico SOCKS5 (-D) sobre un transporte SSH existente.
+
+Todas las conexiones reenviadas las atiende un único bucle con selectors: sin
+un hilo por conexión, con buffers de lectura reutilizables y envíos parciales
+gestionados con memoryview. Solo la apertura del canal direct-tcpip, que espera
+la respuesta del servidor, se hace en un pool pequeño para no frenar el bucle.
+
+Benchmark en loopback (sin SSH, mide el bucle de relay):
+    python -m engine.forwarding
+"""
+import ipaddress
+import queue
+import selectors
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def transport_opener(transport, timeout=10):
+    """Fábrica de canales direct-tcpip sobre un paramiko.Transport autenticado."""
+    def open_channel(host, port, origin):
+        return transport.open_channel("direct-tcpip", (host, port), origin, timeout=timeout)
+    return open_channel
+
+
+class Tunnel:
+    """Un reenvío activo y sus contadores (se leen desde la UI sin lock: son enteros)."""
+
+    def __init__(self, kind, bind_host, bind_port, dest_host=None, dest_port=None):
+        self.kind = kind              # "L" o "D"
+        self.bind_host = bind_host
+        self.bind_port = bind_port
+        self.dest_host = dest_host
+        self.dest_port = dest_port
+        self.bytes_up = 0             # cliente local -> remoto
+        self.bytes_down = 0           # remoto -> cliente local
+        self.active = 0
+        self.total = 0
+        self.failed = 0
+        self.last_setup = 0.0         # segundos desde accept hasta canal listo
+        self.listener = None
+
+    @property
+    def description(self):
+        if self.kind == "L":
+            return f"-L {self.bind_host}:{self.bind_port} → {self.dest_host}:{self.dest_port}"
+        return f"-D {self.bind_host}:{self.bind_port} (SOCKS5)"
+
+
+class _Endpoint:
+    """Adaptador común para socket y canal paramiko en modo no bloqueante."""
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.is_socket = isinstance(obj, socket.socket)
+        if self.is_socket:
+            obj.setblocking(False)
+        else:
+            obj.settimeout(0.0)
+
+    def recv_into(self, buf):
+        if self.is_socket:
+            return self.obj.recv_into(buf)
+        data = self.obj.recv(len(buf))
+        n = len(data)
+        buf[:n] = data
+        return n
+
+    def send(self, view):
+        return self.obj.send(view)
+
+    def shutdown_write(self):
+        try:
+            if self.is_socket:
+                self.obj.shutdown(socket.SHUT_WR)
+            else:
+                self.obj.shutdown_write()
+        except OSError:
+            pass
+
+    def close(self):
+        try:
+            self.obj.close()
+        except Exception:
+            pass
+
+
+class _Half:
+    """Un sentido de la conexión: lee de src y escribe en dst."""
+    __slots__ = ("src", "dst", "pending", "eof", "counter")
+
+    def __init__(self, src, dst, counter):
+        self.src = src
+        self.dst = dst
+        self.pending = None   # memoryview aún no enviado
+        self.eof = False
+        self.counter = counter
+
+
+class _Conn:
+    def __init__(self, tunnel, client):
+        self.tunnel = tunnel
+        self.client = _Endpoint(client)
+        self.remote = None
+        self.up = None
+        self.down = None
+        self.handshake = bytearray()   # SOCKS5
+        self.state = "socks-greeting" if tunnel.kind == "D" else "opening"
+        self.accepted_at = time.perf_counter()
+
+
+class ForwardingRelay:
+    """
+    :param open_channel: fn(host, port, origin) -> canal o socket conectado (bloqueante).
+    :param bufsize: tamaño del buffer de lectura compartido.
+    """
+
+    def __init__(self, open_channel, bufsize=65536, setup_workers=4):
+        self.open_channel = open_channel
+        self.tunnels = []
+        self._buf = bytearray(bufsize)
+        self._view = memoryview(self._buf)
+        self._sel = selectors.DefaultSelector()
+        self._conns = set()
+        self._blocked = set()   # conexiones con datos pendientes hacia un canal SSH sin ventana
+        self._opened = queue.Queue()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._sel.register(self._wake_r, selectors.EVENT_READ, ("wake", None))
+        self._pool = ThreadPoolExecutor(max_workers=setup_workers, thread_name_prefix="fwd-open")
+        self._lock = threading.Lock()
+        self._commands = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="ForwardingRelay", daemon=True)
+        self._thread.start()
+
+    # ----------------- API pública (cualquier hilo) -----------------
+
+    def add_local(self, bind_port, dest_host, dest_port, bind_host="127.0.0.1"):
+        tunnel = Tunnel("L", bind_host, bind_port, dest_host, dest_port)
+        return self._listen(tunnel)
+
+    def add_dynamic(self, bind_port, bind_host="127.0.0.1"):
+        tunnel = Tunnel("D", bind_host, bind_port)
+        return self._listen(tunnel)
+
+    def remove(self, tunnel):
+        self._call(self._remove_tunnel, tunnel)
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake()
+        self._thread.join(timeout=5)
+        self._pool.shutdown(wait=False)
+        for s in (self._wake_r, self._wake_w):
+            s.close()
+
+    # ----------------- Internos -----------------
+
+    def _listen(self, tunnel):
+        ls = socket.socket(socket.AF_INET6 if ":" in tunnel.bind_host else socket.AF_INET, socket.SOCK_STREAM)
+        ls.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        ls.bind((tunnel.bind_host, tunnel.bind_port))
+        ls.listen(128)
+        ls.setblocking(False)
+        tunnel.bind_port = ls.getsockname()[1]
+        tunnel.listener = ls
+        with self._lock:
+            self.tunnels.append(tunnel)
+        self._call(self._sel.register, ls, selectors.EVENT_READ, ("listen", tunnel))
+        return tunnel
+
+    def _call(self, fn, *args):
+        self._commands.put((fn, args))
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"x")
+        except OSError:
+            pass
+
+    def _remove_tunnel(self, tunnel):
+        with self._lock:
+            if tunnel in self.tunnels:
+                self.tunnels.remove(tunnel)
+        if tunnel.listener is not None:
+            try:
+                self._sel.unregister(tunnel.listener)
+            except (KeyError, ValueError):
+                pass
+            tunnel.listener.close()
+            tunnel.listener = None
+        for conn in [c for c in self._conns if c.tunnel is tunnel]:
+            self._close_conn(conn)
+
+    def _loop(self):
+        try:
+            while not self._stop.is_set():
+                # Con datos pendientes hacia un canal (ventana SSH llena) reintentar pronto
+                timeout = 0.01 if self._blocked else None
+                for key, mask in self._sel.select(timeout):
+                    kind, obj = key.data
+                    if kind == "wake":
+                        self._drain_wake()
+                    elif kind == "listen":
+                        self._accept(obj, key.fileobj)
+                    else:
+                        self._service(obj, key.fileobj, mask)
+                self._retry_blocked_channel_writes()
+        except Exception as e:
+            print(f"Error en el bucle de reenvío: {e}")
+        finally:
+            for conn in list(self._conns):
+                self._close_conn(conn)
+            for tunnel in list(self.tunnels):
+                if tunnel.listener is not None:
+                    tunnel.listener.close()
+            self._sel.close()
+
+    def _drain_wake(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+        while True:
+            try:
+                fn, args = self._commands.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Error en comando de reenvío: {e}")
+        while True:
+            try:
+                conn, result = self._opened.get_nowait()
+            except queue.Empty:
+                break
+            self._on_opened(conn, result)
+
+    def _accept(self, tunnel, listener):
+        try:
+            client, addr = listener.accept()
+        except (BlockingIOError, OSError):
+            return
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = _Conn(tunnel, client)
+        conn.origin = addr[:2]
+        self._conns.add(conn)
+        tunnel.active += 1
+        tunnel.total += 1
+        if tunnel.kind == "L":
+            self._start_open(conn, tunnel.dest_host, tunnel.dest_port)
+        else:
+            self._sel.register(client, selectors.EVENT_READ, ("conn", conn))
+
+    def _start_open(self, conn, host, port):
+        conn.state = "opening"
+
+        def job():
+            try:
+                result = self.open_channel(host, port, conn.origin)
+            except Exception as e:
+                result = e
+            self._opened.put((conn, result))
+            self._wake()
+        self._pool.submit(job)
+
+    def _on_opened(self, conn, result):
+        if conn not in self._conns:
+            if not isinstance(result, Exception):
+                _Endpoint(result).close()
+            return
+        tunnel = conn.tunnel
+        if isinstance(result, Exception):
+            tunnel.failed += 1
+            print(f"Reenvío {tunnel.description}: no se pudo abrir el canal: {result}")
+            if tunnel.kind == "D":
+                self._socks_reply(conn, 0x05)
+            self._close_conn(conn)
+            return
+        conn.remote = _Endpoint(result)
+        tunnel.last_setup = time.perf_counter() - conn.accepted_at
+        if tunnel.kind == "D":
+            self._socks_reply(conn, 0x00)
+        conn.up = _Half(conn.client, conn.remote, "bytes_up")
+        conn.down = _Half(conn.remote, conn.client, "bytes_down")
+        conn.state = "relay"
+        self._register(conn.client, conn)
+        self._register(conn.remote.obj, conn)
+        # Lo que llegó junto con la petición SOCKS ya es tráfico de la aplicación
+        if conn.handshake:
+            tunnel.bytes_up += len(conn.handshake)
+            conn.up.pending = memoryview(bytes(conn.handshake))
+            conn.handshake = bytearray()
+            self._flush(conn, conn.up)
+
+    def _register(self, fileobj, conn, events=selectors.EVENT_READ):
+        fileobj = fileobj.obj if isinstance(fileobj, _Endpoint) else fileobj
+        try:
+            self._sel.modify(fileobj, events, ("conn", conn))
+        except KeyError:
+            self._sel.register(fileobj, events, ("conn", conn))
+
+    def _service(self, conn, fileobj, mask):
+        if conn not in self._conns:
+            return
+        if conn.state.startswith("socks"):
+            self._socks_read(conn)
+            return
+        if conn.state != "relay":
+            return
+        from_client = fileobj is conn.client.obj
+        half = conn.up if from_client else conn.down
+        other = conn.down if from_client else conn.up
+        if mask & selectors.EVENT_WRITE and other.pending is not None:
+            self._flush(conn, other)
+        if mask & selectors.EVENT_READ and half.pending is None and not half.eof:
+            self._pump(conn, half)
+        self._update_interest(conn)
+
+    def _pump(self, conn, half):
+        try:
+            n = half.src.recv_into(self._buf)
+        except (BlockingIOError, socket.timeout):
+            return
+        except OSError:
+            self._close_conn(conn)
+            return
+        if n == 0:
+            half.eof = True
+            half.dst.shutdown_write()
+            if conn.up.eof and conn.down.eof:
+                self._close_conn(conn)
+            return
+        setattr(conn.tunnel, half.counter, getattr(conn.tunnel, half.counter) + n)
+        half.pending = self._view[:n]
+        self._flush(conn, half)
+        if half.pending is not None:
+            # Envío parcial: copiar el resto fuera del buffer compartido antes de reutilizarlo
+            half.pending = memoryview(half.pending.tobytes())
+
+    def _flush(self, conn, half):
+        view = half.pending
+        try:
+            while view:
+                sent = half.dst.send(view)
+                if not sent:
+                    break
+                view = view[sent:]
+        except (BlockingIOError, socket.timeout):
+            pass
+        except OSError:
+            self._close_conn(conn)
+            return
+        half.pending = view if view else None
+        # Los canales paramiko no avisan cuando vuelve a haber ventana: se reintenta por sondeo
+        if half is conn.up and not conn.remote.is_socket:
+            if half.pending is None:
+                self._blocked.discard(conn)
+            else:
+                self._blocked.add(conn)
+
+    def _update_interest(self, conn):
+        if conn not in self._conns or conn.state != "relay":
+            return
+        # Sin lecturas nuevas mientras haya datos pendientes en ese sentido (contrapresión)
+        for ep, reading, writing in ((conn.client, conn.up, conn.down), (conn.remote, conn.down, conn.up)):
+            events = 0
+            if reading.pending is None and not reading.eof:
+                events |= selectors.EVENT_READ
+            if writing.pending is not None and ep.is_socket:
+                events |= selectors.EVENT_WRITE
+            if events:
+                self._register(ep.obj, conn, events)
+            else:
+                try:
+                    self._sel.unregister(ep.obj)
+                except (KeyError, ValueError):
+                    pass
+
+    def _retry_blocked_channel_writes(self):
+        for conn in list(self._blocked):
+            self._flush(conn, conn.up)
+            self._update_interest(conn)
+
+    def _close_conn(self, conn):
+        if conn not in self._conns:
+            return
+        self._conns.discard(conn)
+        self._blocked.discard(conn)
+        conn.tunnel.active -= 1
+        for ep in (conn.client, conn.remote):
+            if ep is None:
+                continue
+            try:
+                self._sel.unregister(ep.obj)
+            except (KeyError, ValueError):
+                pass
+            ep.close()
+        conn.state = "closed"
+
+    # ----------------- SOCKS5 (solo CONNECT, sin autenticación) -----------------
+
+    def _socks_read(self, conn):
+        try:
+            data = conn.client.obj.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._close_conn(conn)
+            return
+        conn.handshake += data
+        buf = conn.handshake
+        if conn.state == "socks-greeting":
+            if len(buf) < 2 or len(buf) < 2 + buf[1]:
+                return
+            if buf[0] != 5 or 0 not in buf[2:2 + buf[1]]:
+                conn.client.obj.send(b"\x05\xff")
+                self._close_conn(conn)
+                return
+            conn.client.obj.send(b"\x05\x00")
+            del buf[:2 + buf[1]]
+            conn.state = "socks-request"
+        if conn.state == "socks-request":
+            target = self._parse_socks_request(buf)
+            if target is None:
+                return
+            if target is False:
+                self._socks_reply(conn, 0x07)
+                self._close_conn(conn)
+                return
+            host, port, consumed = target
+            del buf[:consumed]
+            self._sel.unregister(conn.client.obj)
+            self._start_open(conn, host, port)
+
+    @staticmethod
+    def _parse_socks_request(buf):
+        """Retorna (host, puerto, bytes_consumidos), None si faltan datos, False si no se soporta."""
+        if len(buf) < 5:
+            return None
+        ver, cmd, _, atyp = buf[0], buf[1], buf[2], buf[3]
+        if ver != 5 or cmd != 1:
+            return False
+        if atyp == 1:
+            end = 4 + 4
+            if len(buf) < end + 2:
+                return None
+            host = str(ipaddress.IPv4Address(bytes(buf[4:end])))
+        elif atyp == 3:
+            end = 5 + buf[4]
+            if len(buf) < end + 2:
+                return None
+            host = bytes(buf[5:end]).decode("idna")
+        elif atyp == 4:
+            end = 4 + 16
+            if len(buf) < end + 2:
+                return None
+            host = str(ipaddress.IPv6Address(bytes(buf[4:end])))
+        else:
+            return False
+        port = struct.unpack("!H", bytes(buf[end:end + 2]))[0]
+        return host, port, end + 2
+
+    def _socks_reply(self, conn, status):
+        try:
+            conn.client.obj.setblocking(True)
+            conn.client.obj.sendall(bytes([5, status, 0, 1, 0, 0, 0, 0, 0, 0]))
+            conn.client.obj.setblocking(False)
+        except OSError:
+            pass
+
+
+# ----------------- Benchmark en loopback -----------------
+
+def _sink_server():
+    """Servidor que descarta lo recibido y responde 'ok' al primer byte (mide setup)."""
+    ls = socket.socket()
+    ls.bind(("127.0.0.1", 0))
+    ls.listen(128)
+
+    def handle(c):
+        first = True
+        while True:
+            data = c.recv(262144)
+            if not data:
+                break
+            if first:
+                c.sendall(b"ok")
+                first = False
+        c.close()
+
+    def loop():
+        while True:
+            c, _ = ls.accept()
+            threading.Thread(target=handle, args=(c,), daemon=True).start()
+    threading.Thread(target=loop, daemon=True).start()
+    return ls.getsockname()[1]
+
+
+def _benchmark(megabytes=256, connections=200):
+    sink_port = _sink_server()
+    relay = ForwardingRelay(lambda host, port, origin: socket.create_connection((host, port)))
+    tunnel = relay.add_local(0, "127.0.0.1", sink_port)
+    try:
+        # Latencia de establecimiento: conectar, enviar un byte y esperar la respuesta
+        samples = []
+        for _ in range(connections):
+            start = time.perf_counter()
+            s = socket.create_connection(("127.0.0.1", tunnel.bind_port))
+            s.sendall(b"x")
+            s.recv(2)
+            samples.append(time.perf_counter() - start)
+            s.close()
+        samples.sort()
+        print(f"setup: {connections} conexiones, p50={samples[len(samples) // 2] * 1000:.2f} ms "
+              f"p95={samples[int(len(samples) * 0.95)] * 1000:.2f} ms")
+
+        # Throughput de una sola conexión
+        chunk = b"\0" * 262144
+        total = megabytes * 1024 * 1024
+        s = socket.create_connection(("127.0.0.1", tunnel.bind_port))
+        start = time.perf_counter()
+        sent = 0
+        while sent < total:
+            s.sendall(chunk)
+            sent += len(chunk)
+        s.shutdown(socket.SHUT_WR)
+        s.recv(2)
+        s.recv(1)
+        while tunnel.bytes_up < total + connections and time.perf_counter() - start < 60:
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        s.close()
+        print(f"throughput: {megabytes} MiB en {elapsed:.2f}s = {megabytes / elapsed:.0f} MiB/s "
+              f"(bytes_up={tunnel.bytes_up})")
+    finally:
+        relay.stop()
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,434 @@
+"""
+Servidor SSH mínimo en 127.0.0.1 (paramiko) para benchmarks y pruebas manuales.
+
+Acepta cualquier usuario con la clave indicada y atiende:
+  - shell interactiva sobre un pty (bash o sh),
+  - exec (/bin/sh -c, con stdin/stdout reales),
+  - el subsistema sftp sobre el sistema de archivos local,
+  - canales direct-tcpip (túneles -L / -D).
+
+No es un servidor para producción: sin control de acceso a rutas, una clave de
+host efímera y un hilo por canal. `bandwidth` simula un enlace lento limitando
+los bytes por segundo de cada conexión nueva en cada sentido.
+
+    python -m engine.loopback [puerto]
+"""
+import logging
+import os
+import select
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import paramiko
+from paramiko import SFTPAttributes, SFTPHandle, SFTPServer, SFTPServerInterface, SFTP_OK
+
+# Los clientes de prueba cortan a menudo sin despedirse: que no se impriman esos errores del lado servidor
+_LOG_CHANNEL = "paramiko.loopback"
+logging.getLogger(_LOG_CHANNEL).addHandler(logging.NullHandler())
+
+
+class _LocalHandle(SFTPHandle):
+    def stat(self):
+        try:
+            return SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, attr):
+        try:
+            SFTPServer.set_file_attr(self.filename, attr)
+            return SFTP_OK
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+
+class LocalSFTPInterface(SFTPServerInterface):
+    """SFTP sobre el sistema de archivos local; las rutas relativas parten del home."""
+
+    def _path(self, path):
+        return path if path.startswith("/") else os.path.join(os.path.expanduser("~"), path)
+
+    def _call(self, fn, *args):
+        try:
+            fn(*args)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        return SFTP_OK
+
+    def canonicalize(self, path):
+        return os.path.normpath(self._path(path or "."))
+
+    def list_folder(self, path):
+        path = self._path(path)
+        try:
+            out = []
+            for name in os.listdir(path):
+                attr = SFTPAttributes.from_stat(os.lstat(os.path.join(path, name)))
+                attr.filename = name
+                out.append(attr)
+            return out
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return SFTPAttributes.from_stat(os.stat(self._path(path)))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        try:
+            return SFTPAttributes.from_stat(os.lstat(self._path(path)))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        path = self._path(path)
+        try:
+            fd = os.open(path, flags, 0o666)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        if (flags & os.O_CREAT) and attr is not None:
+            attr._flags &= ~attr.FLAG_PERMISSIONS
+            SFTPServer.set_file_attr(path, attr)
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        handle = _LocalHandle(flags)
+        handle.filename = path
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        return self._call(os.remove, self._path(path))
+
+    def rename(self, oldpath, newpath):
+        return self._call(os.rename, self._path(oldpath), self._path(newpath))
+
+    def posix_rename(self, oldpath, newpath):
+        return self._call(os.replace, self._path(oldpath), self._path(newpath))
+
+    def mkdir(self, path, attr):
+        return self._call(os.mkdir, self._path(path))
+
+    def rmdir(self, path):
+        return self._call(os.rmdir, self._path(path))
+
+    def chattr(self, path, attr):
+        return self._call(SFTPServer.set_file_attr, self._path(path), attr)
+
+    def readlink(self, path):
+        try:
+            return os.readlink(self._path(path))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def symlink(self, target_path, path):
+        return self._call(os.symlink, target_path, self._path(path))
+
+
+class _ThrottledSocket:
+    """Socket con un límite de bytes/s por sentido; paramiko solo usa send/recv y poco más."""
+    QUANTUM = 16384
+
+    def __init__(self, sock, rate):
+        self._sock = sock
+        self._rate = float(rate)
+        self._next = {"recv": 0.0, "send": 0.0}
+
+    def _pace(self, direction, n):
+        now = time.monotonic()
+        start = max(now, self._next[direction])
+        self._next[direction] = start + n / self._rate
+        if self._next[direction] > now:
+            time.sleep(self._next[direction] - now)
+
+    def recv(self, n):
+        data = self._sock.recv(min(n, self.QUANTUM))
+        self._pace("recv", len(data))
+        return data
+
+    def send(self, data):
+        sent = self._sock.send(data[:self.QUANTUM])
+        self._pace("send", sent)
+        return sent
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, server):
+        self.server = server
+        self.forward_to = {}
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL if password == self.server.password else paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == "session" else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        self.forward_to[chanid] = destination
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        channel.pty_size = (width, height)
+        return True
+
+    def check_channel_window_change_request(self, channel, width, height, pixelwidth, pixelheight):
+        fd = getattr(channel, "pty_fd", None)
+        if fd is not None:
+            _set_winsize(fd, width, height)
+        return True
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=_run_shell, args=(channel,), name="LoopbackShell", daemon=True).start()
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=_run_exec, args=(channel, command.decode("utf-8", "replace")),
+                         name="LoopbackExec", daemon=True).start()
+        return True
+
+
+def _set_winsize(fd, cols, rows):
+    import fcntl
+    import struct
+    import termios
+
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+
+def _run_exec(channel, command):
+    proc = subprocess.Popen(["/bin/sh", "-c", command], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+
+    def pump_stdin():
+        try:
+            while True:
+                data = channel.recv(65536)
+                if not data:
+                    break
+                proc.stdin.write(data)
+                proc.stdin.flush()
+        except (OSError, ValueError):
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    def pump_stderr():
+        for data in iter(lambda: proc.stderr.read1(65536), b""):
+            channel.sendall_stderr(data)
+
+    threads = [threading.Thread(target=pump_stdin, daemon=True), threading.Thread(target=pump_stderr, daemon=True)]
+    for t in threads:
+        t.start()
+    try:
+        for data in iter(lambda: proc.stdout.read1(65536), b""):
+            channel.sendall(data)
+        threads[1].join()
+        channel.send_exit_status(proc.wait())
+    except OSError:
+        proc.kill()
+    finally:
+        channel.close()
+
+
+def _run_shell(channel):
+    import pty
+
+    cols, rows = getattr(channel, "pty_size", (80, 24))
+    shell = "/bin/bash" if os.path.exists("/bin/bash") else "/bin/sh"
+    pid, fd = pty.fork()
+    if pid == 0:
+        try:
+            os.execvpe(shell, [shell], dict(os.environ, TERM="xterm-256color"))
+        finally:
+            os._exit(127)
+    channel.pty_fd = fd
+    _set_winsize(fd, cols, rows)
+
+    def pump_in():
+        try:
+            while True:
+                data = channel.recv(65536)
+                if not data:
+                    break
+                os.write(fd, data)
+        except OSError:
+            pass
+
+    threading.Thread(target=pump_in, daemon=True).start()
+    try:
+        while True:
+            try:
+                data = os.read(fd, 65536)
+            except OSError:
+                break
+            if not data:
+                break
+            try:
+                channel.sendall(data)
+            except OSError:
+                # El cliente cerró el canal mientras la shell aún escribía
+                break
+    finally:
+        status = 0
+        try:
+            # Si la shell ya salió (fin del pty) sigue como zombi y waitpid da su código
+            os.kill(pid, 9)
+            status = os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+        except OSError:
+            pass
+        os.close(fd)
+        try:
+            channel.send_exit_status(status if status >= 0 else 128 - status)
+        except OSError:
+            pass
+        channel.close()
+
+
+def _relay(channel, destination):
+    try:
+        sock = socket.create_connection(destination, timeout=10)
+    except OSError:
+        channel.close()
+        return
+    try:
+        while True:
+            readable, _, _ = select.select([channel, sock], [], [])
+            if channel in readable:
+                data = channel.recv(65536)
+                if not data:
+                    break
+                sock.sendall(data)
+            if sock in readable:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                channel.sendall(data)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+        channel.close()
+
+
+class LoopbackServer:
+    """
+    :param port: 0 elige un puerto libre (ver .port tras start()).
+    :param password: clave aceptada para cualquier usuario.
+    :param bandwidth: bytes/s por sentido para las conexiones que se acepten (None: sin límite).
+    """
+
+    def __init__(self, port=0, password="loopback", bandwidth=None):
+        self.password = password
+        self.bandwidth = bandwidth
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self._listener = socket.socket()
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(("127.0.0.1", port))
+        self.port = self._listener.getsockname()[1]
+        self._transports = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._listener.listen(100)
+        self._thread = threading.Thread(target=self._accept_loop, name="LoopbackServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(sock,), name="LoopbackTransport", daemon=True).start()
+
+    def _handle(self, sock):
+        if self.bandwidth:
+            sock = _ThrottledSocket(sock, self.bandwidth)
+        transport = paramiko.Transport(sock)
+        transport.set_log_channel(_LOG_CHANNEL)
+        transport.add_server_key(self.host_key)
+        transport.set_subsystem_handler("sftp", SFTPServer, LocalSFTPInterface)
+        interface = _ServerInterface(self)
+        with self._lock:
+            self._transports.append(transport)
+        try:
+            self._serve(transport, interface)
+        finally:
+            # Sin esto un servidor de larga vida (p. ej. gui.soak) retiene cada conexión terminada
+            with self._lock:
+                if transport in self._transports:
+                    self._transports.remove(transport)
+            transport.close()
+
+    def _serve(self, transport, interface):
+        try:
+            transport.start_server(server=interface)
+        except (paramiko.SSHException, EOFError, OSError):
+            return
+        # Los canales aceptados se retienen: paramiko cierra un Channel al recolectarlo, y la
+        # petición de shell/exec/subsistema que lo pone a trabajar llega después de aceptarlo
+        sessions = []
+        while transport.is_active() and not self._stop.is_set():
+            channel = transport.accept(1)
+            if channel is None:
+                continue
+            destination = interface.forward_to.pop(channel.get_id(), None)
+            if destination is not None:
+                threading.Thread(target=_relay, args=(channel, destination), daemon=True).start()
+            else:
+                sessions = [c for c in sessions if not c.closed]
+                sessions.append(channel)
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self._listener.close()
+        except OSError:
+            pass
+        with self._lock:
+            transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+
+    def client(self, username="loopback", **kwargs):
+        """paramiko.SSHClient ya conectado a este servidor."""
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect("127.0.0.1", self.port, username=username, password=self.password, look_for_keys=False,
+                       allow_agent=False, **kwargs)
+        return client
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = LoopbackServer(int(sys.argv[1]) if len(sys.argv) > 1 else 0).start()
+    print(f"Servidor SSH de pruebas en 127.0.0.1:{server.port} (clave: {server.password})", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
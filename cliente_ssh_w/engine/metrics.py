@@ -0,0 +1,497 @@
+"""
+Métricas del cliente en formato de texto de Prometheus.
+
+Contadores, medidores e histogramas con etiquetas, pensados para vivir dentro de
+los bucles calientes (lector y escritor de las sesiones) sin locks: cada hilo
+actualiza su propia celda (una lista guardada en un threading.local) y solo el
+exportador suma las celdas de todos los hilos al leer. Un incremento es una
+búsqueda en el threading.local y una suma sobre una lista que nadie más escribe;
+el lock del registro solo se toma al crear una serie o la celda de un hilo nuevo.
+
+La exportación es opcional y se configura por entorno:
+
+    UPILOTO_METRICS_FILE=ruta   archivo .prom reescrito cada UPILOTO_METRICS_INTERVAL
+                                segundos (15) y al salir, para el textfile collector
+                                de node_exporter ("1": ~/.upiloto/metrics.prom)
+    UPILOTO_METRICS_PORT=9464   endpoint HTTP /metrics, solo en 127.0.0.1
+
+    python -m engine.metrics      # coste por actualización
+"""
+import bisect
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def default_metrics_path():
+    return os.path.join(os.path.expanduser("~"), ".upiloto", "metrics.prom")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Series:
+    """
+    Una serie (combinación de etiquetas) con una celda por hilo que la actualiza.
+    Las celdas de hilos terminados se suman a _retired al crear una nueva: cada
+    sesión arranca hilos lector y escritor nuevos y, sin eso, las celdas crecerían
+    con cada conexión.
+    """
+    __slots__ = ("_local", "_cells", "_retired", "_lock", "_size")
+
+    def __init__(self, lock, size=1):
+        self._local = threading.local()
+        self._cells = []  # (hilo, celda)
+        self._retired = [0] * size
+        self._lock = lock
+        self._size = size
+
+    def _cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0] * self._size
+            with self._lock:
+                live = []
+                for thread, old in self._cells:
+                    if thread.is_alive():
+                        live.append((thread, old))
+                    else:
+                        # Nadie más escribe en la celda de un hilo terminado
+                        for i, v in enumerate(old):
+                            self._retired[i] += v
+                live.append((threading.current_thread(), cell))
+                self._cells = live
+            self._local.cell = cell
+            return cell
+
+    def _totals(self):
+        with self._lock:
+            cells = [cell for _, cell in self._cells]
+            totals = list(self._retired)
+        for cell in cells:
+            for i, v in enumerate(cell):
+                totals[i] += v
+        return totals
+
+
+class _CounterSeries(_Series):
+    __slots__ = ()
+
+    def inc(self, amount=1):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cell()
+        cell[0] += amount
+
+    @property
+    def value(self):
+        return self._totals()[0]
+
+
+class _HistogramSeries(_Series):
+    """Celda: un hueco por cubo (no acumulado), luego la suma y el recuento."""
+    __slots__ = ("_bounds",)
+
+    def __init__(self, lock, bounds):
+        super().__init__(lock, len(bounds) + 3)
+        self._bounds = bounds
+
+    def observe(self, value):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cell()
+        cell[bisect.bisect_left(self._bounds, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def time(self):
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return self._totals()[-1]
+
+    @property
+    def sum(self):
+        return self._totals()[-2]
+
+
+class _Timer:
+    __slots__ = ("_series", "_start")
+
+    def __init__(self, series):
+        self._series = series
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._series.observe(time.perf_counter() - self._start)
+
+
+class _GaugeSeries:
+    """Valor fijado con set() (una asignación, atómica) o calculado al exportar con set_function()."""
+    __slots__ = ("_value", "_fn")
+
+    def __init__(self):
+        self._value = 0
+        self._fn = None
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, fn):
+        self._fn = fn
+
+    @property
+    def value(self):
+        if self._fn is not None:
+            try:
+                return self._fn()
+            except Exception as e:
+                print(f"Error calculando métrica: {e}")
+                return float("nan")
+        return self._value
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = registry._lock
+        self._series = {}
+        self._default = None if self.labelnames else self._new_series()
+        if self._default is not None:
+            self._series[()] = self._default
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Serie de esta combinación de etiquetas. Conviene guardarla fuera del bucle
+        caliente: labels() es una búsqueda en un dict, la actualización no.
+        """
+        key = tuple(str(v) for v in values)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: se esperaban etiquetas {self.labelnames}")
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._series.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, series in self._items():
+            lines.extend(self._render_series(key, series))
+        return lines
+
+    def _render_series(self, key, series):
+        return [f"{self.name}{_label_text(self.labelnames, key)} {_format_value(series.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterSeries(self._lock)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_series(self):
+        return _GaugeSeries()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def set_function(self, fn):
+        self._default.set_function(fn)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labelnames, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(registry, name, help, labelnames)
+
+    def _new_series(self):
+        return _HistogramSeries(self._lock, self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _render_series(self, key, series):
+        totals = series._totals()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), totals):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+        labels = _label_text(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(float(totals[-2]))}")
+        lines.append(f"{self.name}_count{labels} {totals[-1]}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas con nombre único. Pedir una métrica ya registrada devuelve la misma."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+        if metric is None:
+            metric = cls(self, name, help, labelnames, **kwargs)
+            with self._lock:
+                metric = self._metrics.setdefault(name, metric)
+        if not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"métrica {name} ya registrada con otro tipo o etiquetas")
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self):
+        """Todas las métricas en formato de texto de Prometheus 0.0.4."""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for _, metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ----------------- Métricas del cliente -----------------
+
+bytes_received = REGISTRY.counter(
+    "upiloto_channel_received_bytes_total", "Bytes leídos del canal de la sesión.", ("channel",))
+bytes_sent = REGISTRY.counter(
+    "upiloto_channel_sent_bytes_total", "Bytes escritos en el canal de la sesión.", ("channel",))
+reader_wakeups = REGISTRY.counter(
+    "upiloto_reader_wakeups_total", "Veces que el hilo lector despertó con datos.", ("channel",))
+output_flushes = REGISTRY.counter(
+    "upiloto_output_flushes_total", "Bloques de salida entregados al frontend (stream directo o foto de pantalla).",
+    ("channel", "mode"))
+write_latency = REGISTRY.histogram(
+    "upiloto_write_latency_seconds", "Desde que se encola una escritura hasta que el canal la acepta entera.",
+    ("channel",))
+connects = REGISTRY.counter(
+    "upiloto_connects_total", "Aperturas de sesión por resultado.", ("channel", "result"))
+reconnects = REGISTRY.counter(
+    "upiloto_reconnects_total", "Aperturas correctas de un destino que ya se había abierto en este proceso.",
+    ("channel",))
+copilot_latency = REGISTRY.histogram(
+    "upiloto_copilot_request_seconds", "Duración de una petición de Copilot, reintentos incluidos.",
+    ("model", "result"), buckets=(0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0))
+copilot_tokens = REGISTRY.counter(
+    "upiloto_copilot_tokens_total", "Tokens consumidos según el campo usage de la respuesta.", ("model", "kind"))
+copilot_errors = REGISTRY.counter(
+    "upiloto_copilot_errors_total", "Errores de Copilot: transitorios (reintentados) y definitivos.",
+    ("model", "kind"))
+
+
+# ----------------- Exportación -----------------
+
+def write_textfile(path, registry=REGISTRY):
+    """Escribe el registro en `path` de forma atómica (el colector nunca lee un archivo a medias)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+class MetricsExporter:
+    """
+    :param path: archivo .prom que se reescribe cada `interval` segundos (None: no escribe).
+    :param port: puerto del endpoint HTTP /metrics en `host` (None: sin servidor; 0: uno libre).
+    :param host: por defecto solo localhost; las métricas incluyen usuarios y hosts.
+    """
+
+    def __init__(self, path=None, port=None, host="127.0.0.1", interval=15.0, registry=REGISTRY):
+        self.path = path
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self.registry = registry
+        self.server = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    @classmethod
+    def from_env(cls):
+        """Exportador según UPILOTO_METRICS_FILE / UPILOTO_METRICS_PORT, o None si no se pidió ninguno."""
+        path = os.environ.get("UPILOTO_METRICS_FILE") or None
+        if path in ("1", "true", "yes"):
+            path = default_metrics_path()
+        port = os.environ.get("UPILOTO_METRICS_PORT") or None
+        if path is None and port is None:
+            return None
+        interval = float(os.environ.get("UPILOTO_METRICS_INTERVAL", "15"))
+        return cls(path=path, port=int(port) if port is not None else None, interval=interval)
+
+    def start(self):
+        """Arranca la exportación. Un puerto ocupado se avisa y no impide la del archivo."""
+        if self.port is not None:
+            try:
+                self._start_server()
+            except OSError as e:
+                print(f"Métricas: no se pudo abrir {self.host}:{self.port} ({e}); sin endpoint /metrics")
+        if self.path:
+            thread = threading.Thread(target=self._write_loop, name="MetricsFile", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _start_server(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever, name="MetricsHTTP", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        print(f"Métricas en http://{self.host}:{self.port}/metrics")
+
+    def _write_loop(self):
+        while True:
+            try:
+                write_textfile(self.path, self.registry)
+            except OSError as e:
+                print(f"No se pudieron escribir las métricas en {self.path}: {e}")
+                return
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        """Detiene el servidor y deja escrito el estado final en el archivo."""
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+        if self.path:
+            try:
+                write_textfile(self.path, self.registry)
+            except OSError as e:
+                print(f"No se pudieron escribir las métricas en {self.path}: {e}")
+
+
+def _benchmark(n=2_000_000):
+    """Coste por actualización frente a un bucle vacío, con uno y con cuatro hilos actualizando."""
+    registry = Registry()
+    counter = registry.counter("bench_total", "bench", ("channel",)).labels("a")
+    histogram = registry.histogram("bench_seconds", "bench", ("channel",)).labels("a")
+
+    def loop_empty():
+        for _ in range(n):
+            pass
+
+    def loop_counter():
+        inc = counter.inc
+        for _ in range(n):
+            inc(100)
+
+    def loop_histogram():
+        observe = histogram.observe
+        for _ in range(n):
+            observe(0.003)
+
+    def per_op(fn):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) / n
+
+    base = per_op(loop_empty)
+    print(f"contador: {(per_op(loop_counter) - base) * 1e9:.0f} ns/inc; "
+          f"histograma: {(per_op(loop_histogram) - base) * 1e9:.0f} ns/observe")
+
+    before = counter.value
+    threads = [threading.Thread(target=loop_counter) for _ in range(4)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    lost = 4 * n * 100 - (counter.value - before)
+    print(f"4 hilos: {elapsed / (4 * n) * 1e9:.0f} ns/inc de media, {lost} unidades perdidas")
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"render: {(time.perf_counter() - start) * 1e3:.2f} ms, {len(text)} bytes")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,258 @@
+"""
+Monitor de recursos del servidor (CPU, memoria, disco, red) por un único canal exec.
+
+En el servidor corre un solo proceso awk de larga duración que, en cada intervalo,
+lee /proc y escribe una línea compacta con los contadores en bruto:
+
+    S <uptime> <cpu total> <cpu idle> <iowait> <ncpu> <mem total> <mem disponible>
+      <swap total> <swap libre> <rx> <tx> <sectores leídos> <sectores escritos>
+      <carga 1 min> <ticks de CPU del propio muestreador>
+
+Nada de un comando por métrica: por intervalo solo se crea el `sleep`. Las tasas
+(CPU %, B/s) se calculan aquí por diferencia entre dos registros, con el uptime
+del servidor como reloj, y se guardan en búferes circulares de tamaño fijo para
+las gráficas. El coste del propio muestreo en el servidor (CPU de awk y sus
+`sleep`) viaja en cada registro.
+
+    python -m engine.monitor      # benchmark contra engine.loopback
+"""
+import collections
+import shlex
+import threading
+import time
+
+# Solo awk POSIX (mawk y busybox incluidos): getline de archivos, fflush y system()
+_SAMPLER_AWK = r"""
+function slurp(path, lines,    n, l) {
+    n = 0
+    while ((getline l < path) > 0)
+        lines[++n] = l
+    close(path)
+    return n
+}
+BEGIN {
+    while (1) {
+        n = slurp("/proc/uptime", L); split(L[1], f, " "); uptime = f[1]
+        tot = idle = iow = ncpu = 0
+        n = slurp("/proc/stat", L)
+        for (i = 1; i <= n; i++) {
+            m = split(L[i], f, " ")
+            if (f[1] == "cpu") { for (j = 2; j <= m; j++) tot += f[j]; idle = f[5]; iow = f[6] }
+            else if (f[1] ~ /^cpu[0-9]/) ncpu++
+        }
+        mt = ma = st = sf = 0
+        n = slurp("/proc/meminfo", L)
+        for (i = 1; i <= n; i++) {
+            split(L[i], f, " ")
+            if (f[1] == "MemTotal:") mt = f[2]
+            else if (f[1] == "MemAvailable:") ma = f[2]
+            else if (f[1] == "SwapTotal:") st = f[2]
+            else if (f[1] == "SwapFree:") sf = f[2]
+        }
+        rx = tx = 0
+        n = slurp("/proc/net/dev", L)
+        for (i = 3; i <= n; i++) {
+            l = L[i]; sub(/:/, " ", l); split(l, f, " ")
+            if (f[1] != "lo") { rx += f[2]; tx += f[10] }
+        }
+        rd = wr = 0
+        n = slurp("/proc/diskstats", L)
+        for (i = 1; i <= n; i++) {
+            split(L[i], f, " ")
+            if (f[3] ~ /^([shv]d[a-z]+|xvd[a-z]+|nvme[0-9]+n[0-9]+|mmcblk[0-9]+)$/) { rd += f[6]; wr += f[10] }
+        }
+        n = slurp("/proc/loadavg", L); split(L[1], f, " "); load = f[1]
+        n = slurp("/proc/self/stat", L); l = L[1]; sub(/^.*\) /, "", l); split(l, f, " ")
+        self = f[12] + f[13] + f[14] + f[15]
+        printf "S %s %.0f %.0f %.0f %d %.0f %.0f %.0f %.0f %.0f %.0f %.0f %.0f %s %.0f\n", uptime, tot, idle, iow, ncpu, mt, ma, st, sf, rx, tx, rd, wr, load, self
+        fflush()
+        if (system("sleep " interval) != 0) exit
+    }
+}
+"""
+
+# Ticks de reloj por segundo de /proc (USER_HZ): 100 en todos los Linux actuales
+USER_HZ = 100
+SECTOR = 512
+
+Sample = collections.namedtuple(
+    "Sample", "time cpu iowait ncpu mem_used mem_total swap_used net_rx net_tx disk_read disk_write load sampler_cpu")
+Sample.__doc__ = """
+Muestra ya convertida: cpu/iowait/sampler_cpu en % (sampler_cpu sobre una CPU),
+memoria en bytes, red y disco en bytes/s, `time` en segundos de uptime del servidor.
+"""
+
+SERIES = ("cpu", "mem", "net_rx", "net_tx", "disk_read", "disk_write", "load")
+
+
+def parse_record(line):
+    """Campos numéricos de una línea "S ..." del muestreador, o None si no lo es."""
+    fields = line.split()
+    if len(fields) != 16 or fields[0] != "S":
+        return None
+    try:
+        return [float(x) for x in fields[1:]]
+    except ValueError:
+        return None
+
+
+def to_sample(prev, cur):
+    """Sample a partir de dos registros consecutivos (contadores en bruto)."""
+    (t0, tot0, idle0, iow0, _, _, _, _, _, rx0, tx0, rd0, wr0, _, self0) = prev
+    (t1, tot1, idle1, iow1, ncpu, mt, ma, st, sf, rx1, tx1, rd1, wr1, load, self1) = cur
+    dt = max(t1 - t0, 1e-3)
+    dtot = max(tot1 - tot0, 1)
+    return Sample(
+        time=t1,
+        cpu=100.0 * (1 - (idle1 - idle0 + iow1 - iow0) / dtot),
+        iowait=100.0 * (iow1 - iow0) / dtot,
+        ncpu=int(ncpu),
+        mem_used=(mt - ma) * 1024,
+        mem_total=mt * 1024,
+        swap_used=(st - sf) * 1024,
+        # Un contador que retrocede (interfaz recreada, disco retirado) no es tráfico negativo
+        net_rx=max(rx1 - rx0, 0) / dt,
+        net_tx=max(tx1 - tx0, 0) / dt,
+        disk_read=max(rd1 - rd0, 0) * SECTOR / dt,
+        disk_write=max(wr1 - wr0, 0) * SECTOR / dt,
+        load=load,
+        sampler_cpu=100.0 * (self1 - self0) / USER_HZ / dt,
+    )
+
+
+class ResourceMonitor:
+    """
+    :param transport: paramiko.Transport autenticado.
+    :param interval: segundos entre muestras.
+    :param capacity: muestras que guarda cada serie (búfer circular).
+
+    on_sample(sample), si se asigna, se llama desde el hilo lector con cada Sample.
+    on_error(mensaje) se llama si el canal termina sin que se haya pedido.
+    """
+
+    def __init__(self, transport, interval=1.0, capacity=120):
+        self.transport = transport
+        self.interval = interval
+        self.capacity = capacity
+        self.series = {name: collections.deque(maxlen=capacity) for name in SERIES}
+        self.latest = None
+        self.on_sample = None
+        self.on_error = None
+        # Coste medible del muestreo: bytes por canal y tiempo de análisis en este lado
+        self.samples = 0
+        self.bytes_received = 0
+        self.parse_seconds = 0.0
+        self._channel = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        channel = self.transport.open_session()
+        channel.exec_command(f"LC_ALL=C exec awk -v interval={float(self.interval):g} {shlex.quote(_SAMPLER_AWK)}")
+        self._channel = channel
+        self._thread = threading.Thread(target=self._read_loop, name="ResourceMonitor", daemon=True)
+        self._thread.start()
+
+    def _read_loop(self):
+        channel = self._channel
+        pending = b""
+        prev = None
+        while not self._stop.is_set():
+            try:
+                data = channel.recv(4096)
+            except Exception:
+                data = b""
+            if not data:
+                break
+            self.bytes_received += len(data)
+            start = time.perf_counter()
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()  # registro a medias: se completa con la siguiente lectura
+            samples = []
+            for line in lines:
+                record = parse_record(line.decode("ascii", "replace"))
+                if record is None:
+                    continue
+                if prev is not None:
+                    samples.append(to_sample(prev, record))
+                prev = record
+            for sample in samples:
+                self._store(sample)
+            self.parse_seconds += time.perf_counter() - start
+            if self.on_sample is not None:
+                for sample in samples:
+                    self.on_sample(sample)
+        if not self._stop.is_set() and self.on_error is not None:
+            error = b""
+            try:
+                error = channel.recv_stderr(4096)
+            except Exception:
+                pass
+            self.on_error(error.decode("utf-8", "replace").strip() or "el muestreador remoto terminó")
+
+    def _store(self, sample):
+        with self._lock:
+            self.latest = sample
+            self.samples += 1
+            s = self.series
+            s["cpu"].append(sample.cpu)
+            s["mem"].append(100.0 * sample.mem_used / sample.mem_total if sample.mem_total else 0.0)
+            s["net_rx"].append(sample.net_rx)
+            s["net_tx"].append(sample.net_tx)
+            s["disk_read"].append(sample.disk_read)
+            s["disk_write"].append(sample.disk_write)
+            s["load"].append(sample.load)
+
+    def snapshot(self, name):
+        """Copia de una serie (lista), segura frente al hilo lector."""
+        with self._lock:
+            return list(self.series[name])
+
+    def stats(self):
+        samples = max(self.samples, 1)
+        latest = self.latest
+        return {"samples": self.samples, "bytes_per_sample": self.bytes_received / samples,
+                "parse_ms_per_sample": 1000.0 * self.parse_seconds / samples,
+                "server_cpu_percent": latest.sampler_cpu if latest else 0.0}
+
+    def stop(self):
+        self._stop.set()
+        channel, self._channel = self._channel, None
+        if channel is not None:
+            channel.close()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2)
+
+
+def _benchmark():
+    """Monitor contra engine.loopback (el servidor es esta misma máquina) durante unos segundos."""
+    import sys
+
+    from engine.loopback import LoopbackServer
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with LoopbackServer() as server:
+        client = server.client()
+        monitor = ResourceMonitor(client.get_transport(), interval=0.5)
+        costs = []
+        monitor.on_sample = lambda s: costs.append(s.sampler_cpu)
+        monitor.start()
+        time.sleep(seconds)
+        monitor.stop()
+        client.close()
+    latest = monitor.latest
+    stats = monitor.stats()
+    print(f"{stats['samples']} muestras; última: CPU {latest.cpu:.1f} %, memoria "
+          f"{latest.mem_used / (1 << 20):.0f}/{latest.mem_total / (1 << 20):.0f} MB, carga {latest.load}")
+    print(f"coste: {stats['bytes_per_sample']:.0f} B/muestra por el canal, "
+          f"{stats['parse_ms_per_sample']:.3f} ms/muestra de análisis aquí, "
+          f"{sum(costs) / max(len(costs), 1):.2f} % de una CPU en el servidor (awk + sleep)")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,364 @@
+"""
+Ejecución de bloques de comandos en una shell interactiva detectando el fin de cada uno.
+
+Cada comando lleva detrás, en la misma línea de shell, un printf que imprime
+una marca OSC 133;D (la misma que usan las integraciones de shell de los
+terminales modernos) con el código de salida y un token único. La shell lee la
+línea entera antes de ejecutar el comando, así que un comando que lee de la
+terminal (`read`, una clave) nunca se traga la marca. La marca es invisible
+para xterm.js y el eco de lo tecleado no la contiene literalmente (\\033 viaja
+como texto), así que no hay falsos positivos. Va entera en cada línea, sin
+funciones definidas de antemano: tras `bash`, `sudo -i`, `su` o `ssh` la shell
+que lee es otra y no conocería nada definido en la anterior.
+
+El detector es incremental: guarda el final del bloque anterior, de modo que
+una marca partida entre dos lecturas se reconoce igual.
+"""
+import collections
+import re
+import threading
+import time
+import uuid
+
+_MARK_COMMAND = "printf '\\033]133;D;%s;upi=%s\\007' \"$?\" {token}"
+_MARK_RE = re.compile(r"\x1b\]133;D;(\d+);upi=([0-9a-f]+-\d+)\x07")
+_MAX_MARK_LEN = 64
+
+_HEREDOC_RE = re.compile(r"<<(-?)\s*(['\"]?)([A-Za-z_][A-Za-z0-9_]*)\2")
+_OPENERS = {"if", "for", "while", "until", "case", "select"}
+_KEYWORD_RE = re.compile(r"(?:^|[;&|(\s])(if|for|while|until|case|select|fi|done|esac)(?=$|[;&|)\s])")
+_QUOTED_RE = re.compile(r"'[^']*'|\"(?:\\.|[^\"\\])*\"")
+
+# Programas que leen de la terminal: con ellos no se puede adelantar la entrada
+INTERACTIVE_COMMANDS = {
+    "sudo", "su", "ssh", "scp", "sftp", "ftp", "telnet", "passwd", "read", "vi", "vim", "nvim", "nano", "emacs",
+    "less", "more", "man", "top", "htop", "watch", "python", "python3", "ipython", "node", "mysql", "psql",
+    "sqlite3", "bash", "sh", "zsh", "tmux", "screen", "crontab", "visudo", "adduser",
+}
+
+# Consultas sin efectos: si una falla, ejecutar las siguientes no hace daño
+READ_ONLY_COMMANDS = {
+    "ls", "cat", "head", "tail", "wc", "grep", "egrep", "df", "du", "free", "uname", "uptime", "whoami", "id",
+    "pwd", "ps", "echo", "printf", "date", "hostname", "which", "type", "env", "printenv", "ip", "ss", "netstat",
+    "lsblk", "lscpu", "file", "stat", "find", "sort", "uniq", "cut", "tr", "awk", "sed", "journalctl",
+    "systemctl", "true", "false", "test", "[",
+}
+_READ_ONLY_SUBCOMMANDS = {"systemctl": {"status", "list-units", "is-active", "is-enabled", "show", "cat"}}
+
+CommandResult = collections.namedtuple("CommandResult", "index command status exit_code duration")
+
+
+def split_commands(block):
+    """
+    Divide un bloque en comandos completos. Mantiene juntos los here-docs, las
+    líneas continuadas con \\, && o |, las comillas abiertas y los bloques
+    if/for/while/case. Descarta líneas vacías y comentarios sueltos.
+    """
+    commands = []
+    current = []
+    heredocs = []
+    depth = 0
+    for line in block.splitlines():
+        if heredocs:
+            current.append(line)
+            delimiter, strip_tabs = heredocs[0]
+            if (line.lstrip("\t") if strip_tabs else line) == delimiter:
+                heredocs.pop(0)
+        else:
+            stripped = line.strip()
+            if not current and (not stripped or stripped.startswith("#")):
+                continue
+            current.append(line)
+            for dash, _quote, delimiter in _HEREDOC_RE.findall(line):
+                heredocs.append((delimiter, bool(dash)))
+            for keyword in _KEYWORD_RE.findall(_QUOTED_RE.sub("''", line)):
+                depth += 1 if keyword in _OPENERS else -1
+            depth = max(depth, 0)
+        if heredocs or depth:
+            continue
+        text = "\n".join(current)
+        tail = text.rstrip()
+        if tail.endswith(("\\", "&&", "||", "|")) or _has_open_quote(text):
+            continue
+        commands.append(text)
+        current = []
+    if current:
+        commands.append("\n".join(current))
+    return commands
+
+
+def _has_open_quote(text):
+    quote = None
+    escaped = False
+    for ch in text:
+        if escaped:
+            escaped = False
+        elif ch == "\\" and quote != "'":
+            escaped = True
+        elif quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+    return quote is not None
+
+
+def is_pipeline_safe(command):
+    """True si el comando no debería leer de la terminal (se le puede adelantar entrada)."""
+    words = command.split()
+    if not words or "<<" in command:
+        return bool(words)
+    first = words[0].rsplit("/", 1)[-1]
+    if first in INTERACTIVE_COMMANDS:
+        return False
+    if first in ("apt", "apt-get", "yum", "dnf") and "install" in words and not ({"-y", "--yes"} & set(words)):
+        return False
+    if first == "tail" and ("-f" in words or "-F" in words):
+        return False
+    return True
+
+
+def is_read_only(command):
+    """True si el comando (o cada tramo de una tubería) solo consulta el sistema."""
+    if re.search(r">|<<|\$\(|`|;|&&|\|\|", command) or "\n" in command:
+        return False
+    for segment in command.split("|"):
+        words = segment.split()
+        if not words:
+            return False
+        first = words[0].rsplit("/", 1)[-1]
+        if first not in READ_ONLY_COMMANDS:
+            return False
+        if first in _READ_ONLY_SUBCOMMANDS and (len(words) < 2 or words[1] not in _READ_ONLY_SUBCOMMANDS[first]):
+            return False
+        if first == "find" and ({"-delete", "-exec", "-execdir", "-ok"} & set(words)):
+            return False
+        if first == "sed" and any(w.startswith("-i") for w in words):
+            return False
+        if first == "tail" and ({"-f", "-F"} & set(words)):
+            return False
+    return True
+
+
+def with_mark(command, token):
+    """
+    Línea de shell que ejecuta `command` y después imprime su marca. Varias líneas
+    (here-docs, bloques), un comentario o un & / ; final no admiten "; printf"
+    detrás: van en un grupo { } cuya línea de cierre lleva la marca.
+    """
+    mark = _MARK_COMMAND.format(token=token)
+    if "\n" in command or "#" in command or command.rstrip().endswith(("&", ";")):
+        return f"{{ {command}\n}}; {mark}\n"
+    return f"{command}; {mark}\n"
+
+
+class MarkMatcher:
+    """Busca marcas de fin de comando en un flujo de texto troceado arbitrariamente."""
+
+    def __init__(self):
+        self._tail = ""
+
+    def feed(self, text):
+        """Retorna lista de (token, exit_code) encontrados en este bloque."""
+        if "\x1b" not in text and not self._tail:
+            return []
+        data = self._tail + text
+        found = []
+        last = 0
+        for m in _MARK_RE.finditer(data):
+            found.append((m.group(2), int(m.group(1))))
+            last = m.end()
+        # Conservar solo lo que podría ser el principio de una marca incompleta
+        rest = data[last:]
+        idx = rest.rfind("\x1b", max(0, len(rest) - _MAX_MARK_LEN))
+        self._tail = rest[idx:] if idx != -1 else ""
+        return found
+
+
+
+class CommandPipeline:
+    """
+    Ejecuta una lista de comandos sobre una ShellSession.
+
+    :param on_started: fn(index, command) al despachar cada comando.
+    :param on_finished: fn(CommandResult) al terminar cada comando.
+    :param on_done: fn(list[CommandResult]) al terminar el bloque completo.
+    :param pipelined: True adelanta los comandos, False de uno en uno, None decide:
+                      se adelanta si ninguno lee de la terminal y, con stop_on_error,
+                      además todos son consultas de solo lectura (un fallo no cambia nada).
+                      Nunca se escribe nada detrás de un comando que lee de la terminal:
+                      el adelanto se detiene en él hasta ver su marca.
+    :param stop_on_error: en modo secuencial, no despachar los siguientes tras un fallo.
+    :param timeout: segundos máximos por comando sin ver su marca.
+    """
+
+    def __init__(self, session, on_started=None, on_finished=None, on_done=None, pipelined=None,
+                 stop_on_error=True, timeout=300):
+        self.session = session
+        self.on_started = on_started
+        self.on_finished = on_finished
+        self.on_done = on_done
+        self.pipelined = pipelined
+        self.stop_on_error = stop_on_error
+        self.timeout = timeout
+        self.results = []
+        self._commands = []
+        self._prefix = uuid.uuid4().hex[:8]
+        self._matcher = MarkMatcher()
+        self._lock = threading.Lock()
+        self._next = 0          # siguiente comando a despachar
+        self._waiting = 0       # comando cuya marca se espera
+        self._started_at = 0.0
+        self._timer = None
+        self._finished = threading.Event()
+
+    # ----------------- API -----------------
+
+    def run(self, commands):
+        if isinstance(commands, str):
+            commands = split_commands(commands)
+        self._commands = list(commands)
+        if not self._commands:
+            self._finish()
+            return self
+        if self.pipelined is None:
+            safe = is_read_only if self.stop_on_error else is_pipeline_safe
+            self.pipelined = len(self._commands) > 1 and all(safe(c) for c in self._commands)
+        self.session.add_output_listener(self._on_output)
+        with self._lock:
+            self._started_at = time.monotonic()
+            if self.pipelined:
+                self._dispatch_ahead_locked()
+            else:
+                self._dispatch_locked()
+            self._arm_timer_locked()
+        return self
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    @property
+    def done(self):
+        return self._finished.is_set()
+
+    def cancel(self):
+        """Deja de esperar: los comandos pendientes se marcan como cancelados (no interrumpe el actual)."""
+        with self._lock:
+            if self._finished.is_set():
+                return
+            self._abort_locked("cancelled")
+        self._finish()
+
+    # ----------------- Interno -----------------
+
+    def _token(self, index):
+        return f"{self._prefix}-{index}"
+
+    def _dispatch_locked(self):
+        index = self._next
+        command = self._commands[index]
+        self._next += 1
+        self.session.write(with_mark(command, self._token(index)))
+        if self.on_started:
+            self.on_started(index, command)
+
+    def _dispatch_ahead_locked(self):
+        """Adelanta comandos hasta el primero que lee de la terminal, que se despacha el último."""
+        while self._next < len(self._commands):
+            self._dispatch_locked()
+            if not is_pipeline_safe(self._commands[self._next - 1]):
+                return
+
+    def _arm_timer_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.timeout, self._on_timeout)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_output(self, text):
+        marks = self._matcher.feed(text)
+        if not marks:
+            return
+        done = False
+        with self._lock:
+            for token, exit_code in marks:
+                if self._finished.is_set() or token != self._token(self._waiting):
+                    continue  # marcas de otros pipelines o repetidas
+                now = time.monotonic()
+                result = CommandResult(self._waiting, self._commands[self._waiting],
+                                       "ok" if exit_code == 0 else "error", exit_code, now - self._started_at)
+                self._record_locked(result)
+                self._waiting += 1
+                self._started_at = now
+                if self._waiting >= len(self._commands):
+                    done = True
+                elif exit_code != 0 and self.stop_on_error and not self.pipelined:
+                    self._abort_locked("skipped")
+                    done = True
+                else:
+                    if self._next == self._waiting:
+                        # Nada en cola: modo secuencial o adelanto detenido en un comando interactivo
+                        if self.pipelined:
+                            self._dispatch_ahead_locked()
+                        else:
+                            self._dispatch_locked()
+                    self._arm_timer_locked()
+        if done:
+            self._finish()
+
+    def _on_timeout(self):
+        with self._lock:
+            if self._finished.is_set():
+                return
+            self._abort_locked("timeout")
+        self._finish()
+
+    def _abort_locked(self, status):
+        """El comando en curso termina con `status`; los siguientes quedan como "skipped"."""
+        now = time.monotonic()
+        for index in range(self._waiting, len(self._commands)):
+            if index == self._waiting and status != "skipped":
+                result = CommandResult(index, self._commands[index], status, None, now - self._started_at)
+            else:
+                result = CommandResult(index, self._commands[index], "skipped", None, 0.0)
+            self._record_locked(result)
+        self._waiting = len(self._commands)
+
+    def _record_locked(self, result):
+        self.results.append(result)
+        if self.on_finished:
+            self.on_finished(result)
+
+    def _finish(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self.session.remove_output_listener(self._on_output)
+        if not self._finished.is_set():
+            self._finished.set()
+            if self.on_done:
+                self.on_done(list(self.results))
+
+
+def _benchmark(n=50):
+    """Secuencial frente a adelantado con comandos triviales en una shell local."""
+    from .session import LocalPtySession
+
+    for pipelined in (False, True):
+        session = LocalPtySession(shell="/bin/sh")
+        session.start()
+        try:
+            start = time.perf_counter()
+            pipeline = CommandPipeline(session, pipelined=pipelined).run([f"echo paso {i}" for i in range(n)])
+            pipeline.wait(60)
+            elapsed = time.perf_counter() - start
+            ok = sum(1 for r in pipeline.results if r.status == "ok")
+            mode = "adelantado" if pipelined else "secuencial"
+            print(f"{mode}: {ok}/{n} comandos en {elapsed * 1000:.0f} ms "
+                  f"({elapsed / n * 1000:.1f} ms/comando)")
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,443 @@
+"""
+Grabación de sesiones en formato asciicast v2 y reproducción con búsqueda rápida.
+
+El grabador se engancha como oyente de salida de una ShellSession: en el hilo
+lector solo agrega (tiempo, texto) a una deque; un hilo escritor serializa en
+lotes, comprime en streaming (gzip o zstd opcional) y rota por tamaño.
+
+Cada `keyframe_interval` segundos se cierra el miembro gzip / frame zstd en
+curso y se anota su desplazamiento en un índice lateral (<archivo>.idx.json),
+junto con una foto de la pantalla en ese instante (ScreenModel.render()), de
+modo que la reproducción puede saltar a cualquier instante pintando la foto y
+descomprimiendo solo desde el keyframe anterior. Los segmentos rotados
+(sesion.001.cast.gz, ...) llevan su propio índice y se leen encadenados.
+"""
+import collections
+import gzip
+import io
+import json
+import os
+import threading
+import time
+import zlib
+
+from engine.screen import ScreenModel
+
+try:
+    import zstandard
+except ImportError:  # compresión zstd opcional
+    zstandard = None
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def default_recordings_dir():
+    """Directorio de grabaciones: UPILOTO_RECORDINGS_DIR o ~/.upiloto/recordings."""
+    return os.environ.get("UPILOTO_RECORDINGS_DIR") or os.path.join(os.path.expanduser("~"), ".upiloto", "recordings")
+
+
+def new_recording_path(label, directory=None, ext=".cast.gz"):
+    """Ruta única para una grabación nueva: <label>-AAAAMMDD-HHMMSS.cast.gz."""
+    directory = directory or default_recordings_dir()
+    os.makedirs(directory, exist_ok=True)
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in label) or "sesion"
+    return os.path.join(directory, f"{safe}-{time.strftime('%Y%m%d-%H%M%S')}{ext}")
+
+
+def segment_path(path, n):
+    """Ruta del segmento n de una grabación rotada; el 0 es la propia ruta."""
+    if n == 0:
+        return path
+    base, ext = path, ""
+    for suffix in (".cast.gz", ".cast.zst", ".cast"):
+        if path.endswith(suffix):
+            base, ext = path[: -len(suffix)], suffix
+            break
+    return f"{base}.{n:03d}{ext}"
+
+
+def compression_for(path):
+    """Deduce la compresión a partir de la extensión (.gz / .zst)."""
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+class _SegmentWriter:
+    """Un archivo de grabación con su índice de keyframes."""
+
+    def __init__(self, path, compression, header, t=0.0, events=0, screen=None):
+        self.path = path
+        self.compression = compression
+        self.raw = open(path, "wb")
+        self.index = []
+        self._compressor = None
+        # El primer keyframe de un segmento rotado empieza en el instante de la rotación
+        self.new_member(t, events, screen)
+        self.write((json.dumps(header) + "\n").encode())
+
+    def new_member(self, t, events, screen=None):
+        """Cierra el bloque comprimido actual y abre uno nuevo (keyframe)."""
+        self._finish_member()
+        if self.compression == "gzip":
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif self.compression == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        entry = {"t": round(t, 6), "offset": self.raw.tell(), "events": events}
+        if screen:
+            entry["screen"] = screen
+        self.index.append(entry)
+
+    def _finish_member(self):
+        if self._compressor is not None:
+            self.raw.write(self._compressor.flush())
+            self._compressor = None
+
+    def write(self, data):
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        if data:
+            self.raw.write(data)
+
+    def size(self):
+        return self.raw.tell()
+
+    def close(self):
+        self._finish_member()
+        self.raw.close()
+        with open(self.path + ".idx.json", "w", encoding="utf-8") as f:
+            json.dump({"compression": self.compression, "keyframes": self.index}, f)
+
+
+class AsciicastRecorder:
+    """
+    :param path: archivo destino (.cast, .cast.gz o .cast.zst).
+    :param rotate_bytes: tamaño (comprimido) a partir del cual se abre un segmento nuevo.
+    :param keyframe_interval: segundos entre keyframes del índice.
+    :param flush_interval: cada cuánto vacía el escritor la cola de eventos.
+    """
+
+    def __init__(self, path, cols=80, rows=24, compression=None, rotate_bytes=None, keyframe_interval=5.0,
+                 flush_interval=0.2, title=None):
+        self.path = path
+        self.compression = compression if compression is not None else compression_for(path)
+        if self.compression == "zstd" and zstandard is None:
+            raise RuntimeError("La compresión zstd requiere el paquete 'zstandard'.")
+        self.rotate_bytes = rotate_bytes
+        self.keyframe_interval = keyframe_interval
+        self.flush_interval = flush_interval
+        self.header = {"version": 2, "width": cols, "height": rows, "timestamp": int(time.time()),
+                       "env": {"TERM": "xterm"}}
+        if title:
+            self.header["title"] = title
+        self.segments = []
+        self._events = collections.deque()
+        self._start = time.monotonic()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._session = None
+        self._thread = threading.Thread(target=self._run, name="AsciicastRecorder", daemon=True)
+        self._thread.start()
+
+    # ----------------- Ruta caliente (hilo lector) -----------------
+
+    def on_output(self, text):
+        # deque.append es atómico: no hay lock en la ruta de salida en vivo
+        self._events.append((time.monotonic() - self._start, "o", text))
+
+    def on_input(self, data):
+        self._events.append((time.monotonic() - self._start, "i", data))
+
+    def resize(self, cols, rows):
+        self._events.append((time.monotonic() - self._start, "r", f"{cols}x{rows}"))
+
+    # ----------------- Enganche con sesiones -----------------
+
+    def attach(self, session, record_input=False):
+        self._session = session
+        session.add_output_listener(self.on_output)
+        if record_input:
+            session.add_input_listener(self.on_input)
+        return self
+
+    def close(self):
+        if self._session is not None:
+            self._session.remove_output_listener(self.on_output)
+            self._session.remove_input_listener(self.on_input)
+            self._session = None
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=10)
+
+    # ----------------- Escritor en segundo plano -----------------
+
+    def _run(self):
+        segment = _SegmentWriter(segment_path(self.path, 0), self.compression, self.header)
+        self.segments.append(segment.path)
+        # Pantalla según la salida ya escrita: cada keyframe guarda su foto para saltar hasta él
+        screen = ScreenModel(self.header["width"], self.header["height"])
+        next_keyframe = self.keyframe_interval
+        count = 0
+        try:
+            while True:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                stopping = self._stop.is_set()
+                lines = []
+                while self._events:
+                    t, kind, data = self._events.popleft()
+                    if t >= next_keyframe:
+                        if lines:
+                            segment.write("".join(lines).encode())
+                            lines = []
+                        snapshot = screen.render()
+                        if self.rotate_bytes and segment.size() >= self.rotate_bytes:
+                            segment.close()
+                            header = dict(self.header, width=screen.cols, height=screen.rows,
+                                          timestamp=int(time.time()))
+                            segment = _SegmentWriter(segment_path(self.path, len(self.segments)), self.compression,
+                                                     header, t, count, snapshot)
+                            self.segments.append(segment.path)
+                        else:
+                            segment.new_member(t, count, snapshot)
+                        next_keyframe = t + self.keyframe_interval
+                    if kind == "o":
+                        screen.feed(data)
+                    elif kind == "r":
+                        cols, rows = data.split("x")
+                        screen.resize(int(cols), int(rows))
+                    lines.append(json.dumps([round(t, 6), kind, data]) + "\n")
+                    count += 1
+                if lines:
+                    segment.write("".join(lines).encode())
+                if stopping:
+                    break
+        except Exception as e:
+            print(f"Error escribiendo la grabación: {e}")
+        finally:
+            segment.close()
+
+
+class AsciicastReader:
+    """
+    Lee una grabación (comprimida o no), con sus segmentos rotados a continuación,
+    y permite saltar a un instante vía los índices.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.segments = [path]
+        while os.path.exists(segment_path(path, len(self.segments))):
+            self.segments.append(segment_path(path, len(self.segments)))
+        with open(path, "rb") as f:
+            magic = f.read(4)
+        if magic.startswith(_GZIP_MAGIC):
+            self.compression = "gzip"
+        elif magic == _ZSTD_MAGIC:
+            self.compression = "zstd"
+            if zstandard is None:
+                raise RuntimeError("Leer grabaciones zstd requiere el paquete 'zstandard'.")
+        else:
+            self.compression = None
+        # Keyframes de todos los segmentos en orden; "segment" dice en cuál está cada uno
+        self.keyframes = []
+        for n, segment in enumerate(self.segments):
+            try:
+                with open(segment + ".idx.json", "r", encoding="utf-8") as f:
+                    keyframes = json.load(f).get("keyframes", [])
+            except (OSError, ValueError):
+                continue
+            for kf in keyframes:
+                # Índices anteriores empezaban cada segmento en t=0: ese keyframe no sirve para saltar
+                if self.keyframes and kf["t"] < self.keyframes[-1]["t"]:
+                    continue
+                self.keyframes.append(dict(kf, segment=n))
+        stream = self._open_at(0)
+        self.header = json.loads(stream.readline())
+        stream.close()
+
+    def _open_at(self, offset, segment=0):
+        raw = open(self.segments[segment], "rb")
+        raw.seek(offset)
+        if self.compression == "gzip":
+            stream = gzip.GzipFile(fileobj=raw)
+        elif self.compression == "zstd":
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        else:
+            return io.TextIOWrapper(raw, encoding="utf-8")
+        return io.TextIOWrapper(io.BufferedReader(stream), encoding="utf-8")
+
+    def keyframe_at(self, t):
+        """Último keyframe en o antes de `t` (None si no hay índice: se lee desde el principio)."""
+        found = None
+        for kf in self.keyframes:
+            if kf["t"] > t:
+                break
+            found = kf
+        return found
+
+    def duration(self):
+        last = 0.0
+        for t, _, _ in self.events(keyframe=self.keyframes[-1] if self.keyframes else None):
+            last = t
+        return last
+
+    def events(self, from_time=0.0, keyframe=None):
+        """Itera (t, tipo, datos) desde `keyframe` o el anterior a `from_time`, segmento tras segmento."""
+        if keyframe is None:
+            keyframe = self.keyframe_at(from_time)
+        first, offset = (keyframe["segment"], keyframe["offset"]) if keyframe else (0, 0)
+        for segment in range(first, len(self.segments)):
+            stream = self._open_at(offset, segment)
+            try:
+                if offset == 0:
+                    stream.readline()  # cabecera
+                for line in stream:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    t, kind, data = json.loads(line)
+                    yield t, kind, data
+            finally:
+                stream.close()
+            offset = 0
+
+
+class ReplayPlayer:
+    """
+    Reproduce una grabación llamando a on_output(texto) con la temporización original.
+
+    :param speed: factor de velocidad (2.0 = el doble de rápido).
+    :param idle_limit: pausa máxima entre eventos en segundos (None = sin límite).
+    """
+
+    def __init__(self, path, on_output, speed=1.0, idle_limit=2.0, on_finished=None):
+        self.reader = AsciicastReader(path)
+        self.on_output = on_output
+        self.on_finished = on_finished
+        self.speed = speed
+        self.idle_limit = idle_limit
+        self.position = 0.0
+        header = self.reader.header
+        self._blank = ScreenModel(header.get("width", 80), header.get("height", 24)).render()
+        self._cond = threading.Condition()
+        self._paused = False
+        self._seek_to = None
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="ReplayPlayer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def wait(self, timeout=None):
+        """Espera a que termine la reproducción. Retorna True si terminó."""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def toggle_pause(self):
+        with self._cond:
+            self._paused = not self._paused
+            self._cond.notify_all()
+
+    def set_speed(self, speed):
+        with self._cond:
+            self.speed = max(0.1, min(64.0, speed))
+            self._cond.notify_all()
+
+    def seek(self, t):
+        with self._cond:
+            self._seek_to = max(0.0, t)
+            self._cond.notify_all()
+
+    def _wait(self, seconds):
+        """Espera interrumpible. Retorna False si hay que abandonar la iteración actual."""
+        deadline = time.monotonic() + seconds
+        with self._cond:
+            while not self._stop and self._seek_to is None:
+                remaining = deadline - time.monotonic()
+                if self._paused:
+                    self._cond.wait()
+                    deadline = time.monotonic() + max(0.0, remaining)
+                    continue
+                if remaining <= 0:
+                    return True
+                self._cond.wait(remaining)
+            return False
+
+    def _run(self):
+        target = 0.0
+        try:
+            while not self._stop:
+                self._seek_to = None
+                # Al saltar: pintar la foto del keyframe (o una pantalla en blanco) y avanzar
+                # sin esperas hasta el instante pedido
+                keyframe = None
+                if target > 0:
+                    keyframe = self.reader.keyframe_at(target)
+                    self.on_output(keyframe.get("screen") if keyframe and keyframe.get("screen") else self._blank)
+                prev = None
+                interrupted = False
+                for t, kind, data in self.reader.events(target, keyframe):
+                    if kind != "o":
+                        continue
+                    if t >= target and prev is not None:
+                        delay = t - prev
+                        if self.idle_limit is not None:
+                            delay = min(delay, self.idle_limit)
+                        if not self._wait(delay / self.speed):
+                            interrupted = True
+                            break
+                    prev = max(t, target)
+                    self.position = t
+                    self.on_output(data)
+                if not interrupted:
+                    break
+                with self._cond:
+                    if self._stop:
+                        break
+                    target = self._seek_to if self._seek_to is not None else self.position
+        except Exception as e:
+            print(f"Error reproduciendo la grabación: {e}")
+        if self.on_finished and not self._stop:
+            self.on_finished()
+
+
+def _benchmark(events=200000, chunk=120):
+    """Coste por evento en la ruta caliente y tiempo de búsqueda en una grabación grande."""
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "bench.cast.gz")
+    rec = AsciicastRecorder(path, keyframe_interval=0.5)
+    payload = "x" * (chunk - 2) + "\r\n"
+    hot = 0.0
+    for i in range(0, events, 2000):
+        start = time.perf_counter()
+        for _ in range(2000):
+            rec.on_output(payload)
+        hot += time.perf_counter() - start
+        time.sleep(0.02)  # repartir los eventos en el tiempo para generar keyframes
+    rec.close()
+    print(f"ruta caliente: {hot / events * 1e6:.2f} µs/evento; archivo {os.path.getsize(path) / 1e6:.1f} MB "
+          f"para {events * chunk / 1e6:.1f} MB de salida")
+    reader = AsciicastReader(path)
+    duration = reader.keyframes[-1]["t"] if reader.keyframes else 0.0
+    start = time.perf_counter()
+    first = next(reader.events(duration * 0.9))
+    print(f"seek al 90% ({duration * 0.9:.2f}s, {len(reader.keyframes)} keyframes): "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms (evento t={first[0]:.2f})")
+
+
+if __name__ == "__main__":
+    _benchmark()
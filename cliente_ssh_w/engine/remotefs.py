@@ -0,0 +1,332 @@
+"""
+Navegación del sistema de archivos remoto por SFTP sobre el transporte de la sesión.
+
+Los listados de directorio se guardan en una caché LRU con caducidad (TTL) y un
+presupuesto total de entradas, así que volver a un directorio ya visto no cuesta
+ningún viaje de red. Las operaciones hechas desde aquí (crear, borrar, renombrar,
+subir) invalidan los directorios afectados.
+
+Las peticiones las atiende un pool pequeño de hilos, cada uno con su propio
+SFTPClient (un canal por hilo: los listados no se bloquean entre sí). Las
+peticiones del usuario pasan por delante de la precarga de subdirectorios, cuya
+cola está acotada y descarta lo más antiguo.
+"""
+import collections
+import heapq
+import itertools
+import posixpath
+import stat
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+RemoteEntry = collections.namedtuple("RemoteEntry", "name path is_dir is_link size mtime mode")
+
+_USER, _PREFETCH = 0, 1
+
+
+class DirectoryCache:
+    """LRU de listados por ruta con TTL; se limita por número total de entradas, no de directorios."""
+
+    def __init__(self, ttl=120.0, max_entries=500000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()  # ruta -> (instante, entradas)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            item = self._data.get(path)
+            if item is None or time.monotonic() - item[0] > self.ttl:
+                if item is not None:
+                    self._drop(path)
+                self.misses += 1
+                return None
+            self._data.move_to_end(path)
+            self.hits += 1
+            return item[1]
+
+    def put(self, path, entries):
+        with self._lock:
+            if path in self._data:
+                self._drop(path)
+            self._data[path] = (time.monotonic(), entries)
+            self._size += len(entries)
+            while self._size > self.max_entries and len(self._data) > 1:
+                self._drop(next(iter(self._data)))
+
+    def invalidate(self, path, recursive=False):
+        with self._lock:
+            if recursive:
+                prefix = path.rstrip("/") + "/"
+                for key in [k for k in self._data if k == path or k.startswith(prefix)]:
+                    self._drop(key)
+            elif path in self._data:
+                self._drop(path)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def _drop(self, path):
+        _, entries = self._data.pop(path)
+        self._size -= len(entries)
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+
+def _entry(directory, attr):
+    mode = attr.st_mode or 0
+    is_link = stat.S_ISLNK(mode)
+    # Los enlaces se tratan como directorios posibles: se resuelve al abrirlos
+    is_dir = stat.S_ISDIR(mode) or is_link
+    return RemoteEntry(attr.filename, posixpath.join(directory, attr.filename), is_dir, is_link,
+                       attr.st_size or 0, attr.st_mtime or 0, mode)
+
+
+def sort_entries(entries):
+    """Directorios primero y después por nombre (sin distinguir mayúsculas)."""
+    return sorted(entries, key=lambda e: (not e.is_dir, e.name.lower(), e.name))
+
+
+class RemoteFS:
+    """
+    :param transport: paramiko.Transport autenticado.
+    :param workers: hilos (y canales SFTP) para listados y operaciones.
+    :param max_prefetch: precargas pendientes como máximo; las más antiguas se descartan.
+
+    on_progress(path, count), si se asigna, se llama desde los hilos del pool cada
+    PROGRESS_STEP entradas mientras se lista un directorio grande.
+    """
+    PROGRESS_STEP = 5000
+
+    def __init__(self, transport, ttl=120.0, max_entries=500000, workers=3, max_prefetch=64):
+        self.transport = transport
+        self.cache = DirectoryCache(ttl=ttl, max_entries=max_entries)
+        self.max_prefetch = max_prefetch
+        self.round_trips = 0
+        self.on_progress = None
+        self._lock = threading.Condition()
+        self._heap = []               # (prioridad, orden, ruta)
+        self._inflight = {}           # ruta -> Future
+        self._prefetch_order = collections.deque()
+        self._counter = itertools.count()
+        self._closed = False
+        self._local = threading.local()
+        self._clients = []
+        self._threads = [threading.Thread(target=self._worker, name=f"RemoteFS-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+        self._home = None
+        # Operaciones puntuales (crear, borrar, subir...) fuera del hilo de la GUI
+        self._ops = ThreadPoolExecutor(max_workers=2, thread_name_prefix="RemoteFSOps")
+
+    # ----------------- Listados -----------------
+
+    def cached(self, path):
+        """Listado en caché (o None) sin tocar la red."""
+        return self.cache.get(path)
+
+    def list_async(self, path, callback=None):
+        """
+        Retorna un Future con la lista ordenada de RemoteEntry. Si está en caché el
+        Future ya viene resuelto; si ya se está pidiendo, se comparte la petición.
+        `callback(path, entries, error)` se llama desde el hilo que resuelve.
+        """
+        path = self.normalize(path)
+        entries = self.cache.get(path)
+        if entries is not None:
+            future = Future()
+            future.set_result(entries)
+        else:
+            future = self._submit(path, _USER)
+        if callback is not None:
+            future.add_done_callback(lambda f: callback(path, *self._outcome(f)))
+        return future
+
+    def listdir(self, path, timeout=None):
+        return self.list_async(path).result(timeout)
+
+    def prefetch(self, paths):
+        """Pide en segundo plano los directorios que no estén ya en caché ni en curso."""
+        for path in paths:
+            path = self.normalize(path)
+            if path not in self.cache:
+                self._submit(path, _PREFETCH)
+
+    @staticmethod
+    def _outcome(future):
+        if future.cancelled():
+            return None, CancelledError()
+        error = future.exception()
+        return (None, error) if error is not None else (future.result(), None)
+
+    def _submit(self, path, priority):
+        with self._lock:
+            if self._closed:
+                future = Future()
+                future.set_exception(RuntimeError("RemoteFS cerrado"))
+                return future
+            future = self._inflight.get(path)
+            if future is not None:
+                if priority == _USER:
+                    # Una precarga en cola pasa a ser petición del usuario
+                    heapq.heappush(self._heap, (_USER, next(self._counter), path))
+                    self._lock.notify()
+                return future
+            future = Future()
+            self._inflight[path] = future
+            heapq.heappush(self._heap, (priority, next(self._counter), path))
+            if priority == _PREFETCH:
+                self._prefetch_order.append(path)
+                if len(self._prefetch_order) > self.max_prefetch:
+                    self._discard_oldest_prefetch()
+            self._lock.notify()
+            return future
+
+    def _discard_oldest_prefetch(self):
+        while self._prefetch_order:
+            old = self._prefetch_order.popleft()
+            queued = [item for item in self._heap if item[2] == old]
+            if queued and all(item[0] == _PREFETCH for item in queued):
+                self._heap = [item for item in self._heap if item[2] != old]
+                heapq.heapify(self._heap)
+                self._inflight.pop(old).cancel()
+                return
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                while not self._heap and not self._closed:
+                    self._lock.wait()
+                if self._closed:
+                    return
+                _, _, path = heapq.heappop(self._heap)
+                future = self._inflight.get(path)
+                if future is None or future.done() or future.running():
+                    continue  # duplicado de una petición promovida que ya atiende otro hilo
+                if not future.set_running_or_notify_cancel():
+                    continue
+            try:
+                entries = self._fetch(path)
+            except Exception as e:
+                with self._lock:
+                    self._inflight.pop(path, None)
+                future.set_exception(e)
+                continue
+            self.cache.put(path, entries)
+            with self._lock:
+                self._inflight.pop(path, None)
+            future.set_result(entries)
+
+    def _fetch(self, path):
+        sftp = self._client()
+        self.round_trips += 1
+        entries = []
+        # listdir_iter encadena varias lecturas de directorio sin esperar cada respuesta
+        for attr in sftp.listdir_iter(path, read_aheads=64):
+            entries.append(_entry(path, attr))
+            if self.on_progress is not None and len(entries) % self.PROGRESS_STEP == 0:
+                self.on_progress(path, len(entries))
+        return sort_entries(entries)
+
+    def _client(self):
+        sftp = getattr(self._local, "sftp", None)
+        if sftp is None or sftp.sock.closed:
+            sftp = self.transport.open_sftp_client()
+            self._local.sftp = sftp
+            with self._lock:
+                self._clients.append(sftp)
+        return sftp
+
+    # ----------------- Rutas -----------------
+
+    @property
+    def home(self):
+        if self._home is None:
+            self._home = self._run(lambda sftp: sftp.normalize("."))
+        return self._home
+
+    def normalize(self, path):
+        if not path or path == "~":
+            return self.home
+        if path.startswith("~/"):
+            path = posixpath.join(self.home, path[2:])
+        path = posixpath.normpath(path)
+        return "/" + path.lstrip("/") if path.startswith("/") else posixpath.join(self.home, path)
+
+    def _run(self, fn):
+        """Ejecuta fn(sftp) con un cliente propio del hilo llamador (operaciones puntuales)."""
+        return fn(self._client())
+
+    # ----------------- Operaciones (invalidan la caché) -----------------
+
+    def mkdir(self, path):
+        path = self.normalize(path)
+        self._run(lambda sftp: sftp.mkdir(path))
+        self.cache.invalidate(posixpath.dirname(path))
+
+    def remove(self, entry):
+        """Borra un archivo o un directorio vacío."""
+        if entry.is_dir and not entry.is_link:
+            self._run(lambda sftp: sftp.rmdir(entry.path))
+            self.cache.invalidate(entry.path, recursive=True)
+        else:
+            self._run(lambda sftp: sftp.remove(entry.path))
+        self.cache.invalidate(posixpath.dirname(entry.path))
+
+    def rename(self, old, new):
+        old, new = self.normalize(old), self.normalize(new)
+        self._run(lambda sftp: sftp.posix_rename(old, new))
+        self.cache.invalidate(old, recursive=True)
+        self.cache.invalidate(posixpath.dirname(old))
+        self.cache.invalidate(posixpath.dirname(new))
+
+    def upload(self, local_path, remote_path, callback=None):
+        remote_path = self.normalize(remote_path)
+        self._run(lambda sftp: sftp.put(local_path, remote_path, callback=callback))
+        self.cache.invalidate(posixpath.dirname(remote_path))
+
+    def download(self, remote_path, local_path, callback=None):
+        self._run(lambda sftp: sftp.get(self.normalize(remote_path), local_path, callback=callback))
+
+    def run_async(self, method, *args, callback=None):
+        """
+        Ejecuta una operación (p. ej. fs.mkdir) en segundo plano; callback(result, error)
+        se llama desde ese hilo al terminar.
+        """
+        future = self._ops.submit(method, *args)
+        if callback is not None:
+            future.add_done_callback(lambda f: callback(*self._outcome(f)))
+        return future
+
+    def invalidate(self, path, recursive=False):
+        self.cache.invalidate(self.normalize(path), recursive=recursive)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._heap)
+        return {"cached_dirs": len(self.cache._data), "cached_entries": self.cache._size, "hits": self.cache.hits,
+                "misses": self.cache.misses, "round_trips": self.round_trips, "pending": pending}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for future in self._inflight.values():
+                future.cancel()
+            self._inflight.clear()
+            self._heap.clear()
+            self._lock.notify_all()
+            clients, self._clients = self._clients, []
+        self._ops.shutdown(wait=False, cancel_futures=True)
+        for sftp in clients:
+            try:
+                sftp.close()
+            except Exception:
+                pass
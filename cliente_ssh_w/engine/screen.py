@@ -0,0 +1,606 @@
+"""
+Modelo de pantalla VT en Python y control de "modo avalancha" (flood mode).
+
+ScreenModel interpreta el subconjunto de xterm que usan las shells y las
+aplicaciones de pantalla completa habituales (movimiento de cursor, borrado,
+regiones de scroll, SGR, pantalla alternativa) y mantiene la rejilla de
+caracteres visible. El texto imprimible se procesa por tramos completos, no
+carácter a carácter.
+
+FloodGate se coloca entre el hilo lector y el frontend: mientras la salida va
+por debajo del umbral la deja pasar tal cual; cuando lo supera, deja de
+reenviar el flujo y envía cada `snapshot_interval` segundos una foto de la
+pantalla, y vuelve al paso directo cuando la salida se calma.
+"""
+import re
+import threading
+import time
+import unicodedata
+
+# Texto imprimible | CSI | OSC | DCS/PM/APC | ESC + intermedio + final | ESC + carácter | control C0
+_TOKEN_RE = re.compile(
+    r"([^\x00-\x1f\x7f\x1b]+)"
+    r"|\x1b\[([0-?]*)([ -/]*)([@-~])"
+    r"|(\x1b\][^\x07\x1b]*(?:\x07|\x1b\\))"
+    r"|(\x1b[PX^_][^\x1b]*\x1b\\)"
+    r"|\x1b([ -/])([0-~])"
+    r"|\x1b([0-OQ-WYZ\\`-~])"
+    r"|([\x00-\x1a\x1c-\x1f\x7f])"
+)
+_MAX_CARRY = 4096
+_SGR_CACHE = {}
+_SGR_RE = re.compile(r"\x1b\[([0-9;:]*)m")
+# Cualquier escape que no sea SGR, o controles que mueven el cursor entre filas
+_NOT_SCROLL_SAFE_RE = re.compile(r"\x1b(?!\[[0-9;:]*m)|[\x0b\x0c]")
+# Modos DEC privados que no cambian la rejilla pero sí el comportamiento del terminal:
+# teclas de cursor (1) y teclado numérico (66) en modo aplicación, pegado entre
+# corchetes (2004), ratón (1000/1002/1003 y codificación SGR 1006) y parpadeo del cursor (12).
+# Una foto tiene que volver a fijarlos o el frontend se queda con los de antes de la avalancha.
+REPLAYED_MODES = frozenset(("1", "12", "66", "1000", "1002", "1003", "1006", "2004"))
+
+
+def _char_width(ch):
+    if unicodedata.combining(ch):
+        return 0
+    return 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+
+
+def _sgr_state(params, fg, bg, flags):
+    """Aplica los parámetros SGR al estado (fg, bg, flags) y retorna el nuevo estado."""
+    codes = [int(p) if p.isdigit() else 0 for p in params.replace(":", ";").split(";")] if params else [0]
+    i = 0
+    while i < len(codes):
+        c = codes[i]
+        if c == 0:
+            fg, bg, flags = "", "", frozenset()
+        elif c in (1, 2, 3, 4, 5, 7, 8, 9):
+            flags = flags | {c}
+        elif c in (22, 23, 24, 25, 27, 28, 29):
+            off = {22: (1, 2), 23: (3,), 24: (4,), 25: (5,), 27: (7,), 28: (8,), 29: (9,)}[c]
+            flags = flags - set(off)
+        elif 30 <= c <= 37 or 90 <= c <= 97:
+            fg = str(c)
+        elif c == 39:
+            fg = ""
+        elif 40 <= c <= 47 or 100 <= c <= 107:
+            bg = str(c)
+        elif c == 49:
+            bg = ""
+        elif c in (38, 48) and i + 1 < len(codes):
+            n = 3 if codes[i + 1] == 5 else 5
+            value = ";".join(str(x) for x in codes[i:i + n])
+            i += n - 1
+            if c == 38:
+                fg = value
+            else:
+                bg = value
+        i += 1
+    return fg, bg, flags
+
+
+class ScreenModel:
+    """
+    Rejilla de `rows` x `cols` celdas con su atributo SGR (cadena de parámetros, "" = por defecto).
+    No es seguro entre hilos por sí mismo; FloodGate serializa el acceso.
+    """
+
+    def __init__(self, cols=80, rows=24):
+        self.cols = cols
+        self.rows = rows
+        self._carry = ""
+        self._fg, self._bg, self._flags = "", "", frozenset()
+        self.attr = ""
+        self.reset()
+
+    # ----------------- Estado -----------------
+
+    def reset(self):
+        self.chars = [[" "] * self.cols for _ in range(self.rows)]
+        self.attrs = [[""] * self.cols for _ in range(self.rows)]
+        self.x = 0
+        self.y = 0
+        self.top = 0
+        self.bottom = self.rows - 1
+        self.autowrap = True
+        self.cursor_visible = True
+        self.alternate = False
+        # Modo -> activo, en el orden en que se fijaron (entre los de ratón manda el último);
+        # un reset los desactiva explícitamente para que la foto también los apague
+        self.modes = dict.fromkeys(getattr(self, "modes", ()), False)
+        # ESC = / ESC > (teclado numérico de aplicación); None: nunca se fijó
+        self.keypad_application = None if getattr(self, "keypad_application", None) is None else False
+        self._saved_cursor = (0, 0, "")
+        self._saved_main = None
+        self._fg, self._bg, self._flags = "", "", frozenset()
+        self.attr = ""
+
+    def resize(self, cols, rows):
+        for grid, blank in ((self.chars, " "), (self.attrs, "")):
+            for row in grid:
+                if len(row) < cols:
+                    row.extend([blank] * (cols - len(row)))
+                else:
+                    del row[cols:]
+            while len(grid) > rows:
+                grid.pop(0)
+            while len(grid) < rows:
+                grid.append([blank] * cols)
+        if self.rows > rows:
+            self.y = max(0, self.y - (self.rows - rows))
+        self.cols, self.rows = cols, rows
+        self.top, self.bottom = 0, rows - 1
+        self.x = min(self.x, cols - 1)
+        self.y = min(self.y, rows - 1)
+
+    def _blank_row(self):
+        return [" "] * self.cols, [self.attr if self._bg else ""] * self.cols
+
+    # ----------------- API de consulta -----------------
+
+    def screen_text(self):
+        """Texto visible, una línea por fila, sin espacios finales."""
+        return "\n".join("".join(row).rstrip() for row in self.chars)
+
+    def line(self, y):
+        return "".join(self.chars[y]).rstrip()
+
+    @property
+    def cursor(self):
+        return min(self.x, self.cols - 1), self.y
+
+    def render(self):
+        """
+        Secuencia ANSI que reproduce la pantalla completa en un terminal xterm, con los
+        modos de REPLAYED_MODES y del teclado numérico que se hayan fijado en la sesión.
+        """
+        out = ["\x1b[?25l", "\x1b[?1049h" if self.alternate else "\x1b[?1049l", "\x1b[0m\x1b[H\x1b[2J"]
+        for y in range(self.rows):
+            chars, attrs = self.chars[y], self.attrs[y]
+            end = self.cols
+            while end > 0 and chars[end - 1] == " " and attrs[end - 1] == "":
+                end -= 1
+            if not end:
+                continue
+            out.append(f"\x1b[{y + 1};1H")
+            current = ""
+            start = 0
+            for x in range(end + 1):
+                attr = attrs[x] if x < end else None
+                if attr != current or x == end:
+                    if x > start:
+                        out.append("".join(c for c in chars[start:x] if c))
+                    if x < end:
+                        out.append(f"\x1b[0;{attr}m" if attr else "\x1b[0m")
+                        current = attr
+                    start = x
+        out.append("\x1b[0m")
+        if self.attr:
+            out.append(f"\x1b[0;{self.attr}m")
+        if self.top != 0 or self.bottom != self.rows - 1:
+            out.append(f"\x1b[{self.top + 1};{self.bottom + 1}r")
+        x, y = self.cursor
+        out.append(f"\x1b[{y + 1};{x + 1}H")
+        for mode, enabled in self.modes.items():
+            out.append(f"\x1b[?{mode}{'h' if enabled else 'l'}")
+        if self.keypad_application is not None:
+            out.append("\x1b=" if self.keypad_application else "\x1b>")
+        if self.cursor_visible:
+            out.append("\x1b[?25h")
+        return "".join(out)
+
+    # ----------------- Entrada -----------------
+
+    def feed(self, text):
+        if self._carry:
+            text = self._carry + text
+            self._carry = ""
+        if text.count("\n") > 2 * self.rows:
+            text = self._skip_scrolled(text)
+        pos = 0
+        end = len(text)
+        match = _TOKEN_RE.match
+        while pos < end:
+            m = match(text, pos)
+            if m is None:
+                # ESC sin completar al final del bloque: esperar al siguiente
+                if end - pos < _MAX_CARRY:
+                    self._carry = text[pos:]
+                    return
+                pos += 1
+                continue
+            kind = m.lastindex
+            if kind == 1:
+                self._draw(m.group(1))
+            elif kind == 4:
+                self._csi(m.group(2), m.group(3), m.group(4))
+            elif kind == 10:
+                self._control(m.group(10))
+            elif kind == 9:
+                self._escape(m.group(9))
+            # OSC, DCS y designación de juegos de caracteres no cambian la rejilla
+            pos = m.end()
+
+    def _skip_scrolled(self, text):
+        """
+        Atajo para salidas tipo `cat`: si el bloque solo contiene texto, SGR y saltos
+        de línea, todo lo anterior a las últimas `rows`+1 líneas acabará fuera de la
+        pantalla, así que basta con aplicar sus SGR y empezar desde ahí en la última fila.
+        """
+        if self.alternate or self.top != 0 or self.bottom != self.rows - 1:
+            return text
+        cut = len(text)
+        for _ in range(self.rows + 1):
+            cut = text.rfind("\n", 0, cut)
+            if cut <= 0:
+                return text
+        if text[cut - 1] != "\r":
+            return text
+        skipped = text[:cut + 1]
+        if skipped.count("\n") < self.rows or _NOT_SCROLL_SAFE_RE.search(skipped):
+            return text
+        for sgr in _SGR_RE.findall(skipped):
+            self._sgr(sgr)
+        for y in range(self.rows):
+            self.chars[y], self.attrs[y] = self._blank_row()
+        self.x, self.y = 0, self.rows - 1
+        return text[cut + 1:]
+
+    def _draw(self, text):
+        if not text.isascii():
+            for ch in text:
+                self._draw_char(ch)
+            return
+        cols = self.cols
+        while text:
+            if self.x >= cols:
+                if not self.autowrap:
+                    self.x = cols - 1
+                else:
+                    self.x = 0
+                    self._linefeed()
+            n = min(cols - self.x, len(text))
+            x, row = self.x, self.y
+            self.chars[row][x:x + n] = text[:n]
+            self.attrs[row][x:x + n] = [self.attr] * n
+            self.x += n
+            text = text[n:]
+
+    def _draw_char(self, ch):
+        width = _char_width(ch)
+        if width == 0:
+            if self.x > 0:
+                self.chars[self.y][self.x - 1] += ch
+            return
+        if self.x + width > self.cols:
+            if self.autowrap:
+                self.x = 0
+                self._linefeed()
+            else:
+                self.x = self.cols - width
+        self.chars[self.y][self.x] = ch
+        self.attrs[self.y][self.x] = self.attr
+        if width == 2 and self.x + 1 < self.cols:
+            # Celda de continuación de un carácter ancho
+            self.chars[self.y][self.x + 1] = ""
+            self.attrs[self.y][self.x + 1] = self.attr
+        self.x += width
+
+    def _linefeed(self):
+        if self.y == self.bottom:
+            self._scroll_up(1)
+        elif self.y < self.rows - 1:
+            self.y += 1
+
+    def _scroll_up(self, n, top=None):
+        top = self.top if top is None else top
+        n = min(n, self.bottom - top + 1)
+        for _ in range(n):
+            del self.chars[top]
+            del self.attrs[top]
+            chars, attrs = self._blank_row()
+            self.chars.insert(self.bottom, chars)
+            self.attrs.insert(self.bottom, attrs)
+
+    def _scroll_down(self, n, top=None):
+        top = self.top if top is None else top
+        n = min(n, self.bottom - top + 1)
+        for _ in range(n):
+            del self.chars[self.bottom]
+            del self.attrs[self.bottom]
+            chars, attrs = self._blank_row()
+            self.chars.insert(top, chars)
+            self.attrs.insert(top, attrs)
+
+    def _control(self, ch):
+        if ch == "\n" or ch == "\x0b" or ch == "\x0c":
+            self._linefeed()
+        elif ch == "\r":
+            self.x = 0
+        elif ch == "\x08":
+            self.x = max(0, min(self.x, self.cols) - 1)
+        elif ch == "\t":
+            self.x = min(self.cols - 1, (self.x // 8 + 1) * 8)
+
+    def _escape(self, ch):
+        if ch == "7":
+            self._saved_cursor = (self.x, self.y, self.attr)
+        elif ch == "8":
+            self.x, self.y, self.attr = self._saved_cursor
+        elif ch == "D":
+            self._linefeed()
+        elif ch == "E":
+            self.x = 0
+            self._linefeed()
+        elif ch == "M":
+            if self.y == self.top:
+                self._scroll_down(1)
+            elif self.y > 0:
+                self.y -= 1
+        elif ch == "=" or ch == ">":
+            self.keypad_application = ch == "="
+        elif ch == "c":
+            self.reset()
+
+    def _erase(self, y, start, end):
+        blank_attr = self.attr if self._bg else ""
+        self.chars[y][start:end] = [" "] * (end - start)
+        self.attrs[y][start:end] = [blank_attr] * (end - start)
+
+    def _csi(self, params, inter, final):
+        if params.startswith("?"):
+            if final in "hl":
+                self._private_mode(params[1:], final == "h")
+            return
+        if final == "m":
+            self._sgr(params)
+            return
+        if params[:1] in "<=>" and params:
+            return  # respuestas/consultas de terminal, sin efecto en la rejilla
+        args = [int(p) if p.isdigit() else 0 for p in params.split(";")] if params else []
+        first = args[0] if args else 0
+        n = first or 1
+        cols, rows = self.cols, self.rows
+        if final in "Hf":
+            row = args[0] if args and args[0] else 1
+            col = args[1] if len(args) > 1 and args[1] else 1
+            self.y = min(rows, row) - 1
+            self.x = min(cols, col) - 1
+        elif final == "A":
+            self.y = max(self.top if self.y >= self.top else 0, self.y - n)
+        elif final == "B":
+            self.y = min(self.bottom if self.y <= self.bottom else rows - 1, self.y + n)
+        elif final == "C":
+            self.x = min(cols - 1, self.x + n)
+        elif final == "D":
+            self.x = max(0, min(self.x, cols - 1) - n)
+        elif final == "E":
+            self.x, self.y = 0, min(rows - 1, self.y + n)
+        elif final == "F":
+            self.x, self.y = 0, max(0, self.y - n)
+        elif final == "G" or final == "`":
+            self.x = min(cols, n) - 1
+        elif final == "d":
+            self.y = min(rows, n) - 1
+        elif final == "J":
+            x = min(self.x, cols)
+            if first == 0:
+                self._erase(self.y, x, cols)
+                for y in range(self.y + 1, rows):
+                    self._erase(y, 0, cols)
+            elif first == 1:
+                for y in range(self.y):
+                    self._erase(y, 0, cols)
+                self._erase(self.y, 0, min(cols, x + 1))
+            else:
+                for y in range(rows):
+                    self._erase(y, 0, cols)
+        elif final == "K":
+            x = min(self.x, cols)
+            if first == 0:
+                self._erase(self.y, x, cols)
+            elif first == 1:
+                self._erase(self.y, 0, min(cols, x + 1))
+            else:
+                self._erase(self.y, 0, cols)
+        elif final == "X":
+            x = min(self.x, cols - 1)
+            self._erase(self.y, x, min(cols, x + n))
+        elif final == "P":
+            x = min(self.x, cols - 1)
+            n = min(n, cols - x)
+            del self.chars[self.y][x:x + n]
+            del self.attrs[self.y][x:x + n]
+            self.chars[self.y].extend([" "] * n)
+            self.attrs[self.y].extend([""] * n)
+        elif final == "@":
+            x = min(self.x, cols - 1)
+            n = min(n, cols - x)
+            self.chars[self.y][x:x] = [" "] * n
+            self.attrs[self.y][x:x] = [""] * n
+            del self.chars[self.y][cols:]
+            del self.attrs[self.y][cols:]
+        elif final == "L":
+            if self.top <= self.y <= self.bottom:
+                self._scroll_down(n, top=self.y)
+        elif final == "M":
+            if self.top <= self.y <= self.bottom:
+                self._scroll_up(n, top=self.y)
+        elif final == "S":
+            self._scroll_up(n)
+        elif final == "T" and len(args) <= 1:
+            self._scroll_down(n)
+        elif final == "r":
+            top = (args[0] if args and args[0] else 1) - 1
+            bottom = (args[1] if len(args) > 1 and args[1] else rows) - 1
+            if top < bottom <= rows - 1:
+                self.top, self.bottom = top, bottom
+                self.x, self.y = 0, 0
+        elif final == "s" and not args:
+            self._saved_cursor = (self.x, self.y, self.attr)
+        elif final == "u":
+            self.x, self.y, self.attr = self._saved_cursor
+
+    def _sgr(self, params):
+        # Las combinaciones (estado, parámetros) se repiten muchísimo: se memorizan
+        key = (params, self._fg, self._bg, self._flags)
+        state = _SGR_CACHE.get(key)
+        if state is None:
+            fg, bg, flags = _sgr_state(params, self._fg, self._bg, self._flags)
+            parts = [str(f) for f in sorted(flags)] + [p for p in (fg, bg) if p]
+            state = (fg, bg, flags, ";".join(parts))
+            if len(_SGR_CACHE) > 4096:
+                _SGR_CACHE.clear()
+            _SGR_CACHE[key] = state
+        self._fg, self._bg, self._flags, self.attr = state
+
+    def _private_mode(self, params, enable):
+        for mode in params.split(";"):
+            if mode in REPLAYED_MODES:
+                self.modes.pop(mode, None)
+                self.modes[mode] = enable
+            elif mode == "25":
+                self.cursor_visible = enable
+            elif mode == "7":
+                self.autowrap = enable
+            elif mode in ("47", "1047", "1049"):
+                if enable and not self.alternate:
+                    if mode == "1049":
+                        self._saved_cursor = (self.x, self.y, self.attr)
+                    self._saved_main = (self.chars, self.attrs)
+                    self.chars = [[" "] * self.cols for _ in range(self.rows)]
+                    self.attrs = [[""] * self.cols for _ in range(self.rows)]
+                    self.alternate = True
+                elif not enable and self.alternate:
+                    self.chars, self.attrs = self._saved_main
+                    self._saved_main = None
+                    self.alternate = False
+                    if mode == "1049":
+                        self.x, self.y, self.attr = self._saved_cursor
+
+
+class FloodGate:
+    """
+    Decide entre reenviar el flujo crudo o fotos periódicas de la pantalla.
+
+    :param forward: fn(texto) que entrega datos al frontend (p. ej. send_output.emit).
+    :param threshold: bytes/s a partir de los cuales se entra en modo avalancha.
+    :param window: ventana de medición del ritmo de salida, en segundos.
+    :param snapshot_interval: periodo entre fotos mientras dura la avalancha.
+    :param calm_time: segundos por debajo del umbral para volver al paso directo.
+    """
+
+    def __init__(self, screen, forward, threshold=256 * 1024, window=0.25, snapshot_interval=0.1, calm_time=0.3):
+        self.screen = screen
+        self.forward = forward
+        self.threshold = threshold
+        self.window = window
+        self.snapshot_interval = snapshot_interval
+        self.calm_time = calm_time
+        self.flooding = False
+        self.floods = 0
+        self.bytes_skipped = 0
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._calm_since = None
+        self._last_feed = 0.0
+        self._wake = threading.Event()
+        self._stop = False
+        self._ticker = None
+
+    def feed(self, text):
+        """Se llama desde el hilo lector con cada bloque de salida."""
+        now = time.monotonic()
+        with self._lock:
+            self.screen.feed(text)
+            self._last_feed = now
+            elapsed = now - self._window_start
+            if elapsed >= self.window:
+                rate = self._window_bytes / elapsed
+                self._window_start, self._window_bytes = now, 0
+                if rate >= self.threshold:
+                    self._calm_since = None
+                    if not self.flooding:
+                        self._enter_flood()
+                elif self.flooding and self._calm_since is None:
+                    self._calm_since = now
+            self._window_bytes += len(text)
+            if self.flooding:
+                self.bytes_skipped += len(text)
+            else:
+                self.forward(text)
+
+    def _enter_flood(self):
+        self.flooding = True
+        self.floods += 1
+        if self._ticker is None:
+            self._ticker = threading.Thread(target=self._tick_loop, name="FloodGate", daemon=True)
+            self._ticker.start()
+        self._wake.set()
+
+    def _tick_loop(self):
+        while not self._stop:
+            self._wake.wait()
+            self._wake.clear()
+            while not self._stop and self.flooding:
+                time.sleep(self.snapshot_interval)
+                now = time.monotonic()
+                with self._lock:
+                    if not self.flooding:
+                        break
+                    # Sin datos durante calm_time también cuenta como calma
+                    idle = now - self._last_feed >= self.calm_time
+                    calm = idle or (self._calm_since is not None and now - self._calm_since >= self.calm_time)
+                    self.forward(self.screen.render())
+                    if calm:
+                        self.flooding = False
+                        self._calm_since = None
+
+    def screen_text(self):
+        with self._lock:
+            return self.screen.screen_text()
+
+    def resize(self, cols, rows):
+        with self._lock:
+            self.screen.resize(cols, rows)
+
+    def close(self):
+        self._stop = True
+        self._wake.set()
+
+
+def _benchmark(megabytes=20):
+    """Velocidad del parser con salida tipo `cat` de un log grande y con una app de pantalla completa."""
+    import random
+
+    rng = random.Random(1)
+    lines = [f"{i:07d} \x1b[32mINFO\x1b[0m " + "".join(rng.choice("abcdefgh ") for _ in range(70)) + "\r\n"
+             for i in range(5000)]
+    log = "".join(lines)
+    screen = ScreenModel(120, 40)
+    total = megabytes * (1 << 20)
+    start = time.perf_counter()
+    fed = 0
+    while fed < total:
+        for i in range(0, len(log), 16384):
+            screen.feed(log[i:i + 16384])
+        fed += len(log)
+    elapsed = time.perf_counter() - start
+    print(f"log: {fed / (1 << 20) / elapsed:.1f} MB/s")
+    frames = []
+    for f in range(200):
+        frame = ["\x1b[H"]
+        for y in range(40):
+            frame.append(f"\x1b[{y + 1};1H\x1b[7m{f:5d}\x1b[0m " + "".join(rng.choice("|/-\\") for _ in range(100)))
+        frames.append("".join(frame))
+    data = "\x1b[?1049h" + "".join(frames)
+    start = time.perf_counter()
+    for _ in range(10):
+        screen.feed(data)
+    elapsed = time.perf_counter() - start
+    print(f"pantalla completa: {10 * len(data) / (1 << 20) / elapsed:.1f} MB/s; "
+          f"render {len(screen.render())} bytes frente a {len(data)} bytes de flujo por lote")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,341 @@
+"""
+Historial de salida (scrollback) con búsqueda indexada, independiente de xterm.js.
+
+La salida de la sesión llega ya decodificada desde el hilo lector; se le quitan
+las secuencias ANSI y se guarda línea a línea en un log en disco. En memoria
+solo quedan la cola reciente (hasta `tail_bytes`) y un índice de desplazamientos
+de línea; el resto se lee a través de mmap.
+
+Búsqueda: el log se parte en bloques de ~`block_size` alineados a fin de línea y
+de cada bloque se guarda el conjunto ordenado de trigramas (en minúsculas). Una
+consulta solo escanea con bytes.find los bloques que contienen todos sus
+trigramas, así que buscar en cientos de MB cuesta milisegundos salvo cuando el
+texto aparece en todas partes.
+"""
+import bisect
+import collections
+import mmap
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # sin numpy los trigramas se calculan en Python puro (más lento)
+    np = None
+
+# CSI, OSC (terminado en BEL o ST), DCS/PM/APC, designación de charset y ESC de dos caracteres
+_ANSI_RE = re.compile(
+    r"\x1b(?:\[[0-?]*[ -/]*[@-~]"
+    r"|\][^\x07\x1b]*(?:\x07|\x1b\\)"
+    r"|[PX^_][^\x1b]*\x1b\\"
+    r"|[()*+#][0-9A-Za-z]"
+    r"|[@-OQ-WYZ\\=>78])"
+)
+# El resto de caracteres de control (\r, BEL, backspace, ESC sueltos...) se borran con translate,
+# mucho más rápido que una alternativa más en la expresión regular
+_CONTROL_CHARS = dict.fromkeys([*range(0, 9), *range(11, 32), 127])
+_MAX_CARRY = 4096
+
+ScrollbackHit = collections.namedtuple("ScrollbackHit", "line column text")
+
+
+class AnsiStripper:
+    """Quita secuencias de escape de forma incremental (una secuencia puede llegar partida)."""
+
+    def __init__(self):
+        self._carry = ""
+
+    def feed(self, text):
+        if self._carry:
+            text = self._carry + text
+            self._carry = ""
+        idx = text.rfind("\x1b")
+        if idx != -1 and len(text) - idx < _MAX_CARRY:
+            m = _ANSI_RE.match(text, idx)
+            if m is None:
+                # Secuencia incompleta al final del bloque: esperar al resto
+                self._carry = text[idx:]
+                text = text[:idx]
+        if "\x1b" in text:
+            text = _ANSI_RE.sub("", text)
+        return text.translate(_CONTROL_CHARS)
+
+
+def _trigrams(data, mask=None):
+    """
+    Trigramas únicos y ordenados de un bloque de bytes (ya en minúsculas).
+    Con `mask` (bool[2**24] a cero) se deduplica marcando un mapa de bits, bastante
+    más rápido que np.unique para bloques grandes; la máscara se deja otra vez a cero.
+    """
+    if len(data) < 3:
+        return array("I")
+    if np is not None:
+        a = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+        grams = (a[:-2] << 16) | (a[1:-1] << 8) | a[2:]
+        if mask is None:
+            return np.unique(grams)
+        mask[grams] = True
+        found = np.flatnonzero(mask).astype(np.uint32)
+        mask[found] = False
+        return found
+    return array("I", sorted({(x << 16) | (y << 8) | z for x, y, z in zip(data, data[1:], data[2:])}))
+
+
+def _contains_all(grams, wanted):
+    if np is not None and isinstance(grams, np.ndarray):
+        pos = np.searchsorted(grams, wanted)
+        pos[pos >= len(grams)] = 0
+        return bool(np.all(grams[pos] == wanted)) if len(grams) else False
+    for g in wanted:
+        i = bisect.bisect_left(grams, g)
+        if i >= len(grams) or grams[i] != g:
+            return False
+    return True
+
+
+class ScrollbackStore:
+    """
+    :param path: archivo del log; por defecto uno temporal que se borra en close().
+    :param tail_bytes: bytes recientes que se mantienen en memoria antes de volcar a disco.
+    :param block_size: tamaño aproximado de los bloques del índice de trigramas.
+    """
+
+    def __init__(self, path=None, tail_bytes=1 << 20, block_size=1 << 20):
+        self._owns_file = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="upiloto-scrollback-", suffix=".log")
+            os.close(fd)
+        self.path = path
+        self.tail_bytes = tail_bytes
+        self.block_size = block_size
+        self._file = open(path, "w+b")
+        self._lock = threading.Lock()
+        self._stripper = AnsiStripper()
+        self._partial = ""
+        self._pending = bytearray()   # cola en memoria, aún no volcada al log
+        self._disk_size = 0
+        self._line_starts = array("Q")
+        self._blocks = []             # [inicio, fin, trigramas | None]
+        self._block_start = 0
+        self._mmap = None
+        self._mmap_size = 0
+        self._closed = False
+        self._index_queue = queue.Queue()
+        self._indexer = threading.Thread(target=self._index_loop, name="ScrollbackIndexer", daemon=True)
+        self._indexer.start()
+
+    # ----------------- Ingesta (hilo lector) -----------------
+
+    def feed(self, text):
+        text = self._stripper.feed(text)
+        if not text:
+            return
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        if not lines:
+            return
+        data = ("\n".join(lines) + "\n").encode("utf-8", "replace")
+        with self._lock:
+            if self._closed:
+                return
+            base = self._disk_size + len(self._pending)
+            self._line_starts.append(base)
+            if len(lines) > 1:
+                if np is not None and len(lines) > 16:
+                    ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8)[:-1] == 10)
+                    self._line_starts.frombytes((ends + (base + 1)).astype(np.uint64).tobytes())
+                else:
+                    pos = data.find(b"\n")
+                    while pos != len(data) - 1:
+                        self._line_starts.append(base + pos + 1)
+                        pos = data.find(b"\n", pos + 1)
+            self._pending += data
+            offset = base + len(data)
+            if offset - self._block_start >= self.block_size:
+                block = [self._block_start, offset, None]
+                self._blocks.append(block)
+                self._block_start = offset
+                self._index_queue.put(block)
+            if len(self._pending) >= self.tail_bytes:
+                self._spill()
+
+    def _spill(self):
+        self._file.write(self._pending)
+        self._file.flush()
+        self._disk_size += len(self._pending)
+        self._pending = bytearray()
+
+    def _index_loop(self):
+        mask = None
+        while True:
+            block = self._index_queue.get()
+            if block is None:
+                return
+            if mask is None and np is not None:
+                mask = np.zeros(1 << 24, dtype=np.bool_)
+            try:
+                block[2] = _trigrams(self._read(block[0], block[1]).lower(), mask)
+            except Exception as e:
+                print(f"Error indexando el scrollback: {e}")
+
+    # ----------------- Lectura -----------------
+
+    def _read(self, start, end):
+        with self._lock:
+            if self._closed:
+                return b""
+            out = b""
+            if start < self._disk_size:
+                if self._mmap_size < self._disk_size:
+                    if self._mmap is not None:
+                        self._mmap.close()
+                    self._mmap = mmap.mmap(self._file.fileno(), self._disk_size, access=mmap.ACCESS_READ)
+                    self._mmap_size = self._disk_size
+                out = self._mmap[start:min(end, self._disk_size)]
+            if end > self._disk_size:
+                out += bytes(self._pending[max(0, start - self._disk_size):end - self._disk_size])
+            return out
+
+    @property
+    def line_count(self):
+        return len(self._line_starts)
+
+    @property
+    def size(self):
+        return self._disk_size + len(self._pending)
+
+    def lines(self, start, end):
+        """Líneas completas [start, end) como texto."""
+        with self._lock:
+            end = min(end, len(self._line_starts))
+            if start >= end:
+                return []
+            first = self._line_starts[start]
+            last = self._line_starts[end] if end < len(self._line_starts) else self._disk_size + len(self._pending)
+        return self._read(first, last).decode("utf-8", "replace").split("\n")[: end - start]
+
+    def line(self, n):
+        found = self.lines(n, n + 1)
+        return found[0] if found else ""
+
+    # ----------------- Búsqueda -----------------
+
+    def search(self, query, limit=200):
+        """
+        Busca `query` (sin distinguir mayúsculas ASCII) y retorna hasta `limit`
+        ScrollbackHit, de la coincidencia más reciente a la más antigua.
+        """
+        needle = query.lower().encode("utf-8")
+        if not needle or "\n" in query:
+            return []
+        wanted = None
+        if len(needle) >= 3:
+            wanted = _trigrams(needle)
+        with self._lock:
+            blocks = list(self._blocks)
+            tail = (self._block_start, self._disk_size + len(self._pending))
+        ranges = [(b[0], b[1], b[2]) for b in blocks] + [(tail[0], tail[1], None)]
+        hits = []
+        for start, end, grams in reversed(ranges):
+            if start >= end:
+                continue
+            if wanted is not None and grams is not None and not _contains_all(grams, wanted):
+                continue
+            self._scan(start, self._read(start, end), needle, hits, limit)
+            if len(hits) >= limit:
+                break
+        return hits[:limit]
+
+    def _scan(self, base, data, needle, hits, limit):
+        lowered = data.lower()
+        found = []
+        pos = lowered.find(needle)
+        last_line = -1
+        while pos != -1:
+            line_no = bisect.bisect_right(self._line_starts, base + pos) - 1
+            if line_no != last_line:
+                found.append((line_no, pos))
+                last_line = line_no
+            nl = lowered.find(b"\n", pos)
+            if nl == -1:
+                break
+            pos = lowered.find(needle, nl + 1)
+        # Dentro del bloque: más recientes primero
+        for line_no, pos in reversed(found):
+            line_start = self._line_starts[line_no] - base
+            line_end = data.find(b"\n", pos)
+            text = data[line_start:line_end].decode("utf-8", "replace")
+            column = len(data[line_start:pos].decode("utf-8", "replace"))
+            hits.append(ScrollbackHit(line_no, column, text))
+            if len(hits) >= limit:
+                return
+
+    def wait_indexed(self, timeout=None):
+        """Espera a que el indexador procese los bloques cerrados (útil en benchmarks)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(b[2] is None for b in self._blocks):
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self):
+        with self._lock:
+            indexed = sum(1 for b in self._blocks if b[2] is not None)
+            return {"lines": len(self._line_starts), "bytes": self._disk_size + len(self._pending),
+                    "memory_tail": len(self._pending), "blocks": len(self._blocks), "indexed": indexed}
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._file.close()
+        self._index_queue.put(None)
+        if self._owns_file:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def _benchmark(megabytes=200):
+    import random
+
+    rng = random.Random(1)
+    words = ["INFO", "WARN", "worker", "request", "served", "GET", "/api/v1/items", "200", "latency", "cache",
+             "miss", "hit", "user", "session", "\x1b[32mok\x1b[0m", "retry", "upstream", "timeout"]
+    chunk = "".join(
+        f"{i:08d} " + " ".join(rng.choice(words) for _ in range(10)) + f" id={rng.getrandbits(48):012x}\r\n"
+        for i in range(20000)
+    )
+    store = ScrollbackStore()
+    target = megabytes * (1 << 20)
+    start = time.perf_counter()
+    fed = 0
+    while fed < target:
+        for i in range(0, len(chunk), 4096):
+            store.feed(chunk[i:i + 4096])
+        fed += len(chunk)
+    feed_time = time.perf_counter() - start
+    store.feed("linea final con AGUJA-unica-7f3a\r\n")
+    store.wait_indexed()
+    index_time = time.perf_counter() - start
+    print(f"ingesta: {fed / (1 << 20) / feed_time:.0f} MB/s; indexado completo en {index_time:.1f}s; {store.stats()}")
+    for query in ("aguja-unica-7f3a", "id=00000000dead", "upstream timeout"):
+        t0 = time.perf_counter()
+        hits = store.search(query, limit=100)
+        print(f"buscar {query!r}: {len(hits)} resultados en {(time.perf_counter() - t0) * 1000:.1f} ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,521 @@
+"""
+Núcleo de sesión de terminal sin dependencias de Qt.
+
+Una sesión abre un canal de shell (SSH o pty local), lee la salida en un hilo
+dirigido por eventos, escribe la entrada desde un hilo escritor propio y
+notifica a oyentes registrados por callback. Los adaptadores (Qt en
+UglyWidgets/Library, asyncio en engine/aio.py, la CLI en cli.py) se montan
+encima sin que el núcleo sepa de ellos.
+"""
+import codecs
+import os
+import queue
+import selectors
+import socket
+import threading
+import time
+
+from engine import metrics
+
+BRACKETED_PASTE_START = "\x1b[200~"
+BRACKETED_PASTE_END = "\x1b[201~"
+# La aplicación remota activa o desactiva el modo bracketed paste
+_PASTE_ON = "\x1b[?2004h"
+_PASTE_OFF = "\x1b[?2004l"
+
+
+class SessionError(Exception):
+    pass
+
+
+# Destinos (metrics_label) abiertos alguna vez en este proceso: volver a abrir uno es una reconexión
+_opened_targets = set()
+_opened_lock = threading.Lock()
+
+
+class _Paste:
+    """Pegado grande pendiente en la cola del escritor (se envía por trozos y se puede cancelar)."""
+    __slots__ = ("data", "on_progress", "cancelled")
+
+    def __init__(self, data, on_progress):
+        self.data = data
+        self.on_progress = on_progress
+        self.cancelled = False
+
+
+class ShellSession:
+    """
+    Base común de las sesiones. Las subclases implementan _open(), _fileobj(),
+    _recv(n), _send(view), _resize(cols, rows) y _close_resources().
+
+    Oyentes (se llaman desde los hilos internos; deben ser rápidos):
+      - output: fn(text) por cada bloque de salida decodificado.
+      - input:  fn(data) por cada escritura del usuario, antes de enviarla.
+      - close:  fn() una sola vez cuando la sesión termina.
+    """
+
+    # Bytes por envío de un pegado grande; las subclases lo ajustan a la ventana del canal
+    paste_chunk_size = 4096
+
+    def __init__(self, cols=80, rows=24, read_size=65536):
+        self.cols = cols
+        self.rows = rows
+        self.read_size = read_size
+        # La aplicación remota activó el modo bracketed paste (CSI ? 2004 h)
+        self.bracketed_paste = False
+        # Código de salida de la shell, conocido al cerrar (None si el canal no lo informó)
+        self.exit_status = None
+        self._paste = None
+        # Listas copy-on-write: el hilo lector las recorre sin tomar locks
+        self._output_listeners = []
+        self._input_listeners = []
+        self._close_listeners = []
+        self._listeners_lock = threading.Lock()
+        self._write_queue = queue.Queue()
+        self._reader = None
+        self._writer = None
+        self._stop = threading.Event()
+        self._closed = threading.Event()
+        self._wake_r, self._wake_w = socket.socketpair()
+
+    @property
+    def metrics_label(self):
+        """Valor de la etiqueta `channel` de las métricas de esta sesión (ver engine.metrics)."""
+        return type(self).__name__
+
+    def _bind_metrics(self):
+        # Series resueltas una vez al arrancar: en los bucles solo queda el incremento
+        label = self.metrics_label
+        self._m_received = metrics.bytes_received.labels(label)
+        self._m_sent = metrics.bytes_sent.labels(label)
+        self._m_wakeups = metrics.reader_wakeups.labels(label)
+        self._m_write_latency = metrics.write_latency.labels(label)
+
+    # ----------------- Oyentes -----------------
+
+    def _add(self, attr, fn):
+        with self._listeners_lock:
+            setattr(self, attr, getattr(self, attr) + [fn])
+        return fn
+
+    def _remove(self, attr, fn):
+        with self._listeners_lock:
+            setattr(self, attr, [f for f in getattr(self, attr) if f is not fn])
+
+    def add_output_listener(self, fn):
+        return self._add("_output_listeners", fn)
+
+    def remove_output_listener(self, fn):
+        self._remove("_output_listeners", fn)
+
+    def add_input_listener(self, fn):
+        return self._add("_input_listeners", fn)
+
+    def remove_input_listener(self, fn):
+        self._remove("_input_listeners", fn)
+
+    def add_close_listener(self, fn):
+        return self._add("_close_listeners", fn)
+
+    def _emit(self, listeners, *args):
+        for fn in listeners:
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Error en oyente de sesión {fn!r}: {e}")
+
+    # ----------------- Ciclo de vida -----------------
+
+    def start(self):
+        """Abre el canal y arranca los hilos lector y escritor."""
+        self._bind_metrics()
+        label = self.metrics_label
+        try:
+            self._open()
+        except Exception:
+            metrics.connects.labels(label, "error").inc()
+            self._stop.set()
+            for s in (self._wake_r, self._wake_w):
+                s.close()
+            raise
+        metrics.connects.labels(label, "ok").inc()
+        with _opened_lock:
+            if label in _opened_targets:
+                metrics.reconnects.labels(label).inc()
+            _opened_targets.add(label)
+        self._reader = threading.Thread(target=self._read_loop, name=f"{type(self).__name__}Reader", daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, name=f"{type(self).__name__}Writer", daemon=True)
+        self._reader.start()
+        self._writer.start()
+        return self
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def wait_closed(self, timeout=None):
+        return self._closed.wait(timeout)
+
+    def close(self):
+        """Detiene los hilos y libera el canal. Idempotente."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._write_queue.put(None)
+        try:
+            self._wake_w.send(b"x")
+        except OSError:
+            pass
+        current = threading.current_thread()
+        for t in (self._reader, self._writer):
+            if t is not None and t is not current:
+                t.join(timeout=5)
+        try:
+            self._close_resources()
+        except Exception as e:
+            print(f"Error cerrando la sesión: {e}")
+        for s in (self._wake_r, self._wake_w):
+            try:
+                s.close()
+            except OSError:
+                pass
+        self._mark_closed()
+
+    def _mark_closed(self):
+        if not self._closed.is_set():
+            self._closed.set()
+            self._emit(self._close_listeners)
+
+    # ----------------- Entrada / salida -----------------
+
+    def write(self, data):
+        """Encola datos para el hilo escritor (no bloquea al llamador)."""
+        if not data or self._stop.is_set():
+            return
+        self._emit(self._input_listeners, data)
+        self._write_queue.put((time.perf_counter(), data))
+
+    def send_command(self, command):
+        self.write(command + "\n")
+
+    def paste(self, text, bracketed=None, on_progress=None):
+        """
+        Encola un pegado grande. Se envía en trozos de paste_chunk_size sin intercalar
+        otras escrituras, envuelto en CSI 200~/201~ si la aplicación remota lo pidió
+        (o si `bracketed` lo fuerza), y llama a on_progress(enviados, total) en bytes
+        desde el hilo escritor, como mucho unas diez veces por segundo y al terminar.
+        """
+        if not text or self._stop.is_set():
+            return None
+        if self.bracketed_paste if bracketed is None else bracketed:
+            # Un fin de pegado dentro del texto sacaría a la aplicación del modo pegado
+            text = BRACKETED_PASTE_START + text.replace(BRACKETED_PASTE_END, "") + BRACKETED_PASTE_END
+        self._emit(self._input_listeners, text)
+        item = _Paste(text.encode(), on_progress)
+        self._write_queue.put((time.perf_counter(), item))
+        return item
+
+    def cancel_paste(self):
+        """Deja de enviar el pegado en curso (lo ya enviado no se puede deshacer)."""
+        item = self._paste
+        if item is not None:
+            item.cancelled = True
+            return True
+        return False
+
+    @property
+    def pasting(self):
+        return self._paste is not None
+
+    def resize(self, cols, rows):
+        self.cols, self.rows = cols, rows
+        self._resize(cols, rows)
+
+    def _read_loop(self):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        # Final del bloque anterior: un CSI ? 2004 h/l partido entre dos lecturas se ve igual
+        tail = ""
+        sel = selectors.DefaultSelector()
+        try:
+            sel.register(self._fileobj(), selectors.EVENT_READ, "data")
+            sel.register(self._wake_r, selectors.EVENT_READ, "wake")
+            while not self._stop.is_set():
+                for key, _ in sel.select():
+                    if key.data == "wake":
+                        return
+                    data = self._recv(self.read_size)
+                    if not data:
+                        return
+                    self._m_wakeups.inc()
+                    self._m_received.inc(len(data))
+                    text = decoder.decode(data)
+                    if text:
+                        scan = tail + text
+                        if "\x1b[?2004" in scan:
+                            self._track_paste_mode(scan)
+                        # Una secuencia completa no cabe en la cola: no se cuenta dos veces
+                        tail = scan[-(len(_PASTE_ON) - 1):]
+                        self._emit(self._output_listeners, text)
+        except Exception as e:
+            if not self._stop.is_set():
+                print(f"Error leyendo de la sesión: {e}")
+        finally:
+            sel.close()
+            # Fin del canal por el lado remoto: cerrar también el escritor
+            if not self._stop.is_set():
+                threading.Thread(target=self.close, daemon=True).start()
+
+    def _track_paste_mode(self, text):
+        on = text.rfind(_PASTE_ON)
+        off = text.rfind(_PASTE_OFF)
+        if on != off:
+            self.bracketed_paste = on > off
+
+    def _write_loop(self):
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
+            queued_at, data = item
+            try:
+                if isinstance(data, _Paste):
+                    self._write_paste(data)
+                    continue
+                self._send_all(memoryview(data.encode() if isinstance(data, str) else data))
+                self._m_write_latency.observe(time.perf_counter() - queued_at)
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"Error escribiendo en la sesión: {e}")
+
+    def _send_all(self, view):
+        self._m_sent.inc(len(view))
+        while view:
+            sent = self._send(view)
+            if sent <= 0:
+                raise SessionError("el canal no acepta más datos")
+            view = view[sent:]
+
+    def _write_paste(self, item):
+        self._paste = item
+        view = memoryview(item.data)
+        total = len(view)
+        done = 0
+        last_report = 0.0
+        try:
+            while done < total and not item.cancelled and not self._stop.is_set():
+                # _send puede aceptar menos de lo pedido (ventana SSH llena): se reintenta el resto
+                chunk = view[done:done + self.paste_chunk_size]
+                self._send_all(chunk)
+                done += len(chunk)
+                now = time.monotonic()
+                if item.on_progress and now - last_report >= 0.1:
+                    last_report = now
+                    item.on_progress(done, total)
+            if item.cancelled and item.data.startswith(BRACKETED_PASTE_START.encode()) and done < total:
+                # Cerrar el pegado para que la aplicación no se quede esperando el final
+                self._send_all(memoryview(BRACKETED_PASTE_END.encode()))
+        finally:
+            self._paste = None
+            if item.on_progress:
+                item.on_progress(done, total)
+
+    # ----------------- Hooks de subclase -----------------
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _fileobj(self):
+        raise NotImplementedError
+
+    def _recv(self, n):
+        raise NotImplementedError
+
+    def _send(self, view):
+        raise NotImplementedError
+
+    def _resize(self, cols, rows):
+        pass
+
+    def _close_resources(self):
+        pass
+
+
+class SshSession(ShellSession):
+    """
+    Sesión de shell interactiva sobre SSH (paramiko). `jump` ("usuario@bastión:puerto",
+    separados por comas si hay varios, como ssh -J) encadena el destino a través de
+    bastiones compartidos con otras sesiones (ver engine.connect).
+    """
+
+    def __init__(self, host, port, username, password, term="xterm", timeout=30, jump=None, **kwargs):
+        super().__init__(**kwargs)
+        self.host = str(host).strip()
+        self.port = int(port)
+        self.username = str(username).strip()
+        self.password = str(password).strip()
+        self.term = term
+        self.timeout = timeout
+        self.jump = jump
+        self.client = None
+        self.channel = None
+        self.connect_report = None
+
+    @property
+    def transport(self):
+        return self.client.get_transport() if self.client else None
+
+    @property
+    def metrics_label(self):
+        return f"{self.username}@{self.host}:{self.port}"
+
+    @property
+    def paste_chunk_size(self):
+        # Un paquete SSH completo por envío: channel.send nunca manda más de eso de una vez
+        if self.channel is not None:
+            return max(1024, min(self.channel.out_max_packet_size, 32768))
+        return 32768
+
+    def _open(self):
+        import paramiko
+
+        from engine.connect import connect_client
+
+        self.client = paramiko.SSHClient()
+        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())  # Automatically add unknown hosts
+        try:
+            # known_hosts y DNS en caché; las direcciones del host compiten (ver engine.connect)
+            self.connect_report = connect_client(self.client, self.host, self.port, self.username, self.password,
+                                                 timeout=self.timeout, jump=self.jump, look_for_keys=False)
+        except paramiko.AuthenticationException as e:
+            raise SessionError(f"Autenticación fallida: {e}")
+        except paramiko.SSHException as e:
+            raise SessionError(f"Error SSH: {e}")
+        except Exception as e:
+            raise SessionError(f"Error de conexión: {e}")
+
+        try:
+            self.channel = self.client.invoke_shell(self.term, width=self.cols, height=self.rows)
+            self.channel.set_combine_stderr(True)
+        except Exception as e:
+            print(f"Shell not supported ({e}), falling back to pty...")
+            self.channel = self.client.get_transport().open_session()
+            self.channel.get_pty(self.term, width=self.cols, height=self.rows)
+            self.channel.set_combine_stderr(True)
+
+    def _fileobj(self):
+        return self.channel
+
+    def _recv(self, n):
+        return self.channel.recv(n)
+
+    def _send(self, view):
+        return self.channel.send(view)
+
+    def _resize(self, cols, rows):
+        if self.channel is not None and not self.channel.closed:
+            self.channel.resize_pty(width=cols, height=rows)
+
+    def _close_resources(self):
+        if self.channel is not None:
+            if self.channel.exit_status_ready():
+                self.exit_status = self.channel.recv_exit_status()
+            self.channel.close()
+        if self.client is not None:
+            self.client.close()
+        if self.connect_report is not None:
+            self.connect_report.release()
+
+
+class LocalPtySession(ShellSession):
+    """Shell local sobre un pty (Linux/macOS)."""
+
+    def __init__(self, shell=None, cwd=None, **kwargs):
+        super().__init__(**kwargs)
+        self.shell = shell or os.environ.get("SHELL") or "/bin/sh"
+        self.cwd = cwd
+        self.pid = None
+        self.master_fd = None
+
+    @property
+    def metrics_label(self):
+        return "local"
+
+    def _open(self):
+        import pty
+
+        pid, master_fd = pty.fork()
+        if pid == 0:
+            # Hijo: líder de sesión con el esclavo del pty como terminal de control
+            try:
+                if self.cwd:
+                    os.chdir(self.cwd)
+                env = dict(os.environ, TERM="xterm-256color")
+                os.execvpe(self.shell, [self.shell, "-l"], env)
+            finally:
+                os._exit(127)
+        self.pid = pid
+        self.master_fd = master_fd
+        self._resize(self.cols, self.rows)
+
+    def _fileobj(self):
+        return self.master_fd
+
+    def _recv(self, n):
+        try:
+            return os.read(self.master_fd, n)
+        except OSError:
+            # EIO: el hijo cerró su lado del pty (la shell terminó)
+            return b""
+
+    def _send(self, view):
+        try:
+            return os.write(self.master_fd, view)
+        except InterruptedError:
+            return 0 if self._stop.is_set() else self._send(view)
+
+    def _resize(self, cols, rows):
+        import fcntl
+        import struct
+        import termios
+
+        if self.master_fd is not None:
+            fcntl.ioctl(self.master_fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+    def _close_resources(self):
+        if self.pid:
+            self._terminate_child()
+            self.pid = None
+        if self.master_fd is not None:
+            try:
+                os.close(self.master_fd)
+            except OSError:
+                pass
+            self.master_fd = None
+
+    def _terminate_child(self, grace=1.0):
+        """SIGHUP a la shell como haría una terminal al cerrarse; SIGKILL si no termina."""
+        import signal
+        import time
+
+        try:
+            # Una shell que ya salió por su cuenta es un zombi: no recibe la señal y conserva su código
+            os.kill(self.pid, signal.SIGHUP)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + grace
+        try:
+            while time.monotonic() < deadline:
+                done, status = os.waitpid(self.pid, os.WNOHANG)
+                if done:
+                    self._set_exit_status(status)
+                    return
+                time.sleep(0.02)
+            os.kill(self.pid, signal.SIGKILL)
+            self._set_exit_status(os.waitpid(self.pid, 0)[1])
+        except (ChildProcessError, ProcessLookupError):
+            pass
+
+    def _set_exit_status(self, status):
+        code = os.waitstatus_to_exitcode(status)
+        # Terminada por una señal: 128 + señal, como lo informa la shell
+        self.exit_status = code if code >= 0 else 128 - code
@@ -0,0 +1,442 @@
+"""
+Disparadores (triggers) sobre la salida de la sesión: resaltar, responder o avisar.
+
+Todos los patrones se buscan a la vez sobre la salida ya sin secuencias ANSI.
+Con numpy, cada bloque se pasa a bytes en minúsculas y se calculan sus trigramas
+de forma vectorizada; un mapa de bits con los trigramas iniciales de todos los
+patrones da las posiciones candidatas y solo ahí se prueba la expresión de cada
+disparador. El coste por byte casi no depende del número de patrones. Los
+patrones sin un prefijo literal de 3 bytes van a una única expresión combinada
+con grupos con nombre; los que no se pueden combinar (flags globales en línea,
+grupos con nombre, referencias hacia atrás) se buscan cada uno con su propia
+expresión. Sin numpy cada prefijo se localiza con bytes.find: sigue siendo
+rápido, pero el coste crece con el número de patrones.
+
+Una coincidencia puede quedar partida entre dos lecturas: se conservan los
+últimos `window` bytes y se vuelven a examinar junto al bloque siguiente; solo
+se notifican coincidencias que terminan en el bloque nuevo y que no solapan con
+la última notificada. Coincidencias más largas que la ventana no se garantizan.
+
+Las acciones se ejecutan en un hilo aparte: el hilo lector solo encola eventos.
+"""
+import collections
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+from .scrollback import AnsiStripper
+
+try:
+    import numpy as np
+except ImportError:  # sin numpy los prefijos se buscan uno a uno con bytes.find
+    np = None
+
+ACTIONS = ("highlight", "notify", "reply")
+_META_CHARS = set(".^$*+?{}[]()|")
+# Referencias hacia atrás: al envolver el patrón en grupos su numeración cambia
+_BACKREF_RE = re.compile(rb"\\[1-9]|\\g<|\(\?P=")
+
+TriggerEvent = collections.namedtuple("TriggerEvent", "trigger text time")
+
+DEFAULT_TRIGGERS = [
+    {"name": "error", "pattern": r"\berror\b", "regex": True, "action": "highlight", "color": "#c62828"},
+    {"name": "failed", "pattern": r"\bfailed\b", "regex": True, "action": "highlight", "color": "#c62828"},
+    {"name": "fatal", "pattern": r"\bfatal\b", "regex": True, "action": "highlight", "color": "#c62828"},
+    {"name": "build ok", "pattern": "BUILD SUCCESSFUL", "action": "notify"},
+    {"name": "build failed", "pattern": "BUILD FAILED", "action": "notify"},
+]
+
+
+def default_triggers_path():
+    """Ruta por defecto de los disparadores (configurable con UPILOTO_TRIGGERS_PATH)."""
+    path = os.getenv("UPILOTO_TRIGGERS_PATH")
+    if path:
+        return path
+    return os.path.join(os.path.expanduser("~"), ".upiloto", "triggers.json")
+
+
+class Trigger:
+    """
+    :param pattern: texto literal o, con regex=True, expresión regular.
+    :param action: "highlight", "notify" o "reply".
+    :param reply: texto que se escribe en la sesión con action="reply" (p. ej. "y\\n").
+    :param color: color CSS del resaltado.
+    :param cooldown: segundos mínimos entre dos disparos (por defecto 1 s para "reply").
+    """
+
+    def __init__(self, name, pattern, action="highlight", regex=False, ignore_case=True, reply=None, color=None,
+                 cooldown=None, enabled=True):
+        if action not in ACTIONS:
+            raise ValueError(f"Acción de disparador desconocida: {action!r}")
+        if action == "reply" and not reply:
+            raise ValueError(f"El disparador {name!r} responde pero no tiene texto de respuesta")
+        self.name = name
+        self.pattern = pattern
+        self.action = action
+        self.regex = regex
+        self.ignore_case = ignore_case
+        self.reply = reply
+        self.color = color or "#f9a825"
+        self.cooldown = (1.0 if action == "reply" else 0.0) if cooldown is None else cooldown
+        self.enabled = enabled
+        source = pattern if regex else re.escape(pattern)
+        # MULTILINE: compiled.match(data, pos) solo respeta ^ en pos 0 o tras un salto de línea
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        self.compiled = re.compile(source.encode("utf-8"), flags)
+        self.last_fired = 0.0
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{k: v for k, v in data.items() if k in _TRIGGER_FIELDS})
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in _TRIGGER_FIELDS}
+
+    def __repr__(self):
+        return f"Trigger({self.name!r}, {self.pattern!r}, action={self.action!r})"
+
+
+_TRIGGER_FIELDS = ("name", "pattern", "action", "regex", "ignore_case", "reply", "color", "cooldown", "enabled")
+
+
+def load_triggers(path=None):
+    """Lee la lista de disparadores (JSON); si el archivo no existe se usan DEFAULT_TRIGGERS."""
+    path = path or default_triggers_path()
+    entries = DEFAULT_TRIGGERS
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"Error leyendo disparadores de {path}: {e}")
+    triggers = []
+    for entry in entries:
+        try:
+            triggers.append(Trigger.from_dict(entry))
+        except Exception as e:
+            print(f"Disparador ignorado {entry!r}: {e}")
+    return triggers
+
+
+def save_triggers(triggers, path=None):
+    path = path or default_triggers_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([t.to_dict() for t in triggers], f, ensure_ascii=False, indent=2)
+
+
+def _has_top_level_alternation(pattern):
+    """True si el patrón tiene un | sin escapar fuera de grupos y clases ([...])."""
+    depth = 0
+    i = 0
+    in_class = False
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if in_class:
+            if ch == "]":
+                in_class = False
+        elif ch == "[":
+            in_class = True
+            # "]" justo tras "[" o "[^" es un carácter de la clase
+            if pattern.startswith("]", i + 1):
+                i += 1
+            elif pattern.startswith("^]", i + 1):
+                i += 2
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+        elif ch == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def _literal_prefix(trigger):
+    """
+    Prefijo literal (bytes en minúsculas) con el que empieza toda coincidencia del
+    disparador; b"" si no lo hay (p. ej. "foo|bar": cada alternativa empieza distinto).
+    """
+    if not trigger.regex:
+        return trigger.pattern.encode("utf-8").lower()
+    out = []
+    pattern = trigger.pattern
+    if _has_top_level_alternation(pattern):
+        return b""
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if pattern.startswith(("\\b", "\\B"), i) or ch == "^":
+            i += 1 if ch == "^" else 2  # anclas de ancho cero: no consumen texto
+            continue
+        if ch == "\\":
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                break
+            ch = pattern[i + 1]
+            i += 2
+        elif ch in _META_CHARS:
+            break
+        else:
+            i += 1
+        if i < len(pattern) and pattern[i] in "*?{":
+            break  # el carácter es opcional o se repite: no forma parte del prefijo
+        out.append(ch)
+        if i < len(pattern) and pattern[i] == "+":
+            break
+    prefix = "".join(out).encode("utf-8")
+    # Sin distinguir mayúsculas el prefijo se compara en minúsculas; distinguiéndolas,
+    # el mapa de bits sigue sirviendo como filtro (la verificación es exacta)
+    return prefix.lower()
+
+
+def _group_source(trigger, i):
+    """Patrón del disparador como grupo t<i> de la expresión combinada, o None si no se puede combinar."""
+    source = trigger.compiled.pattern
+    if trigger.compiled.groupindex or _BACKREF_RE.search(source):
+        return None
+    if trigger.ignore_case:
+        source = b"(?i:" + source + b")"
+    source = b"(?P<t%d>" % i + source + b")"
+    try:
+        # p. ej. "(?i)warn": los flags globales solo valen al principio de la expresión entera
+        re.compile(source, re.MULTILINE)
+    except re.error:
+        return None
+    return source
+
+
+def _gram(data, i=0):
+    return (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+
+
+class TriggerEngine:
+    """
+    :param triggers: lista de Trigger.
+    :param on_event: fn(TriggerEvent), llamada desde el hilo de acciones para "highlight" y "notify"
+                     (y también tras escribir una respuesta "reply").
+    :param writer: fn(str) para las respuestas, normalmente ShellSession.write.
+    :param window: bytes del bloque anterior que se vuelven a examinar (máxima coincidencia partida).
+    :param max_pending: eventos en cola antes de descartar (una inundación de coincidencias no crece sin límite).
+    """
+
+    def __init__(self, triggers=(), on_event=None, writer=None, window=256, max_pending=1000):
+        self.on_event = on_event
+        self.writer = writer
+        self.window = window
+        self.matched = 0
+        self.dropped = 0
+        self._stripper = AnsiStripper()
+        self._carry = b""
+        self._offset = 0            # posición absoluta del inicio de self._carry
+        self._reported_until = {}   # disparador -> fin absoluto de su última coincidencia notificada
+        self._events = queue.Queue(maxsize=max_pending)
+        self._worker = None
+        self.set_triggers(triggers)
+
+    def set_triggers(self, triggers):
+        """Recompila el buscador. Se puede llamar con la sesión en marcha (el cambio es atómico)."""
+        triggers = [t for t in triggers if t.enabled]
+        by_gram = {}
+        scanned = []
+        for trigger in triggers:
+            prefix = _literal_prefix(trigger)
+            if len(prefix) < 3:
+                scanned.append(trigger)
+            elif np is not None:
+                by_gram.setdefault(_gram(prefix), []).append(trigger)
+            else:
+                # Sin numpy la clave es el prefijo entero y se localiza con bytes.find
+                by_gram.setdefault(prefix, []).append(trigger)
+        mask = None
+        if by_gram and np is not None:
+            mask = np.zeros(1 << 24, dtype=np.bool_)
+            mask[list(by_gram)] = True
+        combined = None
+        separate = []
+        groups = []
+        for trigger in scanned:
+            source = _group_source(trigger, len(groups))
+            if source is None:
+                separate.append(trigger)
+            else:
+                groups.append(source)
+        scanned = [t for t in scanned if t not in separate]
+        if groups:
+            try:
+                combined = re.compile(b"|".join(groups), re.MULTILINE)
+            except re.error as e:
+                print(f"Disparadores buscados por separado ({e})")
+                separate += scanned
+                scanned = []
+        # Una sola asignación: el hilo lector ve el buscador viejo o el nuevo, nunca una mezcla
+        self._matcher = (triggers, by_gram, mask, scanned, combined, separate)
+
+    @property
+    def triggers(self):
+        return list(self._matcher[0])
+
+    # ----------------- Hilo lector -----------------
+
+    def feed(self, text):
+        triggers, by_gram, mask, scanned, combined, separate = self._matcher
+        if not triggers:
+            return
+        text = self._stripper.feed(text)
+        if not text:
+            return
+        data = self._carry + text.encode("utf-8", "replace")
+        base = self._offset
+        fresh = len(self._carry)
+        found = []
+        if mask is not None and len(data) >= 3:
+            lowered = data.lower()
+            a = np.frombuffer(lowered, dtype=np.uint8).astype(np.uint32)
+            grams = (a[:-2] << 16) | (a[1:-1] << 8) | a[2:]
+            for pos in np.flatnonzero(mask[grams]).tolist():
+                for trigger in by_gram[_gram(lowered, pos)]:
+                    m = trigger.compiled.match(data, pos)
+                    if m and m.end() > fresh:
+                        found.append((m.start(), m.end(), trigger))
+        elif by_gram:
+            lowered = data.lower()
+            for prefix, candidates in by_gram.items():
+                pos = lowered.find(prefix)
+                while pos != -1:
+                    for trigger in candidates:
+                        m = trigger.compiled.match(data, pos)
+                        if m and m.end() > fresh:
+                            found.append((m.start(), m.end(), trigger))
+                    pos = lowered.find(prefix, pos + 1)
+        if combined is not None:
+            for m in combined.finditer(data):
+                if m.end() > fresh:
+                    found.append((m.start(), m.end(), scanned[int(m.lastgroup[1:])]))
+        for trigger in separate:
+            for m in trigger.compiled.finditer(data):
+                if m.end() > fresh:
+                    found.append((m.start(), m.end(), trigger))
+        if found:
+            if len(found) > 1:
+                found.sort(key=lambda f: f[0])
+            self._report(data, base, found)
+        keep = min(self.window, len(data))
+        self._carry = data[len(data) - keep:]
+        self._offset = base + len(data) - keep
+
+    def _report(self, data, base, found):
+        now = time.monotonic()
+        for start, end, trigger in found:
+            if base + start < self._reported_until.get(trigger, 0):
+                continue  # ya notificada (o solapa con la anterior del mismo disparador)
+            self._reported_until[trigger] = base + end
+            if trigger.cooldown and now - trigger.last_fired < trigger.cooldown:
+                continue
+            trigger.last_fired = now
+            self.matched += 1
+            event = TriggerEvent(trigger, data[start:end].decode("utf-8", "replace"), time.time())
+            try:
+                self._events.put_nowait(event)
+            except queue.Full:
+                self.dropped += 1
+                continue
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._action_loop, name="TriggerActions", daemon=True)
+                self._worker.start()
+
+    # ----------------- Hilo de acciones -----------------
+
+    def _action_loop(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            try:
+                if event.trigger.action == "reply" and self.writer is not None:
+                    self.writer(event.trigger.reply)
+                if self.on_event is not None:
+                    self.on_event(event)
+            except Exception as e:
+                print(f"Error ejecutando el disparador {event.trigger.name!r}: {e}")
+
+    def close(self):
+        self._matcher = ([], {}, None, [], None, [])
+        if self._worker is not None:
+            self._events.put(None)
+
+
+def _benchmark(megabytes=20):
+    import random
+    import string
+
+    rng = random.Random(1)
+    words = ["INFO", "WARN", "worker", "request", "served", "GET", "/api/v1/items", "200", "latency", "cache",
+             "miss", "hit", "user", "session", "\x1b[32mok\x1b[0m", "retry", "upstream", "timeout"]
+    chunk = "".join(
+        f"{i:08d} " + " ".join(rng.choice(words) for _ in range(10)) + f" id={rng.getrandbits(48):012x}\r\n"
+        for i in range(20000)
+    )
+    # El patrón buscado aparece partido entre lecturas de 4 KiB en algunas repeticiones
+    chunk = chunk[:len(chunk) // 2] + "BUILD SUCCESSFUL in 3s\r\n" + chunk[len(chunk) // 2:]
+    reps = max(1, megabytes * (1 << 20) // len(chunk))
+    for count in (1, 10, 100):
+        triggers = [Trigger("build", "BUILD SUCCESSFUL", action="notify")]
+        for i in range(count - 1):
+            word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+            triggers.append(Trigger(f"t{i}", word, regex=bool(i % 2)))
+        engine = TriggerEngine(triggers)
+        start = time.perf_counter()
+        for _ in range(reps):
+            for i in range(0, len(chunk), 4096):
+                engine.feed(chunk[i:i + 4096])
+        elapsed = time.perf_counter() - start
+        print(f"{count:>3} patrones: {reps * len(chunk) / (1 << 20) / elapsed:.0f} MB/s, "
+              f"{engine.matched} coincidencias de {reps} esperadas")
+        engine.close()
+
+
+def _check():
+    """Casos que el buscador por prefijos debe respetar (alternancias y anclas)."""
+    cases = [
+        (Trigger("alt", "foo|bar", regex=True), "xx bar yy", ["bar"]),
+        (Trigger("alt-group", r"err(or|no)\b", regex=True), "errno 2 y error", ["errno", "error"]),
+        (Trigger("class", r"[|]pipe", regex=True), "a |pipe b", ["|pipe"]),
+        (Trigger("anchor", r"^error", regex=True), "ok\nerror here\nno error", ["error"]),
+        (Trigger("anchor-short", r"^ok", regex=True), "ok\nnot ok\nok", ["ok", "ok"]),
+        (Trigger("literal", "a|b"), "x a|b y", ["a|b"]),
+        (Trigger("inline-flags", r"(?i)wa?rn", regex=True), "WRN y warn", ["WRN", "warn"]),
+        (Trigger("backref", r"(\w)\1x", regex=True), "ab aax", ["aax"]),
+    ]
+    for trigger, text, expected in cases:
+        events = []
+        engine = TriggerEngine([trigger], on_event=events.append)
+        engine.feed(text)
+        engine.close()
+        deadline = time.monotonic() + 1.0
+        while len(events) < len(expected) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        got = [e.text for e in events]
+        assert got == expected, f"{trigger!r} sobre {text!r}: {got} (esperado {expected})"
+    # Patrones que no se pueden combinar buscan por separado sin romper a los demás
+    events = []
+    engine = TriggerEngine([Trigger("flags", r"(?i)wa?rn", regex=True), Trigger("alt", "foo|bar", regex=True),
+                            Trigger("named", r"(?P<x>b)a?z", regex=True), Trigger("named2", r"(?P<x>q)u?x", regex=True)],
+                           on_event=events.append)
+    engine.feed("wrn foo bz qx")
+    engine.close()
+    deadline = time.monotonic() + 1.0
+    while len(events) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    got = sorted(e.text for e in events)
+    assert got == ["bz", "foo", "qx", "wrn"], got
+    print(f"{len(cases) + 1} casos de prefijo, anclas y patrones no combinables correctos")
+
+
+if __name__ == "__main__":
+    _check()
+    _benchmark()
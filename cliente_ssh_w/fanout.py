@@ -0,0 +1,160 @@
+"""
+Ejecución en paralelo de un mismo comando en varios hosts (p. ej. las VMs de un laboratorio).
+
+Cada host usa su propio ModeloSSH y un canal exec. Un pool acotado de hilos
+limita las conexiones simultáneas, así que el tiempo total se acerca al del
+host más lento y no a la suma de todos.
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ssh_model import ModeloSSH
+
+
+def parse_host(spec, default_user, default_port=22):
+    """Interpreta '[usuario@]host[:puerto]'. Retorna (host, puerto, usuario)."""
+    spec = spec.strip()
+    user = default_user
+    if "@" in spec:
+        user, spec = spec.split("@", 1)
+    port = default_port
+    if spec.count(":") == 1:
+        spec, port_str = spec.split(":")
+        port = int(port_str)
+    return spec, port, user
+
+
+def load_hosts(path, default_user, default_port=22):
+    """Lee un archivo de hosts (uno por línea, admite comentarios con #)."""
+    hosts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                hosts.append(parse_host(line, default_user, default_port))
+    return hosts
+
+
+class HostResult:
+    def __init__(self, host, port, user):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.exit_code = None
+        self.error = None
+        self.connect_time = 0.0
+        self.run_time = 0.0
+
+    @property
+    def label(self):
+        return self.host if self.port == 22 else f"{self.host}:{self.port}"
+
+    @property
+    def ok(self):
+        return self.error is None and self.exit_code == 0
+
+
+class _PrefixedWriter:
+    """Escribe la salida de cada host línea a línea con prefijo, sin mezclar líneas de hosts distintos."""
+
+    def __init__(self, stream, lock):
+        self._stream = stream
+        self._lock = lock
+
+    def writer_for(self, label):
+        pending = []
+
+        def write(text):
+            pending.append(text)
+            data = "".join(pending)
+            lines = data.split("\n")
+            pending[:] = [lines.pop()]
+            if lines:
+                out = "".join(f"[{label}] {line.rstrip(chr(13))}\n" for line in lines)
+                with self._lock:
+                    self._stream.write(out)
+                    self._stream.flush()
+
+        def flush():
+            rest = "".join(pending)
+            pending.clear()
+            if rest:
+                with self._lock:
+                    self._stream.write(f"[{label}] {rest}\n")
+                    self._stream.flush()
+
+        return write, flush
+
+
+class FanoutRunner:
+    """
+    :param password: clave común a todos los hosts.
+    :param concurrency: máximo de hosts en paralelo.
+    :param connect_timeout: segundos para conectar y autenticar cada host.
+    :param command_timeout: segundos máximos de ejecución del comando por host.
+    :param stream: destino de la salida con prefijo (None para no mostrarla).
+    """
+
+    def __init__(self, password, concurrency=16, connect_timeout=10, command_timeout=300, stream=sys.stdout):
+        self.password = password
+        self.concurrency = concurrency
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def run(self, hosts, command):
+        """Ejecuta `command` en cada (host, puerto, usuario). Retorna la lista de HostResult en el mismo orden."""
+        results = [HostResult(h, p, u) for h, p, u in hosts]
+        if not results:
+            return results
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(results)), thread_name_prefix="fanout") as pool:
+            for _ in pool.map(lambda r: self._run_one(r, command), results):
+                pass
+        return results
+
+    def _run_one(self, result, command):
+        write = flush = None
+        if self.stream is not None:
+            write, flush = _PrefixedWriter(self.stream, self._lock).writer_for(result.label)
+        modelo = ModeloSSH(result.host, result.port, result.user, self.password, timeout=self.connect_timeout)
+        start = time.perf_counter()
+        try:
+            modelo.conectar()
+            result.connect_time = time.perf_counter() - start
+            run_start = time.perf_counter()
+            try:
+                result.exit_code = modelo.ejecutar(command, on_output=write, timeout=self.command_timeout)
+            finally:
+                result.run_time = time.perf_counter() - run_start
+        except TimeoutError as e:
+            result.error = str(e)
+        except Exception as e:
+            if not result.connect_time:
+                result.connect_time = time.perf_counter() - start
+            result.error = str(e)
+        finally:
+            if flush:
+                flush()
+            modelo.desconectar()
+        return result
+
+
+def format_summary(results, wall_time=None):
+    """Tabla de resumen con código de salida y tiempos por host."""
+    width = max([len(r.label) for r in results] + [4])
+    lines = [f"{'HOST'.ljust(width)}  ESTADO  SALIDA  CONEXIÓN  EJECUCIÓN  DETALLE"]
+    for r in results:
+        estado = "OK" if r.ok else "FALLO"
+        salida = "-" if r.exit_code is None else str(r.exit_code)
+        lines.append(f"{r.label.ljust(width)}  {estado:<6}  {salida:>6}  {r.connect_time:7.2f}s  "
+                     f"{r.run_time:8.2f}s  {r.error or ''}")
+    ok = sum(1 for r in results if r.ok)
+    footer = f"{ok}/{len(results)} hosts OK"
+    if wall_time is not None:
+        slowest = max((r.connect_time + r.run_time for r in results), default=0.0)
+        footer += f" · tiempo total {wall_time:.2f}s (host más lento {slowest:.2f}s)"
+    lines.append(footer)
+    return "\n".join(lines)
@@ -0,0 +1,484 @@
+import os
+import posixpath
+import time
+
+from PyQt6 import QtWidgets, QtCore
+
+from engine.remotefs import RemoteFS
+from engine.sync import DirectorySync
+
+
+def _human_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+
+
+class _Node:
+    __slots__ = ("entry", "path", "parent", "row", "listing", "children", "loading", "error")
+
+    def __init__(self, entry, path, parent=None, row=0):
+        self.entry = entry
+        self.path = path
+        self.parent = parent
+        self.row = row
+        self.listing = None     # todas las entradas del directorio, una vez recibidas
+        self.children = []      # nodos ya insertados en el modelo (un prefijo de listing)
+        self.loading = False
+        self.error = None
+
+    @property
+    def is_dir(self):
+        return self.entry is None or self.entry.is_dir
+
+
+class RemoteTreeModel(QtCore.QAbstractItemModel):
+    """
+    Árbol remoto de carga perezosa: un directorio se pide al expandirlo y sus filas
+    se insertan por lotes de BATCH a medida que la vista las necesita (fetchMore),
+    así un directorio con 100k entradas no bloquea la GUI.
+    """
+    BATCH = 1000
+    COLUMNS = ["Nombre", "Tamaño", "Modificado"]
+    # Emitida desde los hilos de RemoteFS; Qt la entrega en el hilo de la GUI
+    _listing_ready = QtCore.pyqtSignal(str, object, object)
+    loading_changed = QtCore.pyqtSignal(str)
+
+    def __init__(self, fs, parent=None):
+        super().__init__(parent)
+        self.fs = fs
+        self.root = _Node(None, "/")
+        self._waiting = {}      # ruta -> nodos que esperan ese listado
+        self._listing_ready.connect(self._on_listing)
+        style = QtWidgets.QApplication.style()
+        self._dir_icon = style.standardIcon(QtWidgets.QStyle.StandardPixmap.SP_DirIcon)
+        self._file_icon = style.standardIcon(QtWidgets.QStyle.StandardPixmap.SP_FileIcon)
+        self._link_icon = style.standardIcon(QtWidgets.QStyle.StandardPixmap.SP_DirLinkIcon)
+
+    # ----------------- Raíz -----------------
+
+    def set_root(self, path):
+        """Cambia el directorio raíz; si está en caché se muestra sin ir a la red."""
+        self.beginResetModel()
+        self.root = _Node(None, path)
+        self._waiting = {}
+        self.endResetModel()
+        self._request(self.root)
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index_of(self, node):
+        if node is self.root or node is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def reload(self, index=QtCore.QModelIndex()):
+        """Descarta el listado del nodo (y de la caché) y lo vuelve a pedir."""
+        node = self.node(index)
+        if not node.is_dir:
+            node = node.parent
+            index = self.index_of(node)
+        self.fs.invalidate(node.path)
+        self._clear_children(node, index)
+        node.listing = None
+        node.error = None
+        self._request(node)
+
+    # ----------------- Carga -----------------
+
+    def _request(self, node):
+        entries = self.fs.cached(node.path)
+        if entries is not None:
+            self._set_listing(node, entries, None)
+            return
+        if node.loading:
+            return
+        node.loading = True
+        waiting = self._waiting.setdefault(node.path, [])
+        waiting.append(node)
+        if len(waiting) == 1:
+            self.loading_changed.emit(f"Cargando {node.path}…")
+            self.fs.list_async(node.path, callback=self._listing_ready.emit)
+
+    def _on_listing(self, path, entries, error):
+        for node in self._waiting.pop(path, []):
+            node.loading = False
+            self._set_listing(node, entries, error)
+        self.loading_changed.emit("" if error is None else f"{path}: {error}")
+
+    def _set_listing(self, node, entries, error):
+        if node is not self.root and not self._alive(node):
+            return  # la raíz cambió mientras se listaba
+        node.listing = entries or []
+        node.error = error
+        index = self.index_of(node)
+        self._clear_children(node, index)
+        self._insert_batch(node, index)
+        # Sin hijos el nodo ya no debe mostrar el triángulo de expandir
+        if node is not self.root:
+            self.dataChanged.emit(index, index)
+
+    def _alive(self, node):
+        while node.parent is not None:
+            if node.row < 0:
+                return False
+            node = node.parent
+        return node is self.root
+
+    def _clear_children(self, node, index):
+        if not node.children:
+            return
+        self.beginRemoveRows(index, 0, len(node.children) - 1)
+        for child in node.children:
+            child.row = -1  # un listado que llegue tarde para este nodo se descarta
+        node.children = []
+        self.endRemoveRows()
+
+    def _insert_batch(self, node, index):
+        start = len(node.children)
+        end = min(len(node.listing), start + self.BATCH)
+        if end <= start:
+            return
+        self.beginInsertRows(index, start, end - 1)
+        node.children.extend(_Node(entry, entry.path, node, row)
+                             for row, entry in zip(range(start, end), node.listing[start:end]))
+        self.endInsertRows()
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        if not node.is_dir:
+            return False
+        if node.listing is None:
+            return not node.loading
+        return len(node.children) < len(node.listing)
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        if node.listing is None:
+            self._request(node)
+        else:
+            self._insert_batch(node, parent)
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self.node(parent)
+        if node.listing is not None:
+            return bool(node.listing)
+        return node.is_dir
+
+    # ----------------- Modelo -----------------
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        node = self.node(parent)
+        if 0 <= row < len(node.children):
+            return self.createIndex(row, column, node.children[row])
+        return QtCore.QModelIndex()
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        return self.index_of(index.internalPointer().parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if orientation == QtCore.Qt.Orientation.Horizontal and role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = index.internalPointer().entry
+        column = index.column()
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return entry.name
+            if column == 1:
+                return "" if entry.is_dir else _human_bytes(entry.size)
+            return time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime)) if entry.mtime else ""
+        if role == QtCore.Qt.ItemDataRole.DecorationRole and column == 0:
+            if entry.is_link:
+                return self._link_icon
+            return self._dir_icon if entry.is_dir else self._file_icon
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole:
+            return entry.path
+        return None
+
+
+class RemoteFilesPanel(QtWidgets.QWidget):
+    """
+    Explorador de archivos remoto (SFTP) sobre el transporte de la sesión SSH activa.
+
+    Los listados se sirven desde la caché de engine.remotefs cuando es posible; al
+    expandir un directorio o pasar el ratón por encima se precargan sus
+    subdirectorios, así que abrirlos después suele ser instantáneo.
+    """
+    PREFETCH_CHILDREN = 20
+    HISTORY_LIMIT = 100
+
+    def __init__(self, transport, parent=None):
+        super().__init__(parent)
+        self.fs = RemoteFS(transport)
+        self.model = RemoteTreeModel(self.fs, self)
+        self._back = []
+        self._forward = []
+        self._current = None
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        nav = QtWidgets.QHBoxLayout()
+        self.back_button = QtWidgets.QToolButton()
+        self.back_button.setText("◀")
+        self.back_button.setToolTip("Atrás")
+        self.back_button.clicked.connect(self.go_back)
+        nav.addWidget(self.back_button)
+        self.forward_button = QtWidgets.QToolButton()
+        self.forward_button.setText("▶")
+        self.forward_button.setToolTip("Adelante")
+        self.forward_button.clicked.connect(self.go_forward)
+        nav.addWidget(self.forward_button)
+        self.up_button = QtWidgets.QToolButton()
+        self.up_button.setText("▲")
+        self.up_button.setToolTip("Directorio superior")
+        self.up_button.clicked.connect(lambda: self.navigate(posixpath.dirname(self._current or "/")))
+        nav.addWidget(self.up_button)
+        self.path_entry = QtWidgets.QLineEdit()
+        self.path_entry.returnPressed.connect(lambda: self.navigate(self.path_entry.text().strip()))
+        nav.addWidget(self.path_entry)
+        self.refresh_button = QtWidgets.QToolButton()
+        self.refresh_button.setText("⟳")
+        self.refresh_button.setToolTip("Volver a leer el directorio")
+        self.refresh_button.clicked.connect(lambda: self.model.reload())
+        nav.addWidget(self.refresh_button)
+        layout.addLayout(nav)
+
+        self.tree = QtWidgets.QTreeView()
+        self.tree.setModel(self.model)
+        self.tree.setUniformRowHeights(True)  # imprescindible con decenas de miles de filas
+        self.tree.setMouseTracking(True)
+        self.tree.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.CustomContextMenu)
+        self.tree.header().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.tree.expanded.connect(self._on_expanded)
+        self.tree.entered.connect(self._on_hovered)
+        self.tree.doubleClicked.connect(self._on_double_clicked)
+        self.tree.customContextMenuRequested.connect(self._show_menu)
+        layout.addWidget(self.tree)
+
+        self.status_label = QtWidgets.QLabel("")
+        layout.addWidget(self.status_label)
+        self.model.loading_changed.connect(self.status_label.setText)
+        self.model.modelReset.connect(self._prefetch_root)
+        self.model.rowsInserted.connect(self._on_rows_inserted)
+        self._progress = _ProgressBridge(self)
+        self._progress.progress.connect(
+            lambda path, count: self.status_label.setText(f"Cargando {path}… {count} entradas"))
+        self.fs.on_progress = self._progress.progress.emit
+
+        self._hover_timer = QtCore.QTimer(self)
+        self._hover_timer.setSingleShot(True)
+        self._hover_timer.setInterval(150)
+        self._hover_timer.timeout.connect(self._prefetch_hovered)
+        self._hovered = None
+
+        self._update_buttons()
+        # La ruta inicial (home) requiere un viaje de red: se resuelve fuera de la GUI
+        self.fs.run_async(lambda: self.fs.home, callback=lambda home, error: self._progress.ready.emit(home or "/"))
+        self._progress.ready.connect(self.navigate)
+
+    # ----------------- Navegación -----------------
+
+    def navigate(self, path, record=True):
+        try:
+            path = self.fs.normalize(path)
+        except Exception as e:
+            self.status_label.setText(f"Ruta inválida: {e}")
+            return
+        if record and self._current is not None and path != self._current:
+            self._back.append(self._current)
+            del self._back[:-self.HISTORY_LIMIT]
+            self._forward.clear()
+        self._current = path
+        self.path_entry.setText(path)
+        self.model.set_root(path)
+        self._update_buttons()
+
+    def go_back(self):
+        if self._back:
+            self._forward.append(self._current)
+            self.navigate(self._back.pop(), record=False)
+
+    def go_forward(self):
+        if self._forward:
+            self._back.append(self._current)
+            self.navigate(self._forward.pop(), record=False)
+
+    def _update_buttons(self):
+        self.back_button.setEnabled(bool(self._back))
+        self.forward_button.setEnabled(bool(self._forward))
+        self.up_button.setEnabled(self._current not in (None, "/"))
+
+    def _on_double_clicked(self, index):
+        node = self.model.node(index)
+        if node.entry is not None and node.entry.is_dir:
+            self.navigate(node.path)
+
+    # ----------------- Precarga -----------------
+
+    def _prefetch_children(self, node):
+        if node.listing:
+            dirs = [e.path for e in node.listing[:self.model.BATCH] if e.is_dir and not e.is_link]
+            self.fs.prefetch(dirs[:self.PREFETCH_CHILDREN])
+
+    def _prefetch_root(self):
+        self._prefetch_children(self.model.root)
+
+    def _on_rows_inserted(self, parent, first, last):
+        # Primer lote de un directorio recién listado: precargar sus subdirectorios
+        if first == 0 and self.model.node(parent) is self.model.root:
+            self._prefetch_children(self.model.root)
+
+    def _on_expanded(self, index):
+        self._prefetch_children(self.model.node(index))
+
+    def _on_hovered(self, index):
+        self._hovered = index
+        self._hover_timer.start()
+
+    def _prefetch_hovered(self):
+        if self._hovered is None or not self._hovered.isValid():
+            return
+        node = self.model.node(self._hovered)
+        if node.entry is not None and node.entry.is_dir:
+            self.fs.prefetch([node.path])
+
+    # ----------------- Acciones -----------------
+
+    def _show_menu(self, pos):
+        index = self.tree.indexAt(pos)
+        node = self.model.node(index)
+        entry = node.entry
+        menu = QtWidgets.QMenu(self)
+        target_dir = node.path if (entry is None or entry.is_dir) else posixpath.dirname(node.path)
+        menu.addAction("Nueva carpeta…", lambda: self._mkdir(target_dir))
+        menu.addAction("Subir archivo aquí…", lambda: self._upload(target_dir))
+        menu.addAction("Sincronizar carpeta local aquí…", lambda: self._sync(target_dir))
+        if entry is not None:
+            if not entry.is_dir:
+                menu.addAction("Descargar…", lambda: self._download(entry))
+            menu.addAction("Renombrar…", lambda: self._rename(entry))
+            menu.addAction("Borrar", lambda: self._remove(entry))
+        menu.addSeparator()
+        menu.addAction("Refrescar", lambda: self.model.reload(index))
+        menu.exec(self.tree.viewport().mapToGlobal(pos))
+
+    def _run(self, description, method, *args, refresh=None, describe=None):
+        """
+        Ejecuta la operación en segundo plano y refresca `refresh` (ruta remota) al terminar.
+        `describe(result)`, si se da, sustituye a la descripción en el mensaje final.
+        """
+        self.status_label.setText(f"{description}…")
+
+        def done(result, error):
+            text = describe(result) if describe is not None and error is None else description
+            self._progress.finished.emit(text, str(error) if error else "", refresh or "")
+
+        self.fs.run_async(method, *args, callback=done)
+
+    def _on_operation_finished(self, description, error, refresh):
+        if error:
+            self.status_label.setText(f"{description}: {error}")
+            QtWidgets.QMessageBox.critical(self, "Error", f"{description}: {error}")
+            return
+        self.status_label.setText(f"{description}: hecho")
+        if refresh:
+            self._reload_path(refresh)
+
+    def _reload_path(self, path):
+        """Vuelve a listar `path` si está a la vista (la caché ya se invalidó)."""
+        if path == self.model.root.path:
+            self.model.reload()
+            return
+        for row in range(self.model.rowCount()):
+            index = self.model.index(row, 0)
+            if self.model.node(index).path == path:
+                self.model.reload(index)
+                return
+
+    def _mkdir(self, directory):
+        name, ok = QtWidgets.QInputDialog.getText(self, "Nueva carpeta", f"Nombre (en {directory}):")
+        if ok and name.strip():
+            self._run("Crear carpeta", self.fs.mkdir, posixpath.join(directory, name.strip()), refresh=directory)
+
+    def _rename(self, entry):
+        name, ok = QtWidgets.QInputDialog.getText(self, "Renombrar", "Nuevo nombre:", text=entry.name)
+        if ok and name.strip() and name.strip() != entry.name:
+            directory = posixpath.dirname(entry.path)
+            self._run("Renombrar", self.fs.rename, entry.path, posixpath.join(directory, name.strip()),
+                      refresh=directory)
+
+    def _remove(self, entry):
+        answer = QtWidgets.QMessageBox.question(self, "Borrar", f"¿Borrar {entry.path}?")
+        if answer == QtWidgets.QMessageBox.StandardButton.Yes:
+            self._run("Borrar", self.fs.remove, entry, refresh=posixpath.dirname(entry.path))
+
+    def _upload(self, directory):
+        local_path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Subir archivo")
+        if local_path:
+            remote_path = posixpath.join(directory, os.path.basename(local_path))
+            self._run(f"Subir {os.path.basename(local_path)}", self.fs.upload, local_path, remote_path,
+                      refresh=directory)
+
+    def _sync(self, directory):
+        local_dir = QtWidgets.QFileDialog.getExistingDirectory(self, "Sincronizar carpeta local")
+        if not local_dir:
+            return
+        name = os.path.basename(os.path.normpath(local_dir))
+        self._run(f"Sincronizar {name}", self._sync_tree, local_dir, posixpath.join(directory, name),
+                  refresh=directory, describe=lambda report: f"Sincronizar {name} ({report.summary()})")
+
+    def _sync_tree(self, local_dir, remote_dir):
+        syncer = DirectorySync(self.fs.transport)
+        try:
+            report = syncer.sync(local_dir, remote_dir)
+        finally:
+            syncer.close()
+            self.fs.invalidate(remote_dir, recursive=True)
+            self.fs.invalidate(posixpath.dirname(remote_dir))
+        if report.errors:
+            rel, message = report.errors[0]
+            raise RuntimeError(f"{len(report.errors)} archivos fallaron (p. ej. {rel}: {message})")
+        return report
+
+    def _download(self, entry):
+        local_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Descargar", entry.name)
+        if local_path:
+            self._run(f"Descargar {entry.name}", self.fs.download, entry.path, local_path)
+
+    def close_browser(self):
+        self._hover_timer.stop()
+        self.fs.on_progress = None
+        self.fs.close()
+
+    def closeEvent(self, event):
+        self.close_browser()
+        event.accept()
+
+
+class _ProgressBridge(QtCore.QObject):
+    """Señales para volver al hilo de la GUI desde los hilos de RemoteFS."""
+    progress = QtCore.pyqtSignal(str, int)
+    ready = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal(str, str, str)
+
+    def __init__(self, panel):
+        super().__init__(panel)
+        self.finished.connect(panel._on_operation_finished)
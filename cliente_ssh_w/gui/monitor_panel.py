@@ -0,0 +1,138 @@
+import time
+
+from PyQt6 import QtWidgets, QtCore, QtGui
+
+from engine.monitor import ResourceMonitor
+
+
+def _human_rate(n):
+    for unit in ("B/s", "KiB/s", "MiB/s", "GiB/s"):
+        if n < 1024 or unit == "GiB/s":
+            return f"{n:.0f} {unit}" if unit == "B/s" else f"{n:.1f} {unit}"
+        n /= 1024.0
+
+
+class Sparkline(QtWidgets.QWidget):
+    """Gráfica mínima de una o dos series; `maximum` fijo (p. ej. 100 para %) o None para autoescala."""
+
+    def __init__(self, colors, maximum=None, parent=None):
+        super().__init__(parent)
+        self.colors = [QtGui.QColor(c) for c in colors]
+        self.maximum = maximum
+        self.values = [[] for _ in colors]
+        self.setMinimumHeight(36)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Fixed)
+
+    def set_values(self, *series):
+        self.values = list(series)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtGui.QColor("#1e1e1e"))
+        count = max((len(v) for v in self.values), default=0)
+        if count < 2:
+            return
+        top = self.maximum or max((max(v) for v in self.values if v), default=0) or 1.0
+        w, h = self.width() - 1, self.height() - 2
+        step = w / (count - 1)
+        painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
+        for values, color in zip(self.values, self.colors):
+            offset = count - len(values)
+            points = [QtCore.QPointF((offset + i) * step, 1 + h - h * min(v / top, 1.0))
+                      for i, v in enumerate(values)]
+            painter.setPen(QtGui.QPen(color, 1.5))
+            painter.drawPolyline(QtGui.QPolygonF(points))
+
+
+class MonitorPanel(QtWidgets.QWidget):
+    """
+    Recursos del servidor (engine.monitor) junto a la terminal: CPU, memoria, red,
+    disco y carga, con la historia reciente en gráficas. El pie muestra lo que
+    cuesta el propio muestreo en el servidor, en el canal y en el hilo de la GUI.
+    """
+
+    def __init__(self, transport, interval=1.0, parent=None):
+        super().__init__(parent)
+        self.monitor = ResourceMonitor(transport, interval=interval)
+        self._ui_seconds = 0.0
+        self._ui_samples = 0
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        rows = (("cpu", "CPU", ("#4fc3f7",), 100),
+                ("mem", "Memoria", ("#81c784",), 100),
+                ("net", "Red (rx / tx)", ("#ffb74d", "#ba68c8"), None),
+                ("disk", "Disco (lectura / escritura)", ("#e57373", "#90a4ae"), None),
+                ("load", "Carga", ("#fff176",), None))
+        self.labels = {}
+        self.charts = {}
+        for key, title, colors, maximum in rows:
+            label = QtWidgets.QLabel(title)
+            layout.addWidget(label)
+            chart = Sparkline(colors, maximum)
+            layout.addWidget(chart)
+            self.labels[key] = (label, title)
+            self.charts[key] = chart
+        layout.addStretch()
+        self.cost_label = QtWidgets.QLabel("Esperando la primera muestra…")
+        self.cost_label.setStyleSheet("color: #777; font-size: 11px;")
+        self.cost_label.setWordWrap(True)
+        layout.addWidget(self.cost_label)
+
+        self._bridge = _SampleBridge(self)
+        self.monitor.on_sample = self._bridge.sample.emit
+        self.monitor.on_error = self._bridge.error.emit
+        try:
+            self.monitor.start()
+        except Exception as e:
+            self.cost_label.setText(f"No se pudo iniciar el monitor: {e}")
+
+    def _set(self, key, text):
+        label, title = self.labels[key]
+        label.setText(f"{title}: {text}")
+
+    def _on_sample(self, sample):
+        start = time.perf_counter()
+        m = self.monitor
+        self._set("cpu", f"{sample.cpu:.0f} % de {sample.ncpu} CPU (iowait {sample.iowait:.0f} %)")
+        self._set("mem", f"{sample.mem_used / (1 << 30):.1f} / {sample.mem_total / (1 << 30):.1f} GiB"
+                  + (f", swap {sample.swap_used / (1 << 30):.1f} GiB" if sample.swap_used else ""))
+        self._set("net", f"{_human_rate(sample.net_rx)} / {_human_rate(sample.net_tx)}")
+        self._set("disk", f"{_human_rate(sample.disk_read)} / {_human_rate(sample.disk_write)}")
+        self._set("load", f"{sample.load:.2f}")
+        self.charts["cpu"].set_values(m.snapshot("cpu"))
+        self.charts["mem"].set_values(m.snapshot("mem"))
+        self.charts["net"].set_values(m.snapshot("net_rx"), m.snapshot("net_tx"))
+        self.charts["disk"].set_values(m.snapshot("disk_read"), m.snapshot("disk_write"))
+        self.charts["load"].set_values(m.snapshot("load"))
+        self._ui_seconds += time.perf_counter() - start
+        self._ui_samples += 1
+        stats = m.stats()
+        self.cost_label.setText(
+            f"Muestreo: {stats['server_cpu_percent']:.2f} % de CPU en el servidor, "
+            f"{stats['bytes_per_sample']:.0f} B por muestra, "
+            f"{1000.0 * self._ui_seconds / self._ui_samples + stats['parse_ms_per_sample']:.2f} ms por muestra aquí")
+
+    def _on_error(self, message):
+        self.cost_label.setText(f"Monitor detenido: {message}")
+
+    def close_monitor(self):
+        self.monitor.on_sample = None
+        self.monitor.on_error = None
+        self.monitor.stop()
+
+    def closeEvent(self, event):
+        self.close_monitor()
+        event.accept()
+
+
+class _SampleBridge(QtCore.QObject):
+    """Señales para llevar las muestras del hilo lector al de la GUI."""
+    sample = QtCore.pyqtSignal(object)
+    error = QtCore.pyqtSignal(str)
+
+    def __init__(self, panel):
+        super().__init__(panel)
+        self.sample.connect(panel._on_sample)
+        self.error.connect(panel._on_error)
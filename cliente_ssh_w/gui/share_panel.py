@@ -0,0 +1,113 @@
+from PyQt6 import QtWidgets, QtCore
+
+from engine.broadcast import ShareServer
+
+
+class SharePanel(QtWidgets.QWidget):
+    """
+    Compartir la terminal en solo lectura (engine.broadcast): ventanas de visor
+    dentro de la aplicación (p. ej. para el proyector) y una URL de localhost con
+    xterm.js para los navegadores. Los espectadores lentos se resincronizan sin
+    frenar la sesión; el pie muestra cuántos hay y cuánto se les ha descartado.
+
+    Ocultar el panel no corta nada: la difusión termina con "Dejar de compartir"
+    (señal stop_requested) o al cerrar la sesión.
+    """
+    stop_requested = QtCore.pyqtSignal()
+
+    def __init__(self, backend, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.hub = backend.share()
+        self.server = None
+        self.viewers = []
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(QtWidgets.QLabel("Sesión compartida (solo lectura)"))
+
+        self.open_button = QtWidgets.QPushButton("Abrir visor en ventana")
+        self.open_button.clicked.connect(self.open_viewer)
+        layout.addWidget(self.open_button)
+
+        layout.addWidget(QtWidgets.QLabel("Navegador (solo este equipo):"))
+        url_row = QtWidgets.QHBoxLayout()
+        self.url_entry = QtWidgets.QLineEdit()
+        self.url_entry.setReadOnly(True)
+        url_row.addWidget(self.url_entry)
+        copy_button = QtWidgets.QPushButton("Copiar")
+        copy_button.clicked.connect(lambda: QtWidgets.QApplication.clipboard().setText(self.url_entry.text()))
+        url_row.addWidget(copy_button)
+        layout.addLayout(url_row)
+
+        self.stop_button = QtWidgets.QPushButton("Dejar de compartir")
+        self.stop_button.clicked.connect(self.stop_requested.emit)
+        layout.addWidget(self.stop_button)
+
+        layout.addStretch()
+        self.status_label = QtWidgets.QLabel()
+        self.status_label.setStyleSheet("color: #777; font-size: 11px;")
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label)
+
+        try:
+            self.server = ShareServer(self.hub).start()
+            self.url_entry.setText(self.server.url)
+        except OSError as e:
+            self.url_entry.setText(f"No disponible: {e}")
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self._refresh)
+
+    def showEvent(self, event):
+        # El recuento solo se refresca con el panel a la vista
+        self._refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def open_viewer(self):
+        from UglyWidgets.qtssh_widget import Ui_Terminal
+
+        window = QtWidgets.QMainWindow()
+        window.setAttribute(QtCore.Qt.WidgetAttribute.WA_DeleteOnClose)
+        window.setWindowTitle("Sesión compartida (solo lectura)")
+        window.resize(900, 560)
+        terminal = Ui_Terminal({"watch": self.hub}, window)
+        window.setCentralWidget(terminal)
+        window.destroyed.connect(lambda *_: self._forget(window))
+        self.viewers.append((window, terminal))
+        window.show()
+
+    def _forget(self, window):
+        # Con la ventana ya destruida solo queda soltar la suscripción (el backend no tiene padre Qt)
+        for entry in [v for v in self.viewers if v[0] is window]:
+            entry[1].backend.close()
+            self.viewers.remove(entry)
+
+    def _refresh(self):
+        web = self.server.viewers if self.server else 0
+        text = f"{self.hub.subscribers} espectadores ({web} en navegador)"
+        if self.hub.dropped:
+            text += f"; {self.hub.dropped / (1 << 20):.1f} MB descartados a visores lentos"
+        self.status_label.setText(text)
+
+    def close_share(self):
+        """Cierra visores y servidor y deja de difundir; la sesión sigue intacta."""
+        self.timer.stop()
+        viewers, self.viewers = self.viewers, []
+        for window, terminal in viewers:
+            terminal.close_terminal()
+            window.close()
+        if self.server:
+            self.server.stop()
+            self.server = None
+        self.backend.unshare()
+
+    def closeEvent(self, event):
+        self.close_share()
+        event.accept()
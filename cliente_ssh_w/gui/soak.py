@@ -0,0 +1,247 @@
+"""
+Prueba de resistencia de conectar/desconectar contra el servidor de pruebas.
+
+Repite cientos de ciclos de abrir una terminal SSH, ejecutar un eco, esperar su
+salida y cerrarla como lo hace la vista al desconectar. Tras unos ciclos de
+calentamiento toma una línea base de memoria residente (RSS), hilos, descriptores
+abiertos y objetos Qt, y al final comprueba que nada de eso haya crecido: cada
+conexión tiene que devolver sus hilos lector/escritor, su socket, su QWebChannel
+y su backend. La memoria se juzga además por la pendiente entre ciclos, que
+aguanta el ruido del asignador mejor que una sola diferencia.
+
+El servidor (engine.loopback) corre en otro proceso para que sus hilos y sockets
+no se cuenten aquí. Con QtWebEngine se ciclan terminales Ui_Terminal completas;
+sin él (p. ej. sin libs gráficas) el backend SSH y su registro en un QWebChannel,
+que es donde viven los hilos y los sockets.
+
+    python -m gui.soak [ciclos]      # código de salida 1 si algo crece
+"""
+import contextlib
+import gc
+import io
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from PyQt6 import QtCore, QtWidgets
+
+WARMUP = 20
+# Crecimiento tolerado entre la línea base y el final, ya asentado
+MAX_THREADS = 0
+MAX_FDS = 2
+MAX_QOBJECTS = 5
+MAX_RSS = 24 << 20
+MAX_RSS_SLOPE = 16 << 10  # bytes por ciclo
+SETTLE_SECONDS = 5.0
+
+
+def _rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _native_threads():
+    try:
+        return len(os.listdir("/proc/self/task"))
+    except OSError:
+        return threading.active_count()
+
+
+def _open_fds():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def _qobjects():
+    """QObjects con envoltorio de Python vivos, más los widgets que Qt conoce."""
+    count = 0
+    for obj in gc.get_objects():
+        try:
+            if isinstance(obj, QtCore.QObject):
+                count += 1
+        except ReferenceError:
+            pass
+    return count + len(QtWidgets.QApplication.allWidgets())
+
+
+def sample():
+    return {
+        "rss": _rss_bytes(),
+        "threads": threading.active_count(),
+        "native_threads": _native_threads(),
+        "fds": _open_fds(),
+        "qobjects": _qobjects(),
+    }
+
+
+def _process(app, seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        app.processEvents(QtCore.QEventLoop.ProcessEventsFlag.AllEvents, 20)
+        time.sleep(0.002)
+
+
+def _flush_deletes(app):
+    """Ejecuta los deleteLater() pendientes, como haría el bucle de eventos."""
+    for _ in range(3):
+        app.sendPostedEvents(None, QtCore.QEvent.Type.DeferredDelete.value)
+        app.processEvents()
+    gc.collect()
+
+
+def _settle(app, baseline, seconds=SETTLE_SECONDS):
+    """Deja que terminen los hilos que siguen saliendo tras close() antes de medir."""
+    deadline = time.monotonic() + seconds
+    while True:
+        _flush_deletes(app)
+        current = sample()
+        if current["threads"] <= baseline["threads"] or time.monotonic() > deadline:
+            return current
+        _process(app, 0.05)
+
+
+class _TerminalCycle:
+    """Un ciclo con la terminal completa (requiere QtWebEngine)."""
+
+    def __init__(self, params):
+        from UglyWidgets.qtssh_widget import Ui_Terminal
+
+        self.window = QtWidgets.QWidget()
+        self.terminal = Ui_Terminal(params, self.window)
+        self.backend = self.terminal.backend
+
+    def close(self):
+        self.terminal.close_terminal()
+        self.window.deleteLater()
+
+
+class _BackendCycle:
+    """Un ciclo con el backend SSH registrado en un QWebChannel, sin página web."""
+
+    def __init__(self, params):
+        from PyQt6.QtWebChannel import QWebChannel
+        from UglyWidgets.Library.sshshell import Backend
+
+        self.channel = QWebChannel()
+        self.backend = Backend(host=params["host"], port=params["port"], username=params["username"],
+                               password=params["password"], parrent_widget=None)
+        self.channel.registerObject("backend", self.backend)
+
+    def close(self):
+        self.backend.close()
+        self.channel.deregisterObject(self.backend)
+        self.channel.deleteLater()
+        self.backend.deleteLater()
+
+
+def _cycle_class():
+    try:
+        import PyQt6.QtWebEngineWidgets  # noqa: F401
+    except ImportError as e:
+        print(f"QtWebEngine no disponible ({e}); se ciclan backend y QWebChannel")
+        return _BackendCycle
+    return _TerminalCycle
+
+
+def _one_cycle(app, cycle_class, params, index, timeout=10.0):
+    # Backend imprime el informe de conexión en cada ciclo
+    with contextlib.redirect_stdout(io.StringIO()):
+        cycle = cycle_class(params)
+    marker = f"soak-{index}-ok"
+    received = []
+    cycle.backend.send_output.connect(received.append)
+    try:
+        cycle.backend.send_command(f"echo soak-{index}-''ok")
+        deadline = time.monotonic() + timeout
+        while marker not in "".join(received):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"ciclo {index}: sin respuesta de la shell en {timeout:.0f} s")
+            _process(app, 0.01)
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cycle.close()
+        _flush_deletes(app)
+
+
+def _slope(values):
+    """Pendiente por mínimos cuadrados de values frente al índice."""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    num = sum((i - mean_x) * (v - mean_y) for i, v in enumerate(values))
+    den = sum((i - mean_x) ** 2 for i in range(n))
+    return num / den
+
+
+def _start_server():
+    server = subprocess.Popen([sys.executable, "-m", "engine.loopback", "0"], stdout=subprocess.PIPE,
+                              text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    line = server.stdout.readline()
+    match = re.search(r":(\d+) \(clave: (.*)\)", line)
+    if not match:
+        server.kill()
+        raise RuntimeError(f"el servidor de pruebas no arrancó: {line!r}")
+    return server, int(match.group(1)), match.group(2)
+
+
+def run(cycles=300, warmup=WARMUP):
+    """Ejecuta la prueba y devuelve la lista de fallos (vacía si nada creció)."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    cycle_class = _cycle_class()
+    server, port, password = _start_server()
+    params = {"host": "127.0.0.1", "port": port, "username": "soak", "password": password}
+    try:
+        for i in range(warmup):
+            _one_cycle(app, cycle_class, params, i)
+        baseline = _settle(app, {"threads": 0}, seconds=1.0)
+        print(f"línea base tras {warmup} ciclos: {_describe(baseline)}")
+
+        rss = []
+        started = time.perf_counter()
+        for i in range(cycles):
+            _one_cycle(app, cycle_class, params, warmup + i)
+            rss.append(_rss_bytes())
+            if (i + 1) % 50 == 0:
+                current = sample()
+                print(f"  ciclo {i + 1:4d}: {_describe(current)}")
+        elapsed = time.perf_counter() - started
+        final = _settle(app, baseline)
+    finally:
+        server.terminate()
+        server.wait(5)
+        server.stdout.close()
+
+    print(f"final tras {cycles} ciclos ({elapsed / cycles * 1000:.0f} ms/ciclo): {_describe(final)}")
+    failures = []
+    for key, limit in (("threads", MAX_THREADS), ("native_threads", MAX_THREADS), ("fds", MAX_FDS),
+                       ("qobjects", MAX_QOBJECTS), ("rss", MAX_RSS)):
+        growth = final[key] - baseline[key]
+        if growth > limit:
+            failures.append(f"{key} creció {growth} (máximo {limit})")
+    # La pendiente solo sobre la segunda mitad: la primera aún absorbe cachés y arenas
+    slope = _slope(rss[len(rss) // 2:])
+    print(f"pendiente de RSS en la segunda mitad: {slope / 1024:.1f} KB/ciclo")
+    if slope > MAX_RSS_SLOPE:
+        failures.append(f"RSS crece {slope / 1024:.1f} KB/ciclo (máximo {MAX_RSS_SLOPE / 1024:.0f})")
+    return failures
+
+
+def _describe(s):
+    return (f"RSS {s['rss'] / (1 << 20):.1f} MB, {s['threads']} hilos ({s['native_threads']} nativos), "
+            f"{s['fds']} fds, {s['qobjects']} objetos Qt")
+
+
+if __name__ == "__main__":
+    failures = run(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
+    for failure in failures:
+        print(f"FALLO: {failure}")
+    print("sin crecimiento" if not failures else f"{len(failures)} fallos")
+    sys.exit(1 if failures else 0)
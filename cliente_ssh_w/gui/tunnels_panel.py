@@ -0,0 +1,121 @@
+from PyQt6 import QtWidgets, QtCore
+
+from engine.forwarding import ForwardingRelay, transport_opener
+
+
+def _human_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+
+
+class TunnelsPanel(QtWidgets.QWidget):
+    """
+    Panel de túneles (-L / -D) sobre el transporte de la sesión SSH activa.
+    Muestra contadores por túnel refrescados cada segundo. Ocultarlo no corta los
+    túneles: solo close_tunnels() (al desconectar) detiene el relay.
+    """
+    COLUMNS = ["Túnel", "Activas", "Total", "Enviados", "Recibidos", "Setup"]
+
+    def __init__(self, transport, parent=None):
+        super().__init__(parent)
+        self.relay = ForwardingRelay(transport_opener(transport))
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        form = QtWidgets.QHBoxLayout()
+        self.kind_selector = QtWidgets.QComboBox()
+        self.kind_selector.addItems(["Local (-L)", "SOCKS (-D)"])
+        self.kind_selector.currentIndexChanged.connect(self._on_kind_changed)
+        form.addWidget(self.kind_selector)
+
+        self.local_port_entry = QtWidgets.QLineEdit()
+        self.local_port_entry.setPlaceholderText("Puerto local")
+        self.local_port_entry.setFixedWidth(90)
+        form.addWidget(self.local_port_entry)
+
+        self.dest_entry = QtWidgets.QLineEdit()
+        self.dest_entry.setPlaceholderText("Destino host:puerto")
+        form.addWidget(self.dest_entry)
+
+        self.add_button = QtWidgets.QPushButton("Agregar")
+        self.add_button.clicked.connect(self.on_add_clicked)
+        form.addWidget(self.add_button)
+        layout.addLayout(form)
+
+        self.table = QtWidgets.QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        layout.addWidget(self.table)
+
+        self.remove_button = QtWidgets.QPushButton("Quitar túnel")
+        self.remove_button.clicked.connect(self.on_remove_clicked)
+        layout.addWidget(self.remove_button)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(1000)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        # Los contadores solo se refrescan con el panel a la vista; los túneles siguen al ocultarlo
+        self.refresh()
+        self._timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def _on_kind_changed(self, index):
+        self.dest_entry.setEnabled(index == 0)
+
+    def on_add_clicked(self):
+        try:
+            port = int(self.local_port_entry.text() or "0")
+            if self.kind_selector.currentIndex() == 0:
+                host, _, dest_port = self.dest_entry.text().strip().rpartition(":")
+                if not host or not dest_port:
+                    raise ValueError("El destino debe tener la forma host:puerto.")
+                self.relay.add_local(port, host, int(dest_port))
+            else:
+                self.relay.add_dynamic(port)
+        except ValueError as e:
+            QtWidgets.QMessageBox.critical(self, "Error", f"Datos de túnel inválidos: {e}")
+            return
+        except OSError as e:
+            QtWidgets.QMessageBox.critical(self, "Error", f"No se pudo abrir el puerto local: {e}")
+            return
+        self.local_port_entry.clear()
+        self.dest_entry.clear()
+        self.refresh()
+
+    def on_remove_clicked(self):
+        row = self.table.currentRow()
+        if 0 <= row < len(self.relay.tunnels):
+            self.relay.remove(self.relay.tunnels[row])
+            QtCore.QTimer.singleShot(100, self.refresh)
+
+    def refresh(self):
+        tunnels = list(self.relay.tunnels)
+        self.table.setRowCount(len(tunnels))
+        for row, t in enumerate(tunnels):
+            values = [t.description, str(t.active), str(t.total), _human_bytes(t.bytes_up),
+                      _human_bytes(t.bytes_down), f"{t.last_setup * 1000:.0f} ms" if t.last_setup else "-"]
+            for col, value in enumerate(values):
+                item = self.table.item(row, col)
+                if item is None:
+                    item = QtWidgets.QTableWidgetItem()
+                    self.table.setItem(row, col, item)
+                item.setText(value)
+
+    def close_tunnels(self):
+        self._timer.stop()
+        self.relay.stop()
+
+    def closeEvent(self, event):
+        self.close_tunnels()
+        event.accept()
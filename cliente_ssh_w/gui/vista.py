@@ -1,10 +1,12 @@
 import os
+import sys
 
 from PyQt6 import QtWidgets, QtCore, QtGui
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel,
-    QMessageBox, QSizePolicy, QFrame, QGroupBox, QFormLayout
+    QMessageBox, QSizePolicy, QFrame, QGroupBox, QFormLayout, QCheckBox, QFileDialog, QInputDialog
 )
+from engine.recording import default_recordings_dir, new_recording_path
 from UglyWidgets.qtssh_widget import Ui_Terminal  # Widget de terminal embebida
 from copilot.agente_copilot import CopilotAgentWidget  # Widget del agente copiloto
 
@@ -40,6 +42,7 @@ class Vista(QMainWindow):
         settings = QtCore.QSettings("Upiloto", "SSHClient")
         last_user = settings.value("user", "")
         self.user_entry.setText(last_user)
+        self.jump_entry.setText(settings.value("jump", ""))
 
         # Inicialización de atributos
         self.terminal_panel = None
@@ -47,6 +50,10 @@ class Vista(QMainWindow):
         self.ssh_terminal_widget = None
         self.ssh_backend = None
         self.copilot_widget = None
+        self.tunnels_panel = None
+        self.files_panel = None
+        self.monitor_panel = None
+        self.share_panel = None
         self._loading_dialog = None
 
     def _load_styles(self):
@@ -70,11 +77,43 @@ class Vista(QMainWindow):
         self.settings_button.clicked.connect(self.on_settings_clicked)
         header_layout.addWidget(self.settings_button)
 
+        self.tunnels_button = QPushButton("🔀 Túneles")
+        self.tunnels_button.setFixedSize(100, 32)
+        self.tunnels_button.clicked.connect(self.on_tunnels_clicked)
+        header_layout.addWidget(self.tunnels_button)
+
+        self.files_button = QPushButton("📁 Archivos")
+        self.files_button.setFixedSize(100, 32)
+        self.files_button.clicked.connect(self.on_files_clicked)
+        header_layout.addWidget(self.files_button)
+
+        self.monitor_button = QPushButton("📈 Monitor")
+        self.monitor_button.setFixedSize(100, 32)
+        self.monitor_button.clicked.connect(self.on_monitor_clicked)
+        header_layout.addWidget(self.monitor_button)
+
+        self.share_button = QPushButton("📡 Compartir")
+        self.share_button.setFixedSize(110, 32)
+        self.share_button.clicked.connect(self.on_share_clicked)
+        header_layout.addWidget(self.share_button)
+
         self.copilot_button = QPushButton("🤖 Copilot")
         self.copilot_button.setFixedSize(100, 32)
         self.copilot_button.clicked.connect(self.on_copilot_clicked)
         header_layout.addWidget(self.copilot_button)
 
+        # Terminal local (pty) solo en sistemas POSIX
+        self.local_button = QPushButton("💻 Local")
+        self.local_button.setFixedSize(90, 32)
+        self.local_button.setVisible(sys.platform != "win32")
+        self.local_button.clicked.connect(self.on_local_clicked)
+        header_layout.addWidget(self.local_button)
+
+        self.replay_button = QPushButton("▶ Reproducir")
+        self.replay_button.setFixedSize(110, 32)
+        self.replay_button.clicked.connect(self.on_replay_clicked)
+        header_layout.addWidget(self.replay_button)
+
         self.disconnect_button = QPushButton("🔌 Desconectar")
         self.disconnect_button.setFixedSize(120, 32)
         self.disconnect_button.setVisible(False)
@@ -105,6 +144,12 @@ class Vista(QMainWindow):
         self.port_entry.setVisible(False)
         form_layout.addRow("Puerto:", self.port_entry)
 
+        # Bastión intermedio (ProxyJump), como ssh -J usuario@bastion:puerto
+        self.jump_entry = QLineEdit()
+        self.jump_entry.setPlaceholderText("usuario@bastión:puerto (opcional)")
+        self.jump_entry.setVisible(False)
+        form_layout.addRow("Salto:", self.jump_entry)
+
         self.user_entry = QLineEdit()
         self.user_entry.setPlaceholderText("Usuario")
         form_layout.addRow("Usuario:", self.user_entry)
@@ -114,6 +159,14 @@ class Vista(QMainWindow):
         self.password_entry.setEchoMode(QLineEdit.EchoMode.Password)
         form_layout.addRow("Clave:", self.password_entry)
 
+        self.record_checkbox = QCheckBox("Grabar sesión (asciicast)")
+        form_layout.addRow(self.record_checkbox)
+
+        # Muestra al instante lo tecleado (subrayado) hasta que el servidor lo confirma
+        self.predictive_echo_checkbox = QCheckBox("Eco predictivo (conexiones lentas)")
+        self.predictive_echo_checkbox.setChecked(True)
+        form_layout.addRow(self.predictive_echo_checkbox)
+
         self.connect_button = QPushButton("🌐 Conectar")
         self.connect_button.clicked.connect(self.on_connect_clicked)
         # Permitir enviar con Enter desde el campo de clave y establecer botón por defecto
@@ -148,6 +201,13 @@ class Vista(QMainWindow):
             "username": user_val,
             "password": password_val
         }
+        jump_val = self.jump_entry.text().strip()
+        QtCore.QSettings("Upiloto", "SSHClient").setValue("jump", jump_val)
+        if jump_val:
+            ssh_params["jump"] = jump_val
+        if self.record_checkbox.isChecked():
+            ssh_params["record"] = new_recording_path(f"{user_val}@{host_val}")
+        ssh_params["predictive_echo"] = "adaptive" if self.predictive_echo_checkbox.isChecked() else "off"
 
         if self.terminal_panel:
             self.terminal_panel.deleteLater()
@@ -187,6 +247,32 @@ class Vista(QMainWindow):
         self._ssh_thread.finished.connect(self._ssh_thread.deleteLater)
         self._ssh_thread.start()
 
+    def on_local_clicked(self):
+        """Abre una terminal local (sin red) en el mismo widget de terminal."""
+        if self.terminal_panel:
+            self.show_error("Cierra la sesión actual antes de abrir una terminal local.")
+            return
+        params = {"local": True}
+        if self.record_checkbox.isChecked():
+            params["record"] = new_recording_path("local")
+        self._on_ssh_connected(params)
+
+    def on_replay_clicked(self):
+        """Reproduce una grabación asciicast en el widget de terminal."""
+        if self.terminal_panel:
+            self.show_error("Cierra la sesión actual antes de reproducir una grabación.")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Reproducir grabación", default_recordings_dir(),
+                                              "Asciicast (*.cast *.cast.gz *.cast.zst);;Todos (*)")
+        if not path:
+            return
+        speed, ok = QInputDialog.getDouble(self, "Reproducir grabación",
+                                           "Velocidad (espacio pausa, +/- velocidad, ←/→ saltar):",
+                                           1.0, 0.1, 64.0, 1)
+        if not ok:
+            return
+        self._on_ssh_connected({"replay": path, "speed": speed, "idle_limit": 2.0})
+
     def _on_ssh_connected(self, ssh_params):
         try:
             self.terminal_panel = QWidget()
@@ -216,6 +302,8 @@ class Vista(QMainWindow):
 
             self.form_widget.setVisible(False)
             self.settings_button.setVisible(False)
+            self.local_button.setVisible(False)
+            self.replay_button.setVisible(False)
             self.disconnect_button.setVisible(True)
             # Ocultar cargando y reactivar controles
             self._hide_loading()
@@ -244,6 +332,17 @@ class Vista(QMainWindow):
         except Exception as e:
             print(f"Error al desconectar: {e}")
 
+        self._close_tunnels_panel()
+        self._close_files_panel()
+        self._close_monitor_panel()
+        self._close_share_panel()
+        # Copilot suelta el backend antes de que se destruya (señales y pipeline de comandos)
+        try:
+            self.copilot_controller.set_ssh_service(None)
+        except Exception as e:
+            print(f"Error al soltar el backend de Copilot: {e}")
+        self._close_terminal()
+
         if self.terminal_panel:
             # Quitar del layout y del padre antes de borrar
             self.main_layout.removeWidget(self.terminal_panel)
@@ -260,23 +359,32 @@ class Vista(QMainWindow):
 
         self.form_widget.setVisible(True)
         self.settings_button.setVisible(True)
+        self.local_button.setVisible(sys.platform != "win32")
+        self.replay_button.setVisible(True)
         self.disconnect_button.setVisible(False)
         self.resize(500, 350)
         self.centrar_ventana()
         # Limpiar el campo de clave
         if hasattr(self, 'password_entry'):
             self.password_entry.clear()
-        # Dejar explícitamente al controlador Copilot sin backend SSH
+
+    def _close_terminal(self):
+        """Cierre explícito de la terminal: hilos de la sesión, canal web, página y backend."""
         try:
-            self.copilot_controller.set_ssh_service(None)
-        except Exception:
-            pass
+            if self.ssh_terminal_widget is not None:
+                self.ssh_terminal_widget.close_terminal()
+            elif self.ssh_backend is not None and hasattr(self.ssh_backend, 'close'):
+                self.ssh_backend.close()
+        except Exception as e:
+            print(f"Error al cerrar la terminal: {e}")
+        self.ssh_backend = None
 
     def _set_form_enabled(self, enabled: bool):
         """Habilita o deshabilita los campos del formulario y el botón de conexión."""
         try:
             self.host_entry.setEnabled(enabled)
             self.port_entry.setEnabled(enabled)
+            self.jump_entry.setEnabled(enabled)
             self.user_entry.setEnabled(enabled)
             self.password_entry.setEnabled(enabled)
             self.connect_button.setEnabled(enabled)
@@ -331,6 +439,7 @@ class Vista(QMainWindow):
         visible = self.host_entry.isVisible()
         self.host_entry.setVisible(not visible)
         self.port_entry.setVisible(not visible)
+        self.jump_entry.setVisible(not visible)
 
     def on_copilot_clicked(self):
         """Muestra u oculta el widget Copilot si ya hay una sesión activa."""
@@ -349,15 +458,105 @@ class Vista(QMainWindow):
         self.copilot_widget.setFixedWidth(400)
         self.terminal_panel.layout().addWidget(self.copilot_widget)
 
+    def on_tunnels_clicked(self):
+        """Muestra u oculta el panel de túneles (-L / -D) de la sesión SSH activa."""
+        if self.tunnels_panel:
+            # Los túneles son de la sesión, no de la vista: ocultar el panel no los corta
+            # (se detienen al desconectar o al cerrar la ventana)
+            self.tunnels_panel.setVisible(not self.tunnels_panel.isVisible())
+            return
+        transport = getattr(self.ssh_backend, 'transport', None) if self.ssh_backend else None
+        if not transport:
+            self.show_error("Conéctate por SSH primero para crear túneles.")
+            return
+        from gui.tunnels_panel import TunnelsPanel
+        self.tunnels_panel = TunnelsPanel(transport)
+        self.tunnels_panel.setFixedWidth(420)
+        self.terminal_panel.layout().addWidget(self.tunnels_panel)
+
+    def _close_tunnels_panel(self):
+        if self.tunnels_panel:
+            self.tunnels_panel.close_tunnels()
+            self.tunnels_panel.deleteLater()
+            self.tunnels_panel = None
+
+    def on_files_clicked(self):
+        """Muestra u oculta el explorador de archivos remoto (SFTP) de la sesión SSH activa."""
+        transport = getattr(self.ssh_backend, 'transport', None) if self.ssh_backend else None
+        if not transport:
+            self.show_error("Conéctate por SSH primero para explorar archivos.")
+            return
+        if self.files_panel:
+            self._close_files_panel()
+            return
+        from gui.files_panel import RemoteFilesPanel
+        self.files_panel = RemoteFilesPanel(transport)
+        self.files_panel.setFixedWidth(420)
+        self.terminal_panel.layout().addWidget(self.files_panel)
+
+    def _close_files_panel(self):
+        if self.files_panel:
+            self.files_panel.close_browser()
+            self.files_panel.deleteLater()
+            self.files_panel = None
+
+    def on_monitor_clicked(self):
+        """Muestra u oculta el monitor de recursos (CPU, memoria, disco, red) del servidor."""
+        transport = getattr(self.ssh_backend, 'transport', None) if self.ssh_backend else None
+        if not transport:
+            self.show_error("Conéctate por SSH primero para monitorizar el servidor.")
+            return
+        if self.monitor_panel:
+            self._close_monitor_panel()
+            return
+        from gui.monitor_panel import MonitorPanel
+        self.monitor_panel = MonitorPanel(transport)
+        self.monitor_panel.setFixedWidth(300)
+        self.terminal_panel.layout().addWidget(self.monitor_panel)
+
+    def _close_monitor_panel(self):
+        if self.monitor_panel:
+            self.monitor_panel.close_monitor()
+            self.monitor_panel.deleteLater()
+            self.monitor_panel = None
+
+    def on_share_clicked(self):
+        """Muestra u oculta el panel para compartir la terminal en solo lectura (visores y navegador)."""
+        if not self.ssh_backend or not hasattr(self.ssh_backend, 'share'):
+            self.show_error("Abre una sesión SSH o local para compartirla.")
+            return
+        if self.share_panel:
+            # Ocultar el panel no echa a los espectadores: eso lo hace "Dejar de compartir"
+            # (o desconectar / cerrar la ventana)
+            self.share_panel.setVisible(not self.share_panel.isVisible())
+            return
+        from gui.share_panel import SharePanel
+        self.share_panel = SharePanel(self.ssh_backend)
+        self.share_panel.stop_requested.connect(self._close_share_panel)
+        self.share_panel.setFixedWidth(300)
+        self.terminal_panel.layout().addWidget(self.share_panel)
+
+    def _close_share_panel(self):
+        if self.share_panel:
+            self.share_panel.close_share()
+            self.share_panel.deleteLater()
+            self.share_panel = None
+
     def closeEvent(self, event):
         """Cierra la conexión SSH y el hilo de lectura al cerrar la ventana, si aplica."""
+        self._close_tunnels_panel()
+        self._close_files_panel()
+        self._close_monitor_panel()
+        self._close_share_panel()
+        self._close_terminal()
         try:
-            if hasattr(self, 'ssh_backend') and self.ssh_backend:
-                if hasattr(self.ssh_backend, 'close'):
-                    self.ssh_backend.close()
             self.controlador.desconectar()
         except Exception as e:
             print(f"Error al desconectar: {e}")
+        try:
+            self.copilot_controller.close()
+        except Exception as e:
+            print(f"Error al cerrar Copilot: {e}")
         event.accept()
 
     def centrar_ventana(self):
@@ -0,0 +1,214 @@
+"""
+Vigilante de bloqueos del bucle de eventos de Qt.
+
+Un QTimer de latido en el hilo principal anota cuándo se ejecutó por última vez;
+un hilo aparte comprueba cada pocos milisegundos cuánto hace de ese latido. Si
+pasa del umbral, el hilo principal está atascado: se toma su pila de Python con
+sys._current_frames() (sin detenerlo) y se sigue muestreando mientras dure. Al
+volver el latido se registra el bloqueo (duración y punto del código en el que
+más muestras cayeron) y se acumulan recuento, duraciones y los puntos más
+frecuentes. La duración es el retraso del latido: una cota inferior del bloqueo
+real con un error menor que el periodo del latido.
+
+Fuera de los bloqueos el coste es un temporizador y un hilo que se despierta dos
+veces por latido, así que puede quedarse activo siempre (UPILOTO_WATCHDOG=0
+lo desactiva). Cada bloqueo se añade como línea JSON a ~/.upiloto/stalls.log
+(o a UPILOTO_STALL_LOG).
+
+    python -m gui.watchdog      # demostración y medida del coste
+"""
+import collections
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+from PyQt6 import QtCore
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_stall_log_path():
+    return os.environ.get("UPILOTO_STALL_LOG") or os.path.join(os.path.expanduser("~"), ".upiloto", "stalls.log")
+
+
+def watchdog_enabled():
+    return os.environ.get("UPILOTO_WATCHDOG", "1") not in ("0", "false", "no", "")
+
+
+def _call_site(stack):
+    """El marco más interno que pertenece al proyecto (lo que hay debajo suele ser Qt o la stdlib)."""
+    for frame in reversed(stack):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(_PROJECT_ROOT):
+            return f"{os.path.relpath(path, _PROJECT_ROOT)}:{frame.lineno} {frame.name}"
+    if stack:
+        frame = stack[-1]
+        return f"{frame.filename}:{frame.lineno} {frame.name}"
+    return "(sin pila de Python: código nativo)"
+
+
+class StallWatchdog(QtCore.QObject):
+    """
+    :param threshold_ms: a partir de qué retraso del latido se considera bloqueo.
+    :param heartbeat_ms: periodo del latido en el hilo principal.
+    :param log_path: archivo JSONL de bloqueos (None: default_stall_log_path(); "" no escribe).
+
+    Crear y arrancar desde el hilo principal, con la QApplication ya creada.
+    """
+    stall_detected = QtCore.pyqtSignal(object)  # dict del bloqueo, emitido al terminar este
+
+    def __init__(self, threshold_ms=200, heartbeat_ms=100, log_path=None, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000.0
+        self.heartbeat = heartbeat_ms / 1000.0
+        self.log_path = default_stall_log_path() if log_path is None else log_path
+        self.stalls = 0
+        self.stalled_seconds = 0.0
+        self.max_stall = 0.0
+        self.durations = collections.deque(maxlen=1000)
+        self.sites = collections.Counter()          # punto del código -> muestras tomadas en bloqueos
+        self.latency_max = 0.0                      # mayor retraso de un latido (bloqueado o no)
+        self._beats = 0
+        self._main_id = threading.main_thread().ident
+        self._last_beat = time.monotonic()
+        self._current = None                        # muestras del bloqueo en curso (hilo vigilante)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(heartbeat_ms)
+        self._timer.timeout.connect(self._beat)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._timer.start()
+        self._thread = threading.Thread(target=self._watch, name="StallWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=1)
+
+    # ----------------- Hilo principal -----------------
+
+    def _beat(self):
+        now = time.monotonic()
+        with self._lock:
+            gap = now - self._last_beat
+            self._last_beat = now
+            current, self._current = self._current, None
+        self._beats += 1
+        latency = gap - self.heartbeat
+        if latency > self.latency_max:
+            self.latency_max = latency
+        if latency >= self.threshold:
+            self._record(latency, current)
+
+    def _record(self, duration, samples):
+        self.stalls += 1
+        self.stalled_seconds += duration
+        self.max_stall = max(self.max_stall, duration)
+        self.durations.append(duration)
+        sites = collections.Counter(site for site, _ in samples or ())
+        self.sites.update(sites)
+        site = sites.most_common(1)[0][0] if sites else "(sin muestras: el hilo vigilante no llegó a ejecutarse)"
+        stack = next((s for c, s in reversed(samples or ()) if c == site), [])
+        stall = {"time": time.time(), "duration_ms": round(duration * 1000), "site": site,
+                 "samples": len(samples or ()), "stack": stack}
+        print(f"[watchdog] GUI bloqueada {stall['duration_ms']} ms en {site}")
+        self._write_log(stall)
+        self.stall_detected.emit(stall)
+
+    def _write_log(self, stall):
+        if not self.log_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(stall, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"[watchdog] No se pudo escribir {self.log_path}: {e}")
+            self.log_path = ""
+
+    # ----------------- Hilo vigilante -----------------
+
+    def _watch(self):
+        # Despertar dos veces por latido: todo bloqueo que llega a registrarse (el latido se
+        # retrasa al menos el umbral) deja un latido entero de muestreo, unas dos muestras
+        period = min(self.heartbeat, self.threshold) / 2
+        while not self._stop.wait(period):
+            with self._lock:
+                # Sin latido en todo el umbral el hilo principal ya está atascado (umbral > latido)
+                stalled = time.monotonic() - self._last_beat >= self.threshold
+            if not stalled:
+                continue
+            frame = sys._current_frames().get(self._main_id)
+            stack = traceback.extract_stack(frame, limit=40) if frame is not None else []
+            del frame
+            sample = (_call_site(stack), [f"{s.filename}:{s.lineno} {s.name}" for s in stack[-12:]])
+            with self._lock:
+                if self._current is None:
+                    self._current = []
+                if len(self._current) < 200:
+                    self._current.append(sample)
+
+    # ----------------- Informe -----------------
+
+    def report(self, top=5):
+        """Resumen legible: recuento, duraciones y los puntos del código con más muestras."""
+        if not self.stalls:
+            return f"[watchdog] Sin bloqueos de más de {self.threshold * 1000:.0f} ms ({self._beats} latidos)."
+        durations = sorted(self.durations)
+        p50 = durations[len(durations) // 2] * 1000
+        lines = [f"[watchdog] {self.stalls} bloqueos de la GUI, {self.stalled_seconds:.2f} s en total "
+                 f"(mediana {p50:.0f} ms, máximo {self.max_stall * 1000:.0f} ms). Puntos más frecuentes:"]
+        for site, count in self.sites.most_common(top):
+            lines.append(f"    {count:5d} muestras  {site}")
+        return "\n".join(lines)
+
+
+def _benchmark():
+    """Bloqueos provocados (sleep y bucle de CPU) y coste del vigilante con el bucle de eventos ocioso."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6 import QtWidgets
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+    def run_loop(seconds):
+        QtCore.QTimer.singleShot(int(seconds * 1000), app.quit)
+        start = time.process_time()
+        app.exec()
+        return time.process_time() - start
+
+    idle = run_loop(2.0)
+    watchdog = StallWatchdog(log_path="")
+    watchdog.start()
+    watched = run_loop(2.0)
+    print(f"coste con el bucle ocioso: {idle * 500:.2f} ms de CPU/s sin vigilante, {watched * 500:.2f} ms/s con él")
+
+    def slow_io():
+        time.sleep(0.35)
+
+    def busy():
+        end = time.monotonic() + 0.5
+        while time.monotonic() < end:
+            sum(range(1000))
+
+    for delay, fn in ((100, slow_io), (700, busy), (1400, slow_io), (1500, lambda: time.sleep(0.05))):
+        QtCore.QTimer.singleShot(delay, fn)
+    run_loop(2.0)
+    watchdog.stop()
+    print(watchdog.report())
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -5,11 +5,16 @@ from dotenv import load_dotenv
 from PyQt6 import QtWidgets
 from PyQt6.QtWebEngineCore import QWebEngineUrlScheme
 from gui.vista import Vista
+from gui.watchdog import StallWatchdog, watchdog_enabled
+from engine.metrics import MetricsExporter
 from controller import Controlador
 from resources import resource_path, load_qss
 from copilot.openai_service import OpenAIService
 from copilot.markdown_service import MarkdownService
 from copilot.copilot_controller import CopilotController
+from copilot.transcript_store import TranscriptStore
+from copilot.suggestion_index import CommandSuggestionIndex, default_index_path
+from copilot.doc_index import DocLibrary
 
 import sys
 # Add UglyWidgets to sys.path
@@ -25,6 +30,17 @@ if library_path not in sys.path:
 def main():
     # Crear la aplicación antes de instanciar cualquier QWidget
     app = QtWidgets.QApplication(sys.argv)
+    # Vigilante de bloqueos del bucle de eventos (UPILOTO_WATCHDOG=0 lo desactiva)
+    if watchdog_enabled():
+        watchdog = StallWatchdog(parent=app)
+        watchdog.start()
+        app.aboutToQuit.connect(watchdog.stop)
+        app.aboutToQuit.connect(lambda: print(watchdog.report()))
+    # Métricas en formato Prometheus (UPILOTO_METRICS_FILE / UPILOTO_METRICS_PORT, ver engine.metrics)
+    exporter = MetricsExporter.from_env()
+    if exporter is not None:
+        exporter.start()
+        app.aboutToQuit.connect(exporter.stop)
     # Cargar variables de entorno desde .env dentro del bundle (compatible con PyInstaller)
     # Intentar varias ubicaciones posibles según --add-data
     env_candidates = ['.env', 'cliente_ssh_w/.env']
@@ -49,17 +65,30 @@ def main():
     clave = os.environ.get("DEFAULT_PASS", "")
 
     # Inicializar servicios de OpenAI y Markdown
+    # Sin clave el cliente SSH sigue funcionando; solo Copilot queda limitado a respuestas locales
     api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
+    if api_key:
+        openai_service = OpenAIService(api_key)
+    else:
         hint = loaded_from if loaded_from else "(no se encontró .env empaquetado)"
-        QtWidgets.QMessageBox.critical(None, "Error crítico", f"No se encontró la clave OPENAI_API_KEY. Verifica .env en: {hint}")
-        sys.exit(1)
-    openai_service = OpenAIService(api_key)
+        print(f"OPENAI_API_KEY no definida; Copilot sin acceso a OpenAI. Verifica .env en: {hint}")
+        openai_service = None
     markdown_service = MarkdownService()
 
+    # Almacén local de conversaciones (opcional: si falla, Copilot funciona sin historial)
+    try:
+        transcript_store = TranscriptStore()
+    except Exception as e:
+        print(f"No se pudo abrir el historial de Copilot: {e}")
+        transcript_store = None
+
+    # Índice local de comandos para sugerencias instantáneas
+    suggestion_index = CommandSuggestionIndex(default_index_path())
+
     # Inicializar controlador SSH y Copilot
     controlador = Controlador(default_host, default_port, usuario, clave)
-    copilot_controller = CopilotController(openai_service, markdown_service, ssh_service=None)
+    copilot_controller = CopilotController(openai_service, markdown_service, ssh_service=None, store=transcript_store,
+                                           suggestions=suggestion_index, docs=DocLibrary())
 
     # Aplicar hoja de estilos
     app.setStyleSheet(load_qss("styles/main.qss"))
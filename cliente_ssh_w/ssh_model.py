@@ -1,12 +1,18 @@
+import codecs
+import select
+import time
+
 import paramiko
 
+from engine.connect import connect_client
+
 class ModeloSSH:
     """
     Clase que gestiona la conexión SSH usando la biblioteca Paramiko.
     Proporciona métodos para conectar, desconectar y acceder al transporte SSH.
     """
 
-    def __init__(self, host, puerto, usuario, clave):
+    def __init__(self, host, puerto, usuario, clave, timeout=None, salto=None):
         """
         Inicializa los parámetros de conexión SSH.
 
@@ -14,22 +20,32 @@ class ModeloSSH:
         :param puerto: Puerto del servicio SSH.
         :param usuario: Nombre de usuario SSH.
         :param clave: Contraseña del usuario SSH.
+        :param timeout: Segundos máximos para conectar y autenticar (None = sin límite).
+        :param salto: Bastiones intermedios al estilo ssh -J ("usuario@host:puerto,..."), o None.
         """
         self.host = host
         self.puerto = puerto
         self.usuario = usuario
         self.clave = clave
+        self.timeout = timeout
+        self.salto = salto
         self.cliente = None
+        self.reporte_conexion = None  # engine.connect.ConnectReport de la última conexión
 
     def conectar(self):
         """
         Intenta establecer una conexión SSH con los parámetros proporcionados.
         Lanza una excepción descriptiva en caso de error.
         """
+        # Reconectar sin desconectar antes dejaría abiertos el cliente y los bastiones anteriores
+        self.desconectar()
         try:
             self.cliente = paramiko.SSHClient()
             self.cliente.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.cliente.connect(self.host, port=self.puerto, username=self.usuario, password=self.clave)
+            self.reporte_conexion = connect_client(self.cliente, self.host, int(self.puerto), self.usuario,
+                                                   self.clave, timeout=self.timeout, system_host_keys=False,
+                                                   jump=self.salto,
+                                                   banner_timeout=self.timeout, auth_timeout=self.timeout)
         except paramiko.AuthenticationException:
             raise Exception("Autenticación fallida. Verifica tus credenciales.")
         except paramiko.SSHException as e:
@@ -46,6 +62,9 @@ class ModeloSSH:
             if self.cliente:
                 self.cliente.close()
                 self.cliente = None
+            if self.reporte_conexion:
+                self.reporte_conexion.release()
+                self.reporte_conexion = None
         except Exception as e:
             print(f"Error al desconectar: {e}")
 
@@ -64,3 +83,37 @@ class ModeloSSH:
         if not transport.is_active():
             raise Exception("El transporte SSH no está activo.")
         return transport
+
+    def ejecutar(self, comando, on_output=None, timeout=None):
+        """
+        Ejecuta un comando en un canal exec (sin shell interactiva) y espera su fin.
+
+        :param comando: Comando a ejecutar en el servidor.
+        :param on_output: Callback opcional fn(texto) con la salida (stdout+stderr) a medida que llega.
+        :param timeout: Segundos máximos de ejecución; al vencer se cierra el canal.
+        :return: Código de salida del comando.
+        :raises TimeoutError: Si el comando no termina dentro del plazo.
+        """
+        transport = self.get_transport()
+        deadline = time.monotonic() + timeout if timeout else None
+        canal = transport.open_session(timeout=timeout)
+        try:
+            canal.set_combine_stderr(True)
+            canal.exec_command(comando)
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            while True:
+                restante = None if deadline is None else deadline - time.monotonic()
+                if restante is not None and restante <= 0:
+                    raise TimeoutError(f"El comando excedió {timeout}s")
+                listo, _, _ = select.select([canal], [], [], restante)
+                if not listo:
+                    continue
+                datos = canal.recv(32768)
+                if not datos:
+                    break
+                texto = decoder.decode(datos)
+                if texto and on_output:
+                    on_output(texto)
+            return canal.recv_exit_status()
+        finally:
+            canal.close()